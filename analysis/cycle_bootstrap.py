@@ -0,0 +1,164 @@
+# analysis/cycle_bootstrap.py
+
+"""
+Monte Carlo Bootstrap of Monthly Cycle Gains and Timing
+
+Purpose:
+signals/*_full_cycles.csv holds only ~30 observed cycles per ETF, so the
+averages shown on the dashboard say nothing about how wide the outcomes are.
+This resamples the observed months into many simulated years and reports
+distributions instead of point estimates.
+
+How:
+- Per ETF, each completed cycle becomes one row of features:
+    gain        Low -> Peak return (the swing), %
+    drop        Peak -> next cycle's Low, %
+    low_day     calendar day of the Low
+    peak_day    calendar day of the Peak
+    hold_days   calendar days from Low to Peak
+- Moving-block bootstrap (circular blocks of `block_months` consecutive cycles,
+  to keep month-to-month dependence): a (sims × 12) index matrix is drawn in
+  one call, and all features for all simulated months come from a single
+  fancy-index gather — no Python loop over simulations.
+- Annual swing return compounds the 12 monthly gains net of a round-trip spread;
+  annual hold-through return compounds gain and drop.
+
+Outputs:
+- bootstrap_cycles() -> dict of (sims × 12) arrays per feature
+- summarize_bootstrap() -> quantiles and probabilities for one ETF
+- main(): reports/cycle_bootstrap.csv, one row per ETF
+
+Usage:
+    python -m analysis.cycle_bootstrap [--sims 100000] [--block-months 3]
+
+Last updated: 2025-06-22
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SIGNALS_DIR = "signals"
+REPORTS_DIR = "reports"
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+
+MONTHS_PER_YEAR = 12
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+FEATURES = ['gain', 'drop', 'low_day', 'peak_day', 'hold_days']
+
+def load_cycle_features(etf, signals_dir=SIGNALS_DIR):
+    """
+    (cycles × FEATURES) array from the completed cycles of an ETF, in date order.
+    A cycle's drop needs the following row's Low, so a final cycle without one
+    is left out.
+    """
+    path = os.path.join(signals_dir, f"{etf.lower()}_full_cycles.csv")
+    if not os.path.exists(path):
+        print(f"⚠️ Missing cycles file for {etf}: {path}")
+        return np.empty((0, len(FEATURES)))
+
+    cycles = pd.read_csv(path)
+    cycles['Low_Date'] = pd.to_datetime(cycles['Low_Date'])
+    cycles['Peak_Date'] = pd.to_datetime(cycles['Peak_Date'])
+    cycles = cycles.sort_values('Low_Date').reset_index(drop=True)
+
+    next_low = cycles['Low'].shift(-1)
+    features = pd.DataFrame({
+        'gain': cycles['Gain_%'],
+        'drop': (next_low - cycles['Peak']) / cycles['Peak'] * 100,
+        'low_day': cycles['Low_Date'].dt.day,
+        'peak_day': cycles['Peak_Date'].dt.day,
+        'hold_days': (cycles['Peak_Date'] - cycles['Low_Date']).dt.days,
+    })
+    complete = cycles['Cycle_Complete'].astype(str).str.lower() == 'true'
+    features = features[complete & next_low.notna()]
+    return features[FEATURES].to_numpy(dtype=float)
+
+def bootstrap_indices(n_obs, n_sims, n_months=MONTHS_PER_YEAR, block_months=3, seed=None):
+    """(n_sims × n_months) row indices drawn as circular blocks of consecutive months."""
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-n_months // block_months)
+    starts = rng.integers(0, n_obs, size=(n_sims, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_months)[None, None, :]) % n_obs
+    return idx.reshape(n_sims, n_blocks * block_months)[:, :n_months]
+
+def bootstrap_cycles(features, n_sims=100_000, n_months=MONTHS_PER_YEAR, block_months=3, seed=None):
+    """
+    Simulated years of cycles.
+
+    Parameters:
+        features (np.ndarray): (cycles × FEATURES) from load_cycle_features().
+
+    Returns:
+        dict: feature name -> (n_sims × n_months) array.
+    """
+    idx = bootstrap_indices(len(features), n_sims, n_months, block_months, seed)
+    sims = features[idx]                                   # (n_sims, n_months, features)
+    return {name: sims[:, :, k] for k, name in enumerate(FEATURES)}
+
+def summarize_bootstrap(sims, half_spread_bps=1.0):
+    """
+    Distribution summary of simulated years.
+
+    Returns:
+        dict: annual swing / hold-through return quantiles (%), probability of a
+        negative month and year, and median / 90% range of peak and low days.
+    """
+    cost = 2 * half_spread_bps / 100                       # round trip, in %
+    monthly_swing = sims['gain'] - cost
+    annual_swing = (np.prod(1 + monthly_swing / 100, axis=1) - 1) * 100
+    monthly_hold = (1 + sims['gain'] / 100) * (1 + sims['drop'] / 100) - 1
+    annual_hold = (np.prod(1 + monthly_hold, axis=1) - 1) * 100
+
+    out = {}
+    swing_q = np.quantile(annual_swing, QUANTILES)
+    for q, value in zip(QUANTILES, swing_q):
+        out[f'Annual_Swing_P{int(q * 100)}_%'] = value
+    out['Annual_Swing_Mean_%'] = annual_swing.mean()
+    out['Annual_Hold_P50_%'] = np.median(annual_hold)
+    out['P_Negative_Month'] = (monthly_swing < 0).mean()
+    out['P_Negative_Year'] = (annual_swing < 0).mean()
+    for name in ('peak_day', 'low_day', 'hold_days'):
+        p5, p50, p95 = np.quantile(sims[name], [0.05, 0.5, 0.95])
+        label = ''.join(part.capitalize() for part in name.split('_'))
+        out[f'{label}_P50'] = p50
+        out[f'{label}_P5_P95'] = f"{p5:.0f}–{p95:.0f}"
+    return out
+
+def bootstrap_report(tickers=ETF_LIST, n_sims=100_000, block_months=3, half_spread_bps=1.0,
+                     seed=None, signals_dir=SIGNALS_DIR):
+    """One summary row per ETF."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for etf in tickers:
+        features = load_cycle_features(etf, signals_dir)
+        if len(features) < block_months:
+            print(f"⚠️ {etf}: only {len(features)} cycles, skipping")
+            continue
+        sims = bootstrap_cycles(features, n_sims, block_months=block_months, seed=rng)
+        rows.append({'ETF': etf, 'Observed_Cycles': len(features),
+                     **summarize_bootstrap(sims, half_spread_bps)})
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo bootstrap of monthly cycle gains and timing")
+    parser.add_argument('--sims', type=int, default=100_000, help="Simulated years per ETF")
+    parser.add_argument('--block-months', type=int, default=3)
+    parser.add_argument('--spread-bps', type=float, default=1.0, help="Half spread per side, bps")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--tickers', nargs='+', default=ETF_LIST)
+    args = parser.parse_args()
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report = bootstrap_report(args.tickers, args.sims, args.block_months, args.spread_bps, args.seed)
+    out_path = os.path.join(REPORTS_DIR, "cycle_bootstrap.csv")
+    report.round(4).to_csv(out_path, index=False)
+
+    print(f"🎲 {args.sims:,} simulated years per ETF (blocks of {args.block_months} months)")
+    print(report.round(3).to_string(index=False))
+    print(f"✅ Saved to {out_path}")
+
+if __name__ == "__main__":
+    main()
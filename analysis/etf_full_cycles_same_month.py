@@ -9,23 +9,27 @@ For each ETF:
 - Finds local peak in days 25–end of month (or max so far if month incomplete)
 - Calculates gain %, marks incomplete cycles if current month is not yet finished
 
+Functions:
+- extract_same_month_cycles(df, etf) -> cycles DataFrame for one ETF
+- build_same_month_cycles(df, etfs)  -> {etf: cycles DataFrame}, no file I/O
+- main()                             -> reads the price CSV, writes the CSVs below
+
 Output:
 - One CSV per ETF in signals/ (e.g., sgov_full_cycles.csv)
 - Columns: Cycle_Month, Low_Date, Low, Peak_Date, Peak, Gain_%, Cycle_Complete
 
-Last updated: 2025-06-15, 7:36 pm
+Last updated: 2025-06-22
 """
 
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+from utils.data_loader import load_price_frame
+from utils.fixed_point import extreme_dates
+from utils.profiling import profiled
 
 DATA_PATH = Path("data/etf_prices_2023_2025.csv")
 SIGNALS_DIR = Path("signals")
-SIGNALS_DIR.mkdir(exist_ok=True)
-
-df = pd.read_csv(DATA_PATH, index_col=0, parse_dates=True)
-df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
 
 etfs = ["SGOV", "BIL", "SHV", "TFLO", "ICSH"]
 
@@ -35,9 +39,13 @@ def get_low_window(df_month):
 def get_peak_window(df_month):
     return df_month[df_month.index.day >= 25]
 
+@profiled()
 def extract_same_month_cycles(df, etf):
     results = []
-    months = pd.date_range(start="2023-01-01", end=df.index.max(), freq="MS")
+    # Months before the frame's first row have no data: start at the later of the two
+    # (month partitions, utils/partitions.py, pass a few months at a time)
+    first = max(pd.Timestamp("2023-01-01"), df.index.min().replace(day=1)) if len(df) else None
+    months = pd.date_range(start=first, end=df.index.max(), freq="MS") if first else []
     today = pd.Timestamp.today().normalize()
 
     for month_start in months:
@@ -51,8 +59,8 @@ def extract_same_month_cycles(df, etf):
         if low_window.empty:
             continue
 
-        low_price = low_window[etf].min()
-        low_date = low_window[low_window[etf] == low_price].index.min()
+        low_price, low_dates = extreme_dates(low_window[etf], 'min')
+        low_date = low_dates.min()
 
         # Handle peak logic
         is_current_month = month_start.month == today.month and month_start.year == today.year
@@ -64,8 +72,8 @@ def extract_same_month_cycles(df, etf):
         if peak_window.empty:
             continue
 
-        peak_price = peak_window[etf].max()
-        peak_date = peak_window[peak_window[etf] == peak_price].index.max()
+        peak_price, peak_dates = extreme_dates(peak_window[etf], 'max')
+        peak_date = peak_dates.max()
 
         if peak_date > low_date and peak_price > 0 and low_price > 0:
             gain = (peak_price - low_price) / low_price * 100
@@ -83,12 +91,17 @@ def extract_same_month_cycles(df, etf):
 
     return pd.DataFrame(results)
 
+def build_same_month_cycles(df, etf_list=etfs):
+    """Same-month cycles for each ETF from a date-indexed price frame."""
+    return {etf: extract_same_month_cycles(df, etf) for etf in etf_list}
+
 def main():
-    for etf in etfs:
-        df_cycles = extract_same_month_cycles(df, etf)
+    df = load_price_frame(DATA_PATH)
+    SIGNALS_DIR.mkdir(exist_ok=True)
+    for etf, df_cycles in build_same_month_cycles(df).items():
         out_path = SIGNALS_DIR / f"{etf.lower()}_full_cycles.csv"
         df_cycles.to_csv(out_path, index=False)
         print(f"✅ {etf} cycles saved to {out_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,245 @@
+# analysis/optimal_rotation.py
+
+"""
+Hindsight-Optimal Rotation (Performance Ceiling)
+
+Purpose:
+Measure how much of the available swing our rules actually capture. With
+perfect hindsight, what is the best possible return from holding one ETF (or
+cash) at a time over the stored price history, after paying the bid/ask
+spread on every trade and waiting for sale proceeds to settle?
+
+How:
+Dynamic programming over (trading day × state) in log-wealth, where a state is
+"holding ETF j", "settled cash", or "sale proceeds settling":
+- hold j:   H[d, j] = max(H[d-1, j] + log return of j,  C[d] + log(1 - spread))
+- sold:     S[d]    = max_j(H[d-1, j] + log return of j) + log(1 - spread)
+- cash:     C[d]    = max(C[d-1] + cash rate,  S[d - lag] + lag × cash rate)
+Each day is a handful of NumPy operations over the ticker axis, and the only
+stored history is one byte-sized backpointer per (day, ticker), so decades of
+history × hundreds of tickers stay cheap. The optimal switch schedule is
+recovered by walking the backpointers from the best final state.
+
+The ceiling is compared against:
+- 'cycles': sell at Peak_Date / buy at Low_Date from signals/*_full_cycles.csv
+- 'config': sell at the end of each month's ETF_CONFIG peak_day_range window and
+  buy back post_peak_low_days trading days later
+Both rules run through analysis/swing_simulator.py with the same costs; the
+capture ratio is rule return / optimal return, per ETF.
+
+Outputs:
+- reports/optimal_rotation_schedule.csv: optimal trades across the whole universe
+- reports/optimal_rotation_capture.csv: per-ETF optimal, rule and buy & hold returns
+
+Usage:
+    python -m analysis.optimal_rotation [--spread-bps 1] [--settle-lag 1] [--cash-rate 0]
+
+Last updated: 2025-06-22
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis.swing_simulator import load_cycle_signals, simulate
+from config.etf_parameters import ETF_CONFIG, get_peak_day_window
+from utils.data_loader import load_price_frame
+from utils.profiling import profiled
+
+DATA_PATH = "data/etf_prices_2023_2025.csv"
+REPORTS_DIR = "reports"
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+
+@profiled()
+def optimal_path(prices, half_spread_bps=1.0, settle_lag=1, cash_rate=0.0):
+    """
+    Best achievable single-position path over the price matrix, starting in cash.
+
+    Parameters:
+        prices (pd.DataFrame): Date-indexed prices, one column per ticker.
+            NaN (not yet listed / no quote) days cannot be traded.
+        half_spread_bps (float): Cost per side, in basis points of price.
+        settle_lag (int): Trading days before sale proceeds can be reinvested.
+        cash_rate (float): Annual rate earned by settled and settling cash.
+
+    Returns:
+        dict with 'total_return' (fraction), 'log_wealth' (per-day best log
+        wealth), 'schedule' (DataFrame of trades), 'position' (per-day ticker
+        or 'CASH' / 'SETTLING').
+    """
+    raw = prices.to_numpy(dtype=float)
+    n_days, n_etfs = raw.shape
+    tradable = ~np.isnan(raw)
+    px = prices.ffill().to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        logret = np.nan_to_num(np.diff(np.log(px), axis=0), nan=0.0)
+
+    lag = int(settle_lag)
+    cost = np.log1p(-half_spread_bps / 10_000)
+    r = np.log1p(cash_rate) / 252
+
+    H = np.where(tradable[0], cost, -np.inf)       # bought on day 0 from cash
+    C = np.zeros(n_days)                           # settled cash, per day
+    S = np.full(n_days, -np.inf)                   # sale proceeds booked on day d
+    best = np.empty(n_days)
+
+    hold_bp = np.zeros((n_days, n_etfs), dtype=bool)   # True: held from d-1
+    cash_bp = np.zeros(n_days, dtype=bool)              # True: settled from a sale
+    sell_bp = np.full(n_days, -1, dtype=np.int32)       # ticker sold on day d
+    best[0] = max(C[0], H.max(initial=-np.inf))
+
+    for d in range(1, n_days):
+        held = H + logret[d - 1]
+
+        sellable = np.where(tradable[d], held, -np.inf)
+        j = int(np.argmax(sellable)) if n_etfs else 0
+        if n_etfs and np.isfinite(sellable[j]):
+            S[d] = sellable[j] + cost
+            sell_bp[d] = j
+
+        carried = C[d - 1] + r
+        settled = S[d - lag] + lag * r if d - lag >= 0 else -np.inf
+        cash_bp[d] = settled > carried
+        C[d] = settled if cash_bp[d] else carried
+
+        bought = np.where(tradable[d], C[d] + cost, -np.inf)
+        hold_bp[d] = held >= bought
+        H = np.where(hold_bp[d], held, bought)
+
+        pending = S[max(d - lag + 1, 0):d + 1] + r * (d - np.arange(max(d - lag + 1, 0), d + 1))
+        best[d] = max(C[d], H.max(initial=-np.inf), pending.max(initial=-np.inf))
+
+    schedule, position = _backtrack(prices, H, C, S, hold_bp, cash_bp, sell_bp, lag, r)
+    return {
+        'total_return': float(np.expm1(best[-1])),
+        'log_wealth': pd.Series(best, index=prices.index),
+        'schedule': schedule,
+        'position': position,
+    }
+
+def _backtrack(prices, H, C, S, hold_bp, cash_bp, sell_bp, lag, r):
+    """Walk the backpointers from the best final state to the trade list."""
+    n_days = len(prices)
+    tickers = np.asarray(prices.columns)
+    last = n_days - 1
+
+    # Best final state: holding, settled cash, or a sale still settling
+    candidates = [('C', None, last, C[last])]
+    if len(tickers):
+        j = int(np.argmax(H))
+        candidates.append(('H', j, last, H[j]))
+    for t in range(max(last - lag + 1, 0), last + 1):
+        candidates.append(('S', None, t, S[t] + r * (last - t)))
+    kind, j, d, _ = max(candidates, key=lambda c: c[3])
+
+    position = np.full(n_days, 'CASH', dtype=object)
+    trades = []
+    end = last
+    while d >= 0:
+        if kind == 'H':
+            start = d
+            while start > 0 and hold_bp[start, j]:
+                start -= 1
+            position[start:end + 1] = tickers[j]
+            trades.append((start, 'BUY', tickers[j]))
+            kind, d, end = 'C', start, start - 1
+        elif kind == 'S':
+            j = int(sell_bp[d])
+            trades.append((d, 'SELL', tickers[j]))
+            position[d + 1:end + 1] = 'SETTLING'
+            position[d + lag:end + 1] = 'CASH'
+            kind, d, end = 'H', d - 1, d
+        else:
+            if d == 0:
+                break
+            if cash_bp[d]:
+                position[d:end + 1] = 'CASH'
+                kind, d, end = 'S', d - lag, d - 1
+            else:
+                d -= 1
+
+    trades.reverse()
+    rows = [(prices.index[d], action, etf, prices[etf].iat[d]) for d, action, etf in trades]
+    schedule = pd.DataFrame(rows, columns=['Date', 'Action', 'ETF', 'Price'])
+    return schedule, pd.Series(position, index=prices.index)
+
+def config_rule_signals(dates, tickers):
+    """
+    Boolean (dates × tickers) sell / buy matrices from ETF_CONFIG: sell on the
+    last day of each month's peak_day_range window, buy post_peak_low_days
+    trading days later.
+    """
+    sells = np.zeros((len(dates), len(tickers)), dtype=bool)
+    buys = np.zeros((len(dates), len(tickers)), dtype=bool)
+    months = dates.to_period('M')
+    frame = pd.DataFrame(index=dates)
+    for j, etf in enumerate(tickers):
+        if etf not in ETF_CONFIG:
+            continue
+        low_days = ETF_CONFIG[etf]['post_peak_low_days']
+        for month in months.unique():
+            _, end = get_peak_day_window(frame[months == month], etf)
+            row = dates.get_loc(end)
+            sells[row, j] = True
+            if row + low_days < len(dates):
+                buys[row + low_days, j] = True
+    return sells, buys
+
+def _rule_return(prices, sells, buys, half_spread_bps, settle_lag, cash_rate):
+    variant = pd.DataFrame({'half_spread_bps': [half_spread_bps], 'settle_lag': [settle_lag],
+                            'cash_rate': [cash_rate]})
+    equity = simulate(prices, sells, buys, variant, initial_capital=1.0)['equity']
+    return float(equity[0, -1] - 1)
+
+def capture_table(prices, half_spread_bps=1.0, settle_lag=1, cash_rate=0.0):
+    """
+    Per-ETF optimal (single ETF or cash) vs rule returns and capture ratios, in %.
+    """
+    rules = {
+        'Cycles': load_cycle_signals(prices.index, list(prices.columns)),
+        'Config': config_rule_signals(prices.index, list(prices.columns)),
+    }
+    rows = []
+    for j, etf in enumerate(prices.columns):
+        single = prices[[etf]]
+        optimal = optimal_path(single, half_spread_bps, settle_lag, cash_rate)['total_return']
+        row = {
+            'ETF': etf,
+            'Optimal_Return_%': optimal * 100,
+            'Buy_Hold_Return_%': (single[etf].iloc[-1] / single[etf].iloc[0] - 1) * 100,
+        }
+        for name, (sells, buys) in rules.items():
+            ret = _rule_return(single, sells[:, [j]], buys[:, [j]], half_spread_bps, settle_lag, cash_rate)
+            row[f'{name}_Return_%'] = ret * 100
+            row[f'{name}_Capture_%'] = ret / optimal * 100 if optimal > 0 else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows).round(3)
+
+def main():
+    parser = argparse.ArgumentParser(description="Hindsight-optimal rotation path and rule capture ratios")
+    parser.add_argument('--spread-bps', type=float, default=1.0, help="Half spread per side, bps")
+    parser.add_argument('--settle-lag', type=int, default=1, help="Settlement lag, trading days")
+    parser.add_argument('--cash-rate', type=float, default=0.0, help="Annual rate on idle cash")
+    parser.add_argument('--tickers', nargs='+', default=ETF_LIST)
+    args = parser.parse_args()
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    df = load_price_frame(DATA_PATH)
+    prices = df[[etf for etf in args.tickers if etf in df.columns]]
+
+    result = optimal_path(prices, args.spread_bps, args.settle_lag, args.cash_rate)
+    schedule_path = os.path.join(REPORTS_DIR, "optimal_rotation_schedule.csv")
+    result['schedule'].to_csv(schedule_path, index=False)
+    print(f"🏁 Optimal rotation across {len(prices.columns)} ETFs: "
+          f"{result['total_return'] * 100:.3f}% with {len(result['schedule'])} trades")
+
+    capture = capture_table(prices, args.spread_bps, args.settle_lag, args.cash_rate)
+    capture_path = os.path.join(REPORTS_DIR, "optimal_rotation_capture.csv")
+    capture.to_csv(capture_path, index=False)
+    print(capture.to_string(index=False))
+    print(f"✅ Saved {schedule_path} and {capture_path}")
+
+if __name__ == "__main__":
+    main()
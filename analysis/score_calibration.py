@@ -0,0 +1,269 @@
+# analysis/score_calibration.py
+
+"""
+Peak Score Calibration and Threshold Backtesting
+
+Purpose:
+Measure the peak score weights and alert thresholds against realized peaks
+instead of picking them by eye:
+- 75 / 60 thresholds and 0.4 / 0.3 / 0.2 / 0.1 weights in analysis/usfr_peak_signal.py
+- 0.7 / 0.3 weights of the same-month scorer in scripts/peak_signal_score.py
+- ≥3 / ≥2 point thresholds in utils/peak_signal_score.py
+
+How:
+- Factors are computed once into the shared (date × ticker × factor) cube
+  (utils/factor_scoring.py) for the whole history. USFR's cube includes its
+  peers (as in the live scorer) and only the USFR column is evaluated.
+- Realized peaks come from Peak_Date in signals/*_full_cycles.csv (completed cycles).
+- Factors that are constant over the history (the 'macro' placeholder) are
+  pinned to their configured weight; the grid spreads the rest over the others.
+- A grid of weight vectors is scored against the cube in chunks; chunks run in
+  a thread pool and share the cube read-only (NumPy releases the GIL).
+- For every weight vector and threshold:
+    precision = alert days with a realized peak within the next `tolerance` trading days
+                / all alert days
+    recall    = realized peaks with an alert in the `lookback` trading days up to the peak
+                / all realized peaks
+    lead      = mean trading days between the first such alert and the peak
+
+Output:
+- reports/score_calibration_<group>.csv, best rows first
+- Printed comparison of the configured weights/thresholds vs the best grid point
+
+Usage:
+    python -m analysis.score_calibration
+
+Last updated: 2025-06-20
+"""
+
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis.usfr_peak_signal import ETF_PEERS
+from config.etf_parameters import get_score_config
+from utils.data_loader import load_price_frame
+from utils.factor_scoring import compute_factor_cube
+from utils.peak_signal_score import PEAK_POINT_WEIGHTS
+
+SIGNALS_DIR = "signals"
+REPORTS_DIR = "reports"
+DATA_PATH = "data/etf_prices_2023_2025.csv"
+
+# Calibration groups: tickers scored together, factors searched, score scale and thresholds.
+# 'cube_tickers' (default: 'tickers') are the columns the factors are computed over;
+# USFR's peer_divergence needs the peers in the cube, as in analysis/usfr_peak_signal.py.
+CALIBRATION_GROUPS = {
+    'usfr': {
+        'tickers': ['USFR'],
+        'cube_tickers': ['USFR'] + ETF_PEERS,
+        'factors': ['high_proximity', 'calendar_window', 'peer_divergence', 'macro'],
+        'scale': 100,
+        'thresholds': np.arange(50, 95, 5),
+        'current': {'weights': get_score_config('USFR')['score_weights'], 'thresholds': [75, 60]},
+    },
+    'same_month': {
+        'tickers': ['SGOV', 'BIL', 'SHV', 'TFLO', 'ICSH'],
+        'factors': ['high_proximity', 'calendar_window', 'near_high', 'late_month'],
+        'scale': 100,
+        'thresholds': np.arange(50, 95, 5),
+        'current': {'weights': get_score_config('SGOV')['score_weights'], 'thresholds': [75, 60]},
+    },
+    'points': {
+        'tickers': ['SGOV', 'BIL', 'SHV', 'TFLO', 'ICSH'],
+        'factors': list(PEAK_POINT_WEIGHTS),
+        'scale': 3.5,   # grid weights sum to 1; 3.5 = max points of the legacy scorer
+        'thresholds': np.arange(0.5, 4.0, 0.5),
+        'current': {'weights': PEAK_POINT_WEIGHTS, 'thresholds': [3, 2], 'scale': 1},
+    },
+}
+
+def load_realized_peaks(tickers, signals_dir=SIGNALS_DIR, complete_only=True):
+    """
+    Returns {ticker: DatetimeIndex of realized peak dates} from *_full_cycles.csv.
+    """
+    peaks = {}
+    for etf in tickers:
+        path = os.path.join(signals_dir, f"{etf.lower()}_full_cycles.csv")
+        if not os.path.exists(path):
+            print(f"⚠️ Missing cycles file for {etf}: {path}")
+            peaks[etf] = pd.DatetimeIndex([])
+            continue
+        cycles = pd.read_csv(path)
+        if complete_only and 'Cycle_Complete' in cycles.columns:
+            cycles = cycles[cycles['Cycle_Complete'].astype(str).str.lower() == 'true']
+        peaks[etf] = pd.DatetimeIndex(pd.to_datetime(cycles['Peak_Date'], errors='coerce').dropna())
+    return peaks
+
+def peak_mask(dates, tickers, peaks):
+    """Boolean (dates × tickers) matrix, True on realized peak days."""
+    mask = np.zeros((len(dates), len(tickers)), dtype=bool)
+    for j, etf in enumerate(tickers):
+        mask[:, j] = dates.isin(peaks.get(etf, []))
+    return mask
+
+def select_tickers(cube, tickers):
+    """The cube restricted to `tickers` (factors already computed against the full set)."""
+    cols = [cube['tickers'].index(t) for t in tickers]
+    return {**cube, 'values': cube['values'][:, cols, :], 'tickers': list(tickers)}
+
+def constant_factors(cube):
+    """Factors whose value never changes over the cube's dates and tickers."""
+    values = cube['values']
+    return [f for k, f in enumerate(cube['factors'])
+            if np.nanmin(values[:, :, k], initial=np.inf) == np.nanmax(values[:, :, k], initial=-np.inf)
+            or np.isnan(values[:, :, k]).all()]
+
+def weight_grid(n_factors, step=0.1):
+    """All weight vectors on the simplex (non-negative, summing to 1) at the given step."""
+    n_steps = int(round(1 / step))
+    combos = [c for c in itertools.product(range(n_steps + 1), repeat=n_factors) if sum(c) == n_steps]
+    return np.array(combos, dtype=float) / n_steps
+
+def _evaluate_chunk(factor_values, weights, thresholds, scale, near_peak, peak_rows, peak_cols,
+                    window_rows, window_valid, lookback):
+    # (grid, dates, tickers) scores for this chunk of weight vectors
+    scores = np.einsum('dtf,gf->gdt', factor_values, weights) * scale
+    window_scores = scores[:, window_rows, peak_cols[:, None]]        # (grid, peaks, lookback+1)
+    results = []
+    for thr in thresholds:
+        alerts = scores >= thr
+        n_alerts = alerts.sum(axis=(1, 2))
+        n_true = (alerts & near_peak).sum(axis=(1, 2))
+
+        hits = (window_scores >= thr) & window_valid
+        detected = hits.any(axis=2)
+        first_hit = hits.argmax(axis=2)
+        lead = np.where(detected, lookback - first_hit, np.nan)
+        n_detected = detected.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            precision = np.where(n_alerts > 0, n_true / n_alerts, np.nan)
+            recall = n_detected / max(len(peak_rows), 1)
+            mean_lead = np.where(n_detected > 0, np.nansum(lead, axis=1) / n_detected, np.nan)
+        results.append((thr, n_alerts, precision, recall, mean_lead))
+    return results
+
+def evaluate_weight_grid(cube, peaks_mask, weights, thresholds, scale=100, factors=None,
+                         tolerance=2, lookback=5, chunk_size=64, workers=None):
+    """
+    Evaluate every (weight vector, threshold) pair against realized peaks.
+
+    Parameters:
+        cube (dict): Output of compute_factor_cube().
+        peaks_mask (np.ndarray): (dates × tickers) realized peak days.
+        weights (np.ndarray): (grid × factors) weight vectors, columns in `factors` order.
+        thresholds (list): Alert thresholds on the scaled score.
+        factors (list): Cube factors the weight columns refer to (default: all).
+        tolerance (int): Trading days after an alert in which a peak counts as a hit.
+        lookback (int): Trading days before a peak in which an alert counts as detection.
+        workers (int): Thread pool size (default: os.cpu_count()).
+
+    Returns:
+        DataFrame with one row per (weight vector, threshold): weight columns,
+        Threshold, Alerts, Precision, Recall, F1, Mean_Lead_Days.
+    """
+    factors = list(cube['factors']) if factors is None else list(factors)
+    idx = [cube['factors'].index(f) for f in factors]
+    factor_values = np.nan_to_num(cube['values'][:, :, idx], nan=0.0)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    n_dates = factor_values.shape[0]
+
+    # Alert days followed by a realized peak within `tolerance` trading days
+    cum = np.vstack([np.zeros((1, peaks_mask.shape[1])), np.cumsum(peaks_mask, axis=0)])
+    ahead = np.minimum(np.arange(n_dates) + tolerance + 1, n_dates)
+    near_peak = (cum[ahead] - cum[np.arange(n_dates)]) > 0
+
+    # Index windows of `lookback` trading days up to each realized peak
+    peak_rows, peak_cols = np.nonzero(peaks_mask)
+    window_rows = peak_rows[:, None] - lookback + np.arange(lookback + 1)[None, :]
+    window_valid = window_rows >= 0
+    window_rows = np.clip(window_rows, 0, n_dates - 1)
+
+    chunks = [weights[i:i + chunk_size] for i in range(0, len(weights), chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunk_results = list(pool.map(
+            lambda w: _evaluate_chunk(factor_values, w, thresholds, scale, near_peak,
+                                      peak_rows, peak_cols, window_rows, window_valid, lookback),
+            chunks))
+
+    frames = []
+    for w, results in zip(chunks, chunk_results):
+        for thr, n_alerts, precision, recall, mean_lead in results:
+            part = pd.DataFrame(w, columns=[f"W_{f}" for f in factors])
+            part['Threshold'] = thr
+            part['Alerts'] = n_alerts
+            part['Precision'] = precision
+            part['Recall'] = recall
+            part['Mean_Lead_Days'] = mean_lead
+            frames.append(part)
+    out = pd.concat(frames, ignore_index=True)
+    with np.errstate(invalid='ignore'):
+        out['F1'] = 2 * out['Precision'] * out['Recall'] / (out['Precision'] + out['Recall'])
+    out['Peaks'] = len(peak_rows)
+    return out
+
+def calibrate_group(name, df=None, step=0.1, tolerance=2, lookback=5, workers=None):
+    """
+    Run the grid for one CALIBRATION_GROUPS entry.
+
+    Returns:
+        (grid_results, current_results) DataFrames, grid sorted best F1 first.
+    """
+    group = CALIBRATION_GROUPS[name]
+    if df is None:
+        df = load_price_frame(DATA_PATH)
+    tickers = group['tickers']
+    cube_tickers = group.get('cube_tickers', tickers)
+    if cube_tickers != tickers:
+        # Days where every cube ticker trades, like the live scorer's load_data()
+        df = df.dropna(subset=cube_tickers)
+    cube = select_tickers(compute_factor_cube(df, tickers=cube_tickers, factors=group['factors']), tickers)
+    peaks = peak_mask(cube['dates'], tickers, load_realized_peaks(tickers))
+
+    # A factor that is constant over the history (e.g. the 'macro' placeholder)
+    # only shifts every score against the threshold: pin it to its configured
+    # weight and search the remaining weight over the other factors.
+    current = group['current']
+    pinned = constant_factors(cube)
+    free = [f for f in group['factors'] if f not in pinned]
+    pinned_total = sum(current['weights'].get(f, 0.0) for f in pinned)
+    free_grid = weight_grid(len(free), step) * (1 - pinned_total)
+    grid = np.zeros((len(free_grid), len(group['factors'])))
+    for k, f in enumerate(group['factors']):
+        grid[:, k] = current['weights'].get(f, 0.0) if f in pinned else free_grid[:, free.index(f)]
+    results = evaluate_weight_grid(cube, peaks, grid, group['thresholds'], scale=group['scale'],
+                                   tolerance=tolerance, lookback=lookback, workers=workers)
+    results = results.sort_values(['F1', 'Mean_Lead_Days'], ascending=False, na_position='last')
+    results.attrs['pinned'] = pinned
+
+    current_weights = np.array([[current['weights'].get(f, 0.0) for f in group['factors']]])
+    current_results = evaluate_weight_grid(cube, peaks, current_weights, current['thresholds'],
+                                           scale=current.get('scale', group['scale']),
+                                           tolerance=tolerance, lookback=lookback, workers=1)
+    return results.reset_index(drop=True), current_results
+
+def main():
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    df = load_price_frame(DATA_PATH)
+    show_cols = ['Threshold', 'Alerts', 'Precision', 'Recall', 'F1', 'Mean_Lead_Days']
+
+    for name, group in CALIBRATION_GROUPS.items():
+        results, current = calibrate_group(name, df)
+        out_path = os.path.join(REPORTS_DIR, f"score_calibration_{name}.csv")
+        results.to_csv(out_path, index=False)
+
+        print(f"\n🎯 {name} ({', '.join(group['tickers'])}) — {len(results)} weight/threshold pairs")
+        if results.attrs.get('pinned'):
+            print(f"Constant factors pinned to their configured weight: {', '.join(results.attrs['pinned'])}")
+        print("Configured:")
+        print(current.round(3).to_string(index=False))
+        print("Best by F1:")
+        weight_cols = [c for c in results.columns if c.startswith('W_')]
+        print(results.head(5)[weight_cols + show_cols].round(3).to_string(index=False))
+        print(f"✅ Saved to {out_path}")
+
+if __name__ == "__main__":
+    main()
@@ -11,48 +11,46 @@ Detect whether the current day is a likely SGOV peak, using multiple indicators:
 
 Outputs:
 - Dict for GUI integration: date, score, message, SGOV price
-- Logs daily score to: logs/sgov_peak_signals.csv
+- Logs daily score to the signal log store (signals/signals.db),
+  exportable to logs/sgov_peak_signals.csv
 
 Last updated: 2025-06-13
 """
 
-import pandas as pd
-from datetime import datetime, timedelta
-import os
+from utils.data_loader import load_price_frame
+from utils.factor_scoring import SCORER_SGOV, compute_factor_cube, combine_factors, scorer_version
+from utils.signal_log import log_score
 
 ETF = "SGOV"
 PEERS = ["USFR", "TFLO", "SHV", "BIL", "ICSH"]
 LOG_PATH = f"logs/{ETF.lower()}_peak_signals.csv"
 DATA_PATH = "data/etf_prices_2023_2025.csv"
 
+# This scorer targets the last 1–2 calendar days of the month and weights the
+# factors like the USFR scorer, unlike the same-month default in ETF_CONFIG.
+SCORE_OVERRIDES = {ETF: {'score_calendar_days': ((0, 0), (-1, 0))}}
+SCORE_WEIGHTS = {
+    'high_proximity': 0.4,
+    'calendar_window': 0.3,
+    'peer_divergence': 0.2,
+    'macro': 0.1,
+}
+
 def load_data():
-    df = pd.read_csv(DATA_PATH, index_col=0, parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
+    df = load_price_frame(DATA_PATH)
     return df[[ETF] + PEERS].dropna()
 
-def compute_score(today, df):
+def compute_score(today, df, cube=None):
     if today not in df.index:
         return None, "No data for today", None
 
+    if cube is None:
+        cube = compute_factor_cube(df, tickers=[ETF] + PEERS, overrides=SCORE_OVERRIDES)
+    scores = combine_factors(cube, weights={ETF: SCORE_WEIGHTS})
+    row = cube['dates'].get_loc(today)
     today_price = df.loc[today, ETF]
-    recent_window = df.loc[today - timedelta(days=10):today]
-    ten_day_high = recent_window[ETF].max()
-    high_proximity = 1 - ((ten_day_high - today_price) / ten_day_high)
-
-    # Calendar score: peaks expected on last 1–2 days of the month
-    day = today.day
-    month = today.month
-    year = today.year
-    last_day = (today + pd.offsets.MonthEnd(0)).day
-    calendar_score = 1 if day == last_day else 0.5 if day >= last_day - 1 else 0
-
-    peer_mean = df.loc[today, PEERS].mean()
-    divergence = today_price - peer_mean
-    divergence_score = 1 if divergence > 0.05 else 0.5 if divergence > 0.01 else 0
 
-    macro_score = 0.5  # placeholder
-
-    score = round((0.4 * high_proximity + 0.3 * calendar_score + 0.2 * divergence_score + 0.1 * macro_score) * 100, 1)
+    score = round(scores[row, cube['tickers'].index(ETF)], 1)
 
     message = (
         "✅ Likely SGOV Peak" if score >= 75 else
@@ -61,13 +59,11 @@ def compute_score(today, df):
     )
     return score, message, today_price
 
-def log_signal(today, score, message):
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    row = pd.DataFrame([[today.strftime("%Y-%m-%d"), score, message]], columns=["Date", "Score", "Signal"])
-    if os.path.exists(LOG_PATH):
-        row.to_csv(LOG_PATH, mode='a', header=False, index=False)
-    else:
-        row.to_csv(LOG_PATH, index=False)
+def log_signal(today, score, message, price=None):
+    # Upsert keyed by (date, ticker, scorer version): refreshing the dashboard
+    # rewrites today's row instead of appending another one.
+    # LOG_PATH is the legacy CSV; python -m utils.signal_log export writes its layout to logs/export/.
+    log_score(today, ETF, score, message, price, scorer_version=scorer_version(SCORER_SGOV))
 
 def get_sgov_peak_signal():
     df = load_data()
@@ -75,7 +71,7 @@ def get_sgov_peak_signal():
     score, message, price = compute_score(today, df)
 
     if score is not None:
-        log_signal(today, score, message)
+        log_signal(today, score, message, price)
         return {
             "date": today.strftime("%Y-%m-%d"),
             "score": score,
@@ -0,0 +1,269 @@
+# analysis/swing_simulator.py
+
+"""
+Multi-ETF Swing Trade Simulator
+
+Purpose:
+Replay the daily price matrix against the peak / post-peak-low signals in
+signals/*_full_cycles.csv: sell each ETF at its monthly peak, wait for the
+proceeds to settle, and rebuy at the post-peak low. Unlike
+scripts/etf_rotation_backtest.py (which averages a precomputed CSV) this
+actually holds positions and models:
+- T+N settlement: sale proceeds are unavailable for N trading days
+- bid/ask cost: buys fill at price × (1 + half spread), sells at × (1 - half spread)
+- idle cash: settled-but-uninvested and unsettled cash earn `cash_rate` (0 = pure drag)
+
+- distributions: the closes are not adjusted (fetch_etf_data uses
+  auto_adjust=False), so a sleeve holding shares on an ex-date is credited with
+  the distribution in cash. A sleeve that sold at the peak forgoes it, which
+  offsets the ex-date drop it avoided. Buy & hold is reported as total return.
+
+Distributions are estimated from the ex-date drop: the ex-date is the session
+after each Peak_Date in signals/*_full_cycles.csv, and the payout is that
+day's close-to-close drop plus the ticker's median daily accrual.
+
+Capital is split equally into one sleeve per ETF. A buy signal that arrives
+while the sleeve's cash is still settling is executed on the settlement day.
+
+How:
+The simulation steps day by day, but every step updates all strategy variants
+× all ETFs at once with NumPy arrays (no per-row pandas), so thousands of
+cost / settlement / cash-rate variants run in one pass.
+
+Outputs:
+- simulate() -> dict with 'equity' (variants × days), 'ledger' (trade DataFrame),
+  'dates', 'tickers', 'variants'
+- summarize() -> one row per variant: total return, max drawdown, trades, idle cash share
+- main(): writes reports/swing_sim_summary.csv, swing_sim_ledger.csv, swing_sim_equity.csv
+
+Usage:
+    python -m analysis.swing_simulator
+
+Last updated: 2025-06-21
+"""
+
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_price_frame
+from utils.profiling import profiled
+
+DATA_PATH = "data/etf_prices_2023_2025.csv"
+SIGNALS_DIR = "signals"
+REPORTS_DIR = "reports"
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+
+# Default variant grid for main()
+DEFAULT_GRID = {
+    'half_spread_bps': [0.0, 1.0, 2.5, 5.0],
+    'settle_lag': [0, 1, 2],
+    'cash_rate': [0.0, 0.04],
+}
+
+def load_cycle_signals(dates, tickers, signals_dir=SIGNALS_DIR):
+    """
+    Boolean (dates × tickers) sell and buy matrices from *_full_cycles.csv:
+    sell on Peak_Date of completed cycles, buy on every cycle Low_Date.
+    """
+    sells = np.zeros((len(dates), len(tickers)), dtype=bool)
+    buys = np.zeros((len(dates), len(tickers)), dtype=bool)
+    for j, etf in enumerate(tickers):
+        path = os.path.join(signals_dir, f"{etf.lower()}_full_cycles.csv")
+        if not os.path.exists(path):
+            print(f"⚠️ No cycles file for {etf}, holding throughout")
+            continue
+        cycles = pd.read_csv(path)
+        complete = cycles['Cycle_Complete'].astype(str).str.lower() == 'true'
+        sells[:, j] = dates.isin(pd.to_datetime(cycles.loc[complete, 'Peak_Date']))
+        buys[:, j] = dates.isin(pd.to_datetime(cycles['Low_Date']))
+    return sells, buys
+
+def estimate_distributions(prices, signals_dir=SIGNALS_DIR):
+    """
+    Per-share distributions as a (dates × tickers) matrix, non-zero on the
+    ex-dates: the session after each Peak_Date in *_full_cycles.csv. The
+    payout is the ex-date drop plus the ticker's median daily change on
+    other days (the accrual the price would otherwise have added).
+    """
+    dists = np.zeros(prices.shape)
+    for j, etf in enumerate(prices.columns):
+        path = os.path.join(signals_dir, f"{etf.lower()}_full_cycles.csv")
+        if not os.path.exists(path):
+            continue
+        series = prices[etf].dropna()
+        peaks = pd.DatetimeIndex(pd.to_datetime(pd.read_csv(path)['Peak_Date'], errors='coerce').dropna())
+        peak_pos = series.index.get_indexer(peaks)
+        ex_pos = np.unique(peak_pos[(peak_pos >= 0) & (peak_pos + 1 < len(series))] + 1)
+        if not len(ex_pos):
+            continue
+        values = series.to_numpy(dtype=float)
+        change = np.diff(values)
+        accrual = np.median(np.delete(change, ex_pos - 1)) if len(change) > len(ex_pos) else 0.0
+        rows = prices.index.get_indexer(series.index[ex_pos])
+        dists[rows, j] = np.maximum(values[ex_pos - 1] - values[ex_pos] + accrual, 0.0)
+    return dists
+
+def make_variants(**grid):
+    """Cartesian product of parameter lists -> DataFrame, one row per variant."""
+    grid = {**DEFAULT_GRID, **grid}
+    rows = list(itertools.product(*grid.values()))
+    return pd.DataFrame(rows, columns=list(grid))
+
+@profiled()
+def simulate(prices, sells, buys, variants, initial_capital=100_000.0, start_invested=True,
+             distributions=None):
+    """
+    Run every variant over the price matrix.
+
+    Parameters:
+        prices (pd.DataFrame): Date-indexed prices, one column per ETF.
+        sells, buys (np.ndarray): Boolean (dates × tickers) signal matrices.
+        variants (pd.DataFrame): Columns half_spread_bps, settle_lag (trading
+            days), cash_rate (annual, on idle cash).
+        start_invested (bool): Buy every sleeve on the first day.
+        distributions (np.ndarray): Per-share payouts (dates × tickers), e.g. from
+            estimate_distributions(); shares held into a row's date are paid
+            in cash. None = price-only.
+
+    Returns:
+        dict with 'equity' (variants × dates), 'distributions' (cash received
+        per variant), 'ledger', 'dates', 'tickers', 'variants'
+    """
+    px = prices.to_numpy(dtype=float)
+    n_days, n_etfs = px.shape
+    n_var = len(variants)
+
+    half_spread = variants['half_spread_bps'].to_numpy(dtype=float)[:, None] / 10_000
+    lag = variants['settle_lag'].to_numpy(dtype=int)
+    daily_rate = (1 + variants['cash_rate'].to_numpy(dtype=float)[:, None]) ** (1 / 252) - 1
+    ring = int(lag.max()) + 1
+
+    cash = np.full((n_var, n_etfs), initial_capital / n_etfs)
+    shares = np.zeros((n_var, n_etfs))
+    unsettled = np.zeros((ring, n_var, n_etfs))
+    want_buy = np.full((n_var, n_etfs), start_invested)
+    var_idx = np.arange(n_var)
+    received = np.zeros(n_var)
+
+    equity = np.empty((n_var, n_days))
+    idle = np.empty((n_var, n_days))
+    ledger = []
+
+    for d in range(n_days):
+        price = px[d]
+        tradable = ~np.isnan(price)
+
+        # Settle proceeds due today, then accrue interest on idle cash
+        slot = d % ring
+        cash += unsettled[slot]
+        unsettled[slot] = 0.0
+        cash *= 1 + daily_rate
+        unsettled *= 1 + daily_rate[None]
+
+        # Shares held into an ex-date collect the distribution
+        if distributions is not None and distributions[d].any():
+            paid = shares * np.nan_to_num(distributions[d])
+            cash += paid
+            received += paid.sum(axis=1)
+
+        # Sells at the peak: proceeds settle `lag` trading days later
+        sell = sells[d] & tradable & (shares > 0)
+        if sell.any():
+            proceeds = np.where(sell, shares * price * (1 - half_spread), 0.0)
+            target = (d + lag) % ring
+            if (lag == 0).any():
+                now = lag == 0
+                cash[now] += proceeds[now]
+                proceeds[now] = 0.0
+            np.add.at(unsettled, (target[:, None], var_idx[:, None], np.arange(n_etfs)[None, :]), proceeds)
+            v, t = np.nonzero(sell)
+            ledger.append((np.full(len(v), d), v, t, np.full(len(v), -1), price[t], shares[v, t], half_spread[v, 0]))
+            shares[sell] = 0.0
+
+        # Buys at the post-peak low, or as soon as settled cash arrives after one
+        want_buy |= buys[d] & (shares == 0)
+        buy = want_buy & tradable & (cash > 0) & (shares == 0)
+        if buy.any():
+            fill = price * (1 + half_spread)
+            new_shares = np.where(buy, cash / np.where(buy, fill, 1.0), 0.0)
+            v, t = np.nonzero(buy)
+            ledger.append((np.full(len(v), d), v, t, np.full(len(v), 1), price[t], new_shares[v, t], half_spread[v, 0]))
+            shares += new_shares
+            cash[buy] = 0.0
+            want_buy[buy] = False
+
+        holdings = np.nansum(shares * price, axis=1)
+        pending = unsettled.sum(axis=(0, 2))
+        equity[:, d] = holdings + cash.sum(axis=1) + pending
+        idle[:, d] = (cash.sum(axis=1) + pending) / equity[:, d]
+
+    if ledger:
+        days, v, t, side, fill_px, qty, spread = (np.concatenate(x) for x in zip(*ledger))
+        ledger_df = pd.DataFrame({
+            'Variant': v,
+            'Date': prices.index[days],
+            'ETF': np.asarray(prices.columns)[t],
+            'Side': np.where(side > 0, 'BUY', 'SELL'),
+            'Price': fill_px,
+            'Fill_Price': fill_px * (1 + side * spread),
+            'Shares': qty,
+            'Cost': fill_px * spread * qty,
+        }).sort_values(['Variant', 'Date', 'ETF'], kind='stable').reset_index(drop=True)
+    else:
+        ledger_df = pd.DataFrame(columns=['Variant', 'Date', 'ETF', 'Side', 'Price', 'Fill_Price', 'Shares', 'Cost'])
+
+    return {
+        'equity': equity,
+        'distributions': received,
+        'idle_share': idle,
+        'ledger': ledger_df,
+        'dates': prices.index,
+        'tickers': list(prices.columns),
+        'variants': variants.reset_index(drop=True),
+    }
+
+def summarize(result, initial_capital=100_000.0):
+    """One row per variant: parameters, final equity, return, drawdown, trades, distributions, idle cash."""
+    equity = result['equity']
+    running_max = np.maximum.accumulate(equity, axis=1)
+    summary = result['variants'].copy()
+    summary['Final_Equity'] = equity[:, -1].round(2)
+    summary['Total_Return_%'] = ((equity[:, -1] / initial_capital - 1) * 100).round(3)
+    summary['Max_Drawdown_%'] = ((equity / running_max - 1).min(axis=1) * 100).round(3)
+    summary['Trades'] = result['ledger'].groupby('Variant').size().reindex(summary.index, fill_value=0).to_numpy()
+    summary['Distributions'] = result['distributions'].round(2)
+    summary['Avg_Idle_Cash_%'] = (result['idle_share'].mean(axis=1) * 100).round(2)
+    return summary
+
+def main():
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    df = load_price_frame(DATA_PATH)
+    tickers = [etf for etf in ETF_LIST if etf in df.columns]
+    prices = df[tickers]
+    sells, buys = load_cycle_signals(prices.index, tickers)
+
+    dists = estimate_distributions(prices)
+
+    variants = make_variants()
+    result = simulate(prices, sells, buys, variants, distributions=dists)
+    summary = summarize(result)
+
+    # Buy & hold: the same simulator with no signals, no costs and no cash interest
+    never = np.zeros(sells.shape, dtype=bool)
+    hold = simulate(prices, never, never, make_variants(half_spread_bps=[0.0], settle_lag=[0], cash_rate=[0.0]),
+                    distributions=dists)
+    hold_return = summarize(hold)['Total_Return_%'].iloc[0]
+    print(f"📊 Buy & hold (equal weight, total return): {hold_return:.3f}%")
+    print(summary.sort_values('Total_Return_%', ascending=False).head(10).to_string(index=False))
+
+    summary.to_csv(os.path.join(REPORTS_DIR, "swing_sim_summary.csv"), index=False)
+    result['ledger'].to_csv(os.path.join(REPORTS_DIR, "swing_sim_ledger.csv"), index=False)
+    pd.DataFrame(result['equity'].T, index=prices.index).round(2).to_csv(
+        os.path.join(REPORTS_DIR, "swing_sim_equity.csv"))
+    print(f"✅ {len(variants)} variants simulated. Reports saved to {REPORTS_DIR}/swing_sim_*.csv")
+
+if __name__ == "__main__":
+    main()
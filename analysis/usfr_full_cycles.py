@@ -18,15 +18,17 @@ Adds:
 
 import pandas as pd
 from datetime import timedelta
+from utils.data_loader import load_price_frame
+from utils.fixed_point import extreme_dates, to_fixed
+from utils.profiling import profiled
 
 def load_usfr_data(csv_path="data/etf_prices_2023_2025.csv"):
     """
     Load USFR price series from a CSV file.
     Returns a DataFrame with datetime index and 'USFR' price column.
+    Quarantined ranges (utils/data_quality.py) are left out.
     """
-    df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
-    return df[["USFR"]].dropna()
+    return load_price_frame(csv_path)[["USFR"]].dropna()
 
 def compute_peak_signal_strength(df, peak_day):
     """
@@ -41,6 +43,7 @@ def compute_peak_signal_strength(df, peak_day):
     peak_price = df.loc[peak_day]["USFR"]
     return round((high_10d - peak_price) / high_10d * 100, 3)
 
+@profiled()
 def detect_usfr_full_cycles(df):
     """
     Scans for valid low-to-peak cycles using monthly patterns.
@@ -67,22 +70,23 @@ def detect_usfr_full_cycles(df):
             continue
 
         # Detect low and peak
-        low_price = late_month1["USFR"].min()
-        low_day = late_month1[late_month1["USFR"] == low_price].index.min()
+        # Ties and comparisons in 1/10,000-dollar ticks (utils/fixed_point.py)
+        low_price, low_days = extreme_dates(late_month1["USFR"], 'min')
+        low_day = low_days.min()
 
-        peak_price = mid_late_month2["USFR"].max()
-        peak_day = mid_late_month2[mid_late_month2["USFR"] == peak_price].index.max()
+        peak_price, peak_days = extreme_dates(mid_late_month2["USFR"], 'max')
+        peak_day = peak_days.max()
 
         if (peak_day - low_day).days < 10:
             continue
 
         post_low_window = df[(df.index >= low_day) & (df.index <= low_day + timedelta(days=2))]
-        if low_price != post_low_window["USFR"].min():
+        if to_fixed(low_price) != to_fixed(post_low_window["USFR"].min()):
             continue
 
         future_days = df[(df.index > peak_day) & (df.index <= peak_day + timedelta(days=2))]
         cycle_complete = True
-        if not future_days.empty and future_days["USFR"].max() >= peak_price:
+        if not future_days.empty and to_fixed(future_days["USFR"].max()) >= to_fixed(peak_price):
             cycle_complete = False
 
         if peak_day.month == latest_date.month and peak_day.year == latest_date.year:
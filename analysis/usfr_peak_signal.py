@@ -12,7 +12,8 @@ Detect whether the current day is a likely USFR peak, using multiple indicators:
 
 Outputs:
 - Dict for GUI integration: date, score, message, USFR price
-- Logs daily score and signal to: logs/usfr_peak_signals.csv
+- Logs daily score and signal to the signal log store (signals/signals.db),
+  exportable to logs/usfr_peak_signals.csv
 
 Usage:
 - Import get_usfr_peak_signal() from this file for GUI display
@@ -21,42 +22,35 @@ Usage:
 Last updated: 2025-06-13
 """
 
-import pandas as pd
-from datetime import datetime, timedelta
-import os
+from utils.data_loader import load_price_frame
+from utils.factor_scoring import SCORER_USFR, compute_factor_cube, combine_factors, scorer_version
+from utils.signal_log import log_score
 
 ETF_PEERS = ["SGOV", "TFLO", "SHV", "BIL", "ICSH"]
 LOG_PATH = "logs/usfr_peak_signals.csv"
 DATA_PATH = "data/etf_prices_2023_2025.csv"
 
 def load_data():
-    df = pd.read_csv(DATA_PATH, index_col=0, parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
+    df = load_price_frame(DATA_PATH)
     return df[["USFR"] + ETF_PEERS].dropna()
 
-def compute_score(today, df):
+def compute_score(today, df, cube=None):
+    """
+    Score `today` with the shared factor cube (weights from ETF_CONFIG['USFR']):
+    0.4 high proximity + 0.3 calendar window (18–25) + 0.2 peer divergence + 0.1 macro.
+    Pass a precomputed `cube` to score several days without recomputing factors.
+    """
     if today not in df.index:
         return None, "No data for today", None
 
+    if cube is None:
+        cube = compute_factor_cube(df, tickers=["USFR"] + ETF_PEERS)
+    scores = combine_factors(cube)
+    row = cube['dates'].get_loc(today)
     today_price = df.loc[today, "USFR"]
-    recent_window = df.loc[today - timedelta(days=10):today]
-    ten_day_high = recent_window["USFR"].max()
-    high_proximity = 1 - ((ten_day_high - today_price) / ten_day_high)
-
-    # Calendar timing score
-    day = today.day
-    calendar_score = 1 if 18 <= day <= 25 else 0.5 if 15 <= day <= 27 else 0
-
-    # ETF divergence score
-    peer_mean = df.loc[today, ETF_PEERS].mean()
-    divergence = today_price - peer_mean
-    divergence_score = 1 if divergence > 0.05 else 0.5 if divergence > 0.01 else 0
-
-    # Placeholder for reverse repo or macro score
-    rrp_score = 0.5
 
     # Weighted total score
-    score = round((0.4 * high_proximity + 0.3 * calendar_score + 0.2 * divergence_score + 0.1 * rrp_score) * 100, 1)
+    score = round(scores[row, cube['tickers'].index("USFR")], 1)
 
     message = (
         "✅ Likely USFR Peak" if score >= 75 else
@@ -65,13 +59,11 @@ def compute_score(today, df):
     )
     return score, message, today_price
 
-def log_signal(today, score, message):
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    row = pd.DataFrame([[today.strftime("%Y-%m-%d"), score, message]], columns=["Date", "Score", "Signal"])
-    if os.path.exists(LOG_PATH):
-        row.to_csv(LOG_PATH, mode='a', header=False, index=False)
-    else:
-        row.to_csv(LOG_PATH, index=False)
+def log_signal(today, score, message, price=None):
+    # Upsert keyed by (date, ticker, scorer version): refreshing the dashboard
+    # rewrites today's row instead of appending another one.
+    # LOG_PATH is the legacy CSV; python -m utils.signal_log export writes its layout to logs/export/.
+    log_score(today, "USFR", score, message, price, scorer_version=scorer_version(SCORER_USFR))
 
 def get_usfr_peak_signal():
     df = load_data()
@@ -79,7 +71,7 @@ def get_usfr_peak_signal():
     score, message, price = compute_score(today, df)
 
     if score is not None:
-        log_signal(today, score, message)
+        log_signal(today, score, message, price)
         return {
             "date": today.strftime("%Y-%m-%d"),
             "score": score,
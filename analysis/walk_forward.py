@@ -0,0 +1,312 @@
+# analysis/walk_forward.py
+
+"""
+Walk-Forward Evaluation of the Cycle Detection Parameters
+
+Purpose:
+ETF_CONFIG (peak_day_range, post_peak_low_days) and REB_THRESHOLDS in
+utils/peak_detection.py were chosen on the same 2023–2025 window they are
+judged on. This refits them on rolling training windows and scores only the
+following, unseen months, next to the static configured values.
+
+How:
+- Realized monthly cycles come straight from the price matrix: the month's
+  highest close (last occurrence, as in find_post_peak_peaks), the 10-day low
+  before it, and the lowest close in the `horizon` trading days after it.
+  All months × tickers are computed at once with NumPy (reduceat / sliding windows).
+- Fitted per ETF on each training window:
+    peak_day_range     shortest day range holding `coverage` of the training peaks
+                       (calendar days for USFR-style configs, trading days
+                       relative to month end for the (-3, 0) style)
+    rebound threshold  `threshold_quantile` of the training rebounds
+    post_peak_low_days median trading days from peak to post-peak low
+- Test metrics per (ETF, month), fitted and static:
+    In_Window         realized peak fell inside the peak window
+    Window_Gap_bps    month high minus best close inside the window, in bps
+    Detected          rebound clears the threshold (month would be reported)
+    Low_Day_Error     realized minus predicted post-peak low offset, trading days
+- Folds run in a process pool. The price matrix is saved once as a .npy file and
+  every worker memory-maps it read-only, so the universe is never copied per fold.
+
+Outputs:
+- reports/walk_forward/fold_<NN>_<test start>.csv: per (ETF, month) drill-down
+- reports/walk_forward/summary.csv: per fold and ETF averages and fitted parameters
+
+Usage:
+    python -m analysis.walk_forward [--train-months 12] [--test-months 3] [--workers 4]
+
+Last updated: 2025-06-22
+"""
+
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config.etf_parameters import ETF_CONFIG
+from utils.data_loader import load_price_frame
+from utils.peak_detection import REB_THRESHOLDS
+
+DATA_PATH = "data/etf_prices_2023_2025.csv"
+OUTPUT_DIR = "reports/walk_forward"
+
+LOOKBACK_DAYS = 10      # pre-peak low window, as in find_post_peak_peaks
+HORIZON_DAYS = 10       # post-peak low search window
+DEFAULT_STATIC = {'peak_day_range': (-3, 0), 'post_peak_low_days': 3, 'rebound': 0.00075}
+
+def static_parameters(etf):
+    """Configured parameters for an ETF (ETF_CONFIG + REB_THRESHOLDS)."""
+    config = ETF_CONFIG.get(etf, DEFAULT_STATIC)
+    return {
+        'peak_day_range': tuple(config['peak_day_range']),
+        'post_peak_low_days': config['post_peak_low_days'],
+        'rebound': REB_THRESHOLDS.get(etf, DEFAULT_STATIC['rebound']),
+    }
+
+def _month_label(month_id):
+    return f"{int(month_id) // 12}-{int(month_id) % 12 + 1:02d}"
+
+def _uses_calendar_days(etf):
+    return static_parameters(etf)['peak_day_range'][0] >= 1
+
+def month_table(values, dates, tickers, lookback=LOOKBACK_DAYS, horizon=HORIZON_DAYS):
+    """
+    Realized monthly cycle features for every (month, ticker).
+
+    Parameters:
+        values (np.ndarray): (dates × tickers) closes, NaN where missing.
+        dates (pd.DatetimeIndex): Trading dates, ascending.
+
+    Returns:
+        dict of (months × tickers) arrays plus 'month_ids', 'starts', 'ends'
+        (row ranges per month), 'day' and 'offset' (per-row calendar day and
+        trading-day offset from month end).
+    """
+    n_rows = len(dates)
+    month_ids = np.asarray(dates.year) * 12 + np.asarray(dates.month) - 1
+    starts = np.flatnonzero(np.r_[True, month_ids[1:] != month_ids[:-1]])
+    ends = np.r_[starts[1:], n_rows]
+    lengths = ends - starts
+    rows = np.arange(n_rows)
+
+    # Month high and its last occurrence
+    peak = np.fmax.reduceat(values, starts, axis=0)
+    is_peak = values == np.repeat(peak, lengths, axis=0)
+    peak_row = np.maximum.reduceat(np.where(is_peak, rows[:, None], -1), starts, axis=0)
+    valid = peak_row >= 0
+    safe_row = np.maximum(peak_row, 0)
+    cols = np.arange(values.shape[1])[None, :]
+
+    # Low over the `lookback` rows before the peak (at least 5 rows)
+    prior_low = pd.DataFrame(values).shift(1).rolling(lookback, min_periods=5).min().to_numpy()
+    low = prior_low[safe_row, cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rebound = (peak - low) / low
+
+    # Lowest close in the `horizon` rows after the peak
+    padded = np.vstack([values[1:], np.full((horizon, values.shape[1]), np.nan)])
+    ahead = sliding_window_view(padded, horizon, axis=0)          # (rows, tickers, horizon)
+    after = ahead[safe_row, cols]                                 # (months, tickers, horizon)
+    has_after = ~np.isnan(after).all(axis=2)
+    low_offset = np.argmin(np.where(np.isnan(after), np.inf, after), axis=2) + 1
+
+    offset = rows - np.repeat(ends - 1, lengths)
+    return {
+        'month_ids': month_ids[starts],
+        'starts': starts,
+        'ends': ends,
+        'day': np.asarray(dates.day),
+        'offset': offset,
+        'peak': peak,
+        'peak_row': np.where(valid, peak_row, -1),
+        'peak_day': np.where(valid, np.asarray(dates.day)[safe_row], -1),
+        'peak_offset': np.where(valid, offset[safe_row], 0),
+        'rebound': np.where(valid, rebound, np.nan),
+        'post_low_offset': np.where(valid & has_after, low_offset, -1),
+        'complete': valid & (peak_row + horizon < n_rows),
+    }
+
+def _shortest_range(positions, coverage):
+    """Shortest [lo, hi] holding at least `coverage` of the positions."""
+    positions = np.sort(positions)
+    k = max(int(np.ceil(coverage * len(positions))), 1)
+    widths = positions[k - 1:] - positions[:len(positions) - k + 1]
+    i = int(np.argmin(widths))
+    return int(positions[i]), int(positions[i + k - 1])
+
+def fit_parameters(table, col, month_mask, calendar, coverage=0.8, threshold_quantile=0.1):
+    """Fit one ticker's parameters on the training months (None if too few months)."""
+    use = month_mask & table['complete'][:, col]
+    if use.sum() < 3:
+        return None
+    positions = (table['peak_day'] if calendar else table['peak_offset'])[use, col]
+    rebounds = table['rebound'][use, col]
+    low_offsets = table['post_low_offset'][use, col]
+    return {
+        'peak_day_range': _shortest_range(positions, coverage),
+        'post_peak_low_days': int(np.median(low_offsets[low_offsets > 0])) if (low_offsets > 0).any() else 0,
+        'rebound': float(np.nanquantile(rebounds, threshold_quantile)),
+    }
+
+def score_parameters(values, table, col, month_mask, params, calendar):
+    """Out-of-sample metrics of one parameter set for one ticker, per test month."""
+    lo, hi = params['peak_day_range']
+    position = table['day'] if calendar else table['offset']
+    in_range = (position >= lo) & (position <= hi)
+    window_high = np.fmax.reduceat(np.where(in_range, values[:, col], np.nan), table['starts'])
+
+    peak = table['peak'][:, col]
+    peak_pos = (table['peak_day'] if calendar else table['peak_offset'])[:, col]
+    low_offset = table['post_low_offset'][:, col]
+    with np.errstate(invalid='ignore'):
+        gap = (peak - window_high) / peak * 10_000
+    return {
+        'In_Window': ((peak_pos >= lo) & (peak_pos <= hi))[month_mask],
+        'Window_Gap_bps': gap[month_mask],
+        'Detected': (table['rebound'][:, col] >= params['rebound'])[month_mask],
+        'Low_Day_Error': np.where(low_offset > 0, low_offset - params['post_peak_low_days'], np.nan)[month_mask],
+    }
+
+def _run_fold(store_path, dates, tickers, fold, options):
+    """Process-pool worker: fit on the fold's training months, score its test months."""
+    values = np.load(store_path, mmap_mode='r')
+    lookback, horizon = options['lookback'], options['horizon']
+
+    # Rows of the fold, with room for the pre-peak lookback and post-peak horizon
+    first = max(fold['row_start'] - lookback, 0)
+    last = min(fold['row_end'] + horizon, len(dates))
+    block = np.asarray(values[first:last], dtype=float)
+    block_dates = dates[first:last]
+    table = month_table(block, block_dates, tickers, lookback, horizon)
+
+    train = np.isin(table['month_ids'], fold['train_months'])
+    test = np.isin(table['month_ids'], fold['test_months'])
+    # Fit only on months whose post-peak horizon ends inside the training rows:
+    # the last training peaks would otherwise read their lows from the test fold
+    train_end = table['ends'][train].max() if train.any() else 0
+    fit_months = train[:, None] & (table['peak_row'] >= 0) & (table['peak_row'] + horizon < train_end)
+    test_labels = [_month_label(m) for m in table['month_ids'][test]]
+
+    frames, summary = [], []
+    for col, etf in enumerate(tickers):
+        calendar = _uses_calendar_days(etf)
+        static = static_parameters(etf)
+        fitted = fit_parameters(table, col, fit_months[:, col], calendar, options['coverage'],
+                                options['threshold_quantile'])
+        if fitted is None:
+            continue
+        fit_metrics = score_parameters(block, table, col, test, fitted, calendar)
+        static_metrics = score_parameters(block, table, col, test, static, calendar)
+
+        frame = pd.DataFrame({'Fold': fold['fold'], 'ETF': etf, 'Month': test_labels})
+        frame = frame.assign(**fit_metrics, **{f'Static_{k}': v for k, v in static_metrics.items()})
+        frames.append(frame)
+
+        row = {
+            'Fold': fold['fold'], 'ETF': etf,
+            'Train_Start': fold['train_label'][0], 'Train_End': fold['train_label'][1],
+            'Test_Start': fold['test_label'][0], 'Test_End': fold['test_label'][1],
+            'Fit_Peak_Day_Range': str(fitted['peak_day_range']),
+            'Fit_Rebound_%': round(fitted['rebound'] * 100, 4),
+            'Fit_Post_Peak_Low_Days': fitted['post_peak_low_days'],
+        }
+        for prefix, metrics in (('', fit_metrics), ('Static_', static_metrics)):
+            row[f'{prefix}In_Window_%'] = np.mean(metrics['In_Window']) * 100
+            row[f'{prefix}Window_Gap_bps'] = np.nanmean(metrics['Window_Gap_bps'])
+            row[f'{prefix}Detected_%'] = np.mean(metrics['Detected']) * 100
+            row[f'{prefix}Low_Day_MAE'] = np.nanmean(np.abs(metrics['Low_Day_Error']))
+        summary.append(row)
+
+    if frames:
+        path = os.path.join(options['output_dir'], f"fold_{fold['fold']:02d}_{fold['test_label'][0]}.csv")
+        pd.concat(frames, ignore_index=True).round(4).to_csv(path, index=False)
+    return summary
+
+def make_folds(dates, train_months=12, test_months=3, step=None):
+    """Rolling (train, test) month windows over the complete months of the index."""
+    step = step or test_months
+    month_ids = np.asarray(dates.year) * 12 + np.asarray(dates.month) - 1
+    months = np.unique(month_ids)
+    # Drop a trailing month whose data stops before its last business day
+    if dates[-1] < dates[-1] + pd.offsets.BMonthEnd(0):
+        months = months[:-1]
+
+    folds = []
+    for i in range(0, len(months) - train_months - test_months + 1, step):
+        train = months[i:i + train_months]
+        test = months[i + train_months:i + train_months + test_months]
+        rows = np.flatnonzero(np.isin(month_ids, np.r_[train, test]))
+        folds.append({
+            'fold': len(folds),
+            'train_months': train,
+            'test_months': test,
+            'row_start': int(rows[0]),
+            'row_end': int(rows[-1]) + 1,
+            'train_label': (_month_label(train[0]), _month_label(train[-1])),
+            'test_label': (_month_label(test[0]), _month_label(test[-1])),
+        })
+    return folds
+
+def walk_forward(prices, train_months=12, test_months=3, step=None, coverage=0.8,
+                 threshold_quantile=0.1, output_dir=OUTPUT_DIR, workers=None,
+                 lookback=LOOKBACK_DAYS, horizon=HORIZON_DAYS):
+    """
+    Run every fold over the price matrix in a process pool.
+
+    Parameters:
+        prices (pd.DataFrame): Date-indexed closes, one column per ticker.
+        workers (int): Process pool size (default: os.cpu_count()).
+
+    Returns:
+        DataFrame: one summary row per (fold, ETF); per-month detail is
+        written to `output_dir`.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    dates = prices.index
+    tickers = list(prices.columns)
+    folds = make_folds(dates, train_months, test_months, step)
+    options = {'coverage': coverage, 'threshold_quantile': threshold_quantile,
+               'output_dir': output_dir, 'lookback': lookback, 'horizon': horizon}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "prices.npy")
+        np.save(store_path, prices.to_numpy(dtype=float))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_fold, [store_path] * len(folds), [dates] * len(folds),
+                                    [tickers] * len(folds), folds, [options] * len(folds)))
+
+    rows = [row for fold_rows in results for row in fold_rows]
+    return pd.DataFrame(rows).round(3)
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of cycle detection parameters")
+    parser.add_argument('--train-months', type=int, default=12)
+    parser.add_argument('--test-months', type=int, default=3)
+    parser.add_argument('--step', type=int, default=None, help="Months between folds (default: test months)")
+    parser.add_argument('--coverage', type=float, default=0.8, help="Share of training peaks the window must hold")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    df = load_price_frame(DATA_PATH)
+    prices = df[[c for c in df.columns if not c.endswith('_Volume')]]
+    summary = walk_forward(prices, args.train_months, args.test_months, args.step,
+                           args.coverage, output_dir=args.output_dir, workers=args.workers)
+    if summary.empty:
+        print("⚠️ Not enough history for a single fold.")
+        return
+
+    summary_path = os.path.join(args.output_dir, "summary.csv")
+    summary.to_csv(summary_path, index=False)
+
+    metric_cols = [c for c in summary.columns if c.endswith(('_%', '_bps', '_MAE')) and not c.startswith('Fit_')]
+    print(f"📊 {summary['Fold'].nunique()} folds, out-of-sample averages (fitted vs static):")
+    print(summary.groupby('ETF')[metric_cols].mean().round(2).to_string())
+    print(f"✅ Saved {summary_path} and per-fold detail in {args.output_dir}/")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,25 @@
 # backup_full_cycles.py
 """
-Here’s a simple Python script snippet you can run before your batch updates that:
+Snapshots the *_full_cycles.csv files in the signals folder before batch updates.
 
-Finds all *_full_cycles.csv files in your signals folder
-
-Copies them to a backup folder with a timestamp suffix so you can restore if needed
+Backups go to the content-addressed snapshot store (utils/snapshots.py): a
+file is stored once per distinct version, compressed, so running this when
+nothing changed adds nothing. Restore with
+    python -m utils.snapshots restore <id>
+The old timestamped copies in backup_full_cycles/ are left as they are.
 """
 import os
-import shutil
-from datetime import datetime
-
-def backup_full_cycles(source_dir='signals', backup_dir='backup_full_cycles'):
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backed_up_files = []
 
-    for filename in os.listdir(source_dir):
-        if filename.endswith('_full_cycles.csv'):
-            src_path = os.path.join(source_dir, filename)
-            backup_filename = f"{filename.replace('.csv', '')}_{timestamp}.csv"
-            backup_path = os.path.join(backup_dir, backup_filename)
-            shutil.copy2(src_path, backup_path)
-            backed_up_files.append(backup_filename)
+from utils.snapshots import SNAPSHOT_DIR, take_snapshot
 
-    print(f"Backed up {len(backed_up_files)} files to {backup_dir}:")
-    for f in backed_up_files:
+def backup_full_cycles(source_dir='signals', store=SNAPSHOT_DIR):
+    manifest = take_snapshot([os.path.join(source_dir, '*_full_cycles.csv')], label='full_cycles',
+                             store=store, quiet=True)
+    state = "New snapshot" if manifest['new'] else "Same files as snapshot"
+    print(f"{state} {manifest['id']} ({len(manifest['files'])} files, {manifest['stored']} new objects):")
+    for f in manifest['files']:
         print(f"  - {f}")
+    return manifest
 
 if __name__ == "__main__":
     backup_full_cycles()
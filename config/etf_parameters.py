@@ -5,6 +5,12 @@ The full ETF_CONFIG dictionary for all 6 ETFs with their parameters,
 
 The helper function get_peak_day_window() that interprets the peak_day_range config for 
 both positive (calendar day) and negative (relative to last trading day) ranges.
+
+Peak score settings (used by utils/factor_scoring.py):
+- 'score_calendar_days': ((full_start, full_end), (half_start, half_end)) calendar-day
+  windows scoring 1 / 0.5 for the calendar factor. Ranges starting at 0 or below are
+  relative to the last calendar day of the month (e.g. (-1, 0) = last two days).
+- 'score_weights': factor name -> weight; the weighted sum is scaled to 0–100.
 """
 
 import pandas as pd
@@ -14,34 +20,65 @@ ETF_CONFIG = {
         'peak_day_range': (18, 25),   # calendar days in month
         'post_peak_low_days': 6,
         'peak_validation': True,
+        'score_calendar_days': ((18, 25), (15, 27)),
+        'score_weights': {
+            'high_proximity': 0.4,
+            'calendar_window': 0.3,
+            'peer_divergence': 0.2,
+            'macro': 0.1,
+        },
     },
     'SGOV': {
         'peak_day_range': (-3, 0),    # last 3 trading days of month (relative)
         'post_peak_low_days': 3,
         'peak_validation': False,
+        'score_calendar_days': ((27, 31), (25, 31)),
+        'score_weights': {'high_proximity': 0.7, 'calendar_window': 0.3},
     },
     'TFLO': {
         'peak_day_range': (-3, 0),
         'post_peak_low_days': 3,
         'peak_validation': False,
+        'score_calendar_days': ((27, 31), (25, 31)),
+        'score_weights': {'high_proximity': 0.7, 'calendar_window': 0.3},
     },
     'BIL': {
         'peak_day_range': (-3, 0),
         'post_peak_low_days': 3,
         'peak_validation': False,
+        'score_calendar_days': ((27, 31), (25, 31)),
+        'score_weights': {'high_proximity': 0.7, 'calendar_window': 0.3},
     },
     'SHV': {
         'peak_day_range': (-3, 0),
         'post_peak_low_days': 3,
         'peak_validation': False,
+        'score_calendar_days': ((27, 31), (25, 31)),
+        'score_weights': {'high_proximity': 0.7, 'calendar_window': 0.3},
     },
     'ICSH': {
         'peak_day_range': (-3, 0),
         'post_peak_low_days': 3,
         'peak_validation': False,
+        'score_calendar_days': ((27, 31), (25, 31)),
+        'score_weights': {'high_proximity': 0.7, 'calendar_window': 0.3},
     }
 }
 
+# Fallback score settings for tickers without an ETF_CONFIG entry
+DEFAULT_SCORE_CONFIG = {
+    'score_calendar_days': ((27, 31), (25, 31)),
+    'score_weights': {'high_proximity': 0.7, 'calendar_window': 0.3},
+}
+
+def get_score_config(etf_symbol):
+    """
+    Returns the peak score settings ('score_calendar_days', 'score_weights')
+    for an ETF, falling back to DEFAULT_SCORE_CONFIG for unknown symbols.
+    """
+    config = ETF_CONFIG.get(etf_symbol.upper(), {})
+    return {key: config.get(key, default) for key, default in DEFAULT_SCORE_CONFIG.items()}
+
 def get_peak_day_window(df, etf_symbol):
     """
     Given a DataFrame with a DateTimeIndex and an ETF symbol,
@@ -23,17 +23,17 @@ etf_dashboard.py, updated 6/15/25 with requested enhancements
 
 import tkinter as tk
 from tkinter import messagebox
-import subprocess
 import threading
 import csv
 from datetime import datetime, date
-from dateutil import parser
 from analysis.usfr_peak_signal import get_usfr_peak_signal
 from scripts.peak_signal_score import get_all_peak_scores
 from scripts.analyze_signals import check_etf_signal_with_countdown
 from scripts.usfr_post_peak_lows import run_usfr_post_peak_lows
 from analysis.usfr_full_cycles import run_usfr_full_cycles
+from scripts.update_modal_days import update_all_modal_days
 from utils.usfr_estimate_peak_value import estimate_usfr_peak_value
+from utils.signal_db import consume_changes, last_positive_gain_peak, sync_csv
 
 ETFS = ['USFR', 'SGOV', 'BIL', 'SHV', 'TFLO', 'ICSH']
 SIGNALS = ["Low", "Peak", "Both"]
@@ -51,31 +51,36 @@ def get_latest_price(etf):
         return None
 
 def find_last_valid_peak_from_csv(etf):
-    csv_path = f"signals/{etf.lower()}_full_cycles.csv"
-    try:
-        with open(csv_path, newline='') as csvfile:
-            reader = list(csv.DictReader(csvfile))
-            if reader:
-                first_row = reader[0]
-                if 'Cycle_Start_Month' in first_row and 'Cycle_Month' not in first_row:
-                    for row in reader:
-                        row['Cycle_Month'] = row.pop('Cycle_Start_Month')
-            for row in reversed(reader):
-                try:
-                    if float(row['Gain_%']) > 0:
-                        dt = parser.parse(row['Peak_Date'])
-                        peak_date_fmt = dt.strftime('%-m/%-d/%y')
-                        return {
-                            'Cycle_Month': row['Cycle_Month'],
-                            'Peak_Date': peak_date_fmt,
-                            'Peak': row['Peak'],
-                            'Gain_%': row['Gain_%']
-                        }
-                except:
-                    continue
-    except FileNotFoundError:
+    # Indexed lookup in signals/signals.db (re-synced from the CSV when it changed)
+    row = last_positive_gain_peak(etf)
+    if row is None:
         return None
-    return None
+    return {
+        'Cycle_Month': row['month'],
+        'Peak_Date': datetime.strptime(row['peak_date'], '%Y-%m-%d').strftime('%-m/%-d/%y'),
+        'Peak': str(row['peak']),
+        'Gain_%': str(row['gain_pct'])
+    }
+
+# (etf, signal) -> (day computed, countdown info); an ETF's entries are
+# dropped when the signal store logs a change to its cycles
+_countdowns = {}
+
+def invalidate_changed_countdowns(etfs):
+    for etf in etfs:
+        sync_csv(f"signals/{etf.lower()}_full_cycles.csv")
+    changed = set(consume_changes('dashboard', table='cycles')['ticker'])
+    for key in [k for k in _countdowns if k[0] in changed]:
+        del _countdowns[key]
+
+def cached_countdown(etf, signal):
+    today = date.today()
+    hit = _countdowns.get((etf, signal))
+    if hit and hit[0] == today:
+        return hit[1]
+    info = check_etf_signal_with_countdown(etf, signal)
+    _countdowns[(etf, signal)] = (today, info)
+    return info
 
 def format_date_dmy(dt):
     return dt.strftime('%a %m/%d/%y')
@@ -96,15 +101,16 @@ def run_analysis():
 
     low_days_list, peak_days_list = [], []
     low_info_dict, peak_info_dict = {}, {}
+    invalidate_changed_countdowns(selected_etfs)
 
     for etf in selected_etfs:
         if selected_signal in ["Peak", "Both"]:
-            peak_info = check_etf_signal_with_countdown(etf, "Peak")
+            peak_info = cached_countdown(etf, "Peak")
             peak_info_dict[etf] = peak_info
             peak_days_list.append(peak_info.get('days_until', 9999))
 
         if selected_signal in ["Low", "Both"]:
-            low_info = check_etf_signal_with_countdown(etf, "Low")
+            low_info = cached_countdown(etf, "Low")
             low_info_dict[etf] = low_info
             low_days_list.append(low_info.get('days_until', 9999))
 
@@ -159,9 +165,14 @@ def display_usfr_peak_estimate():
     except Exception as e:
         right_text.insert(tk.END, f"\n[Estimation Error] {e}\n")
 
+def fetch_prices():
+    # Imported on demand: yfinance is only needed when refreshing
+    from scripts.fetch_etf_data import main as fetch_main
+    fetch_main()
+
 def refresh_data():
     try:
-        subprocess.run(["python", "scripts/fetch_etf_data.py"], check=True)
+        fetch_prices()
         timestamp = datetime.now().strftime("%a %m/%d/%y %H:%M:%S")
         last_updated_label.config(text=f"Last data refresh: {timestamp}")
         messagebox.showinfo("Success", "ETF data refreshed.")
@@ -175,7 +186,7 @@ def refresh_data_background():
 def update_modal_days_background():
     def _update():
         try:
-            subprocess.run(["python", "scripts/update_modal_days.py"], check=True)
+            update_all_modal_days()
         except Exception as e:
             print(f"[Modal Update Error] {e}")
     threading.Thread(target=_update, daemon=True).start()
@@ -183,7 +194,7 @@ def update_modal_days_background():
 def auto_refresh_on_startup():
     def _refresh():
         try:
-            subprocess.run(["python", "scripts/fetch_etf_data.py"], check=True)
+            fetch_prices()
             timestamp = datetime.now().strftime("%a %m/%d/%y %H:%M:%S")
             last_updated_label.config(text=f"Last data refresh: {timestamp}")
         except Exception as e:
@@ -1,17 +1,10 @@
 # main.py
-from datetime import datetime
-from scripts.analyze_lows import check_low
-from scripts.analyze_peaks import check_peak
+# Entry point for the ETF signal command line (subcommands in utils/cli.py).
+# With no subcommand it prints today's low / peak checks for all 6 ETFs:
+#     python main.py [report | fetch | detect | score | countdown | backtest | bench | serve] ...
+import sys
 
-etfs = ["USFR", "SGOV", "BIL", "SHV", "TFLO", "ICSH"]
+from utils.cli import main
 
-print("🚀 Script started")
-print(f"📆 Today is: {datetime.today().date()}\n")
-
-for etf in etfs:
-    print(f"\n🔍 Checking LOW signal for {etf}...")
-    print(check_low(etf))
-
-for etf in etfs:
-    print(f"\n🔍 Checking PEAK signal for {etf}...")
-    print(check_peak(etf))
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,70 +1,212 @@
-""" new file to analyze rotations 
-analyze_rotations.py"""
+"""
+scripts/analyze_rotations.py
+Vectorized USFR-peak rotation backtest
+Updated: 2025-06-21
+
+Purpose:
+--------
+After USFR peaks (around the 18th–25th) the proceeds are rotated into another
+Treasury ETF. This backtest measures, for every month and every rotation
+candidate, the return between a configurable entry day and exit day.
+
+Inputs:
+-------
+- data/etf_prices_2023_2025.csv            (daily prices, one column per ETF)
+- signals/usfr_full_cycles.csv             (USFR Low_Date / Peak_Date per completed cycle)
+- signals/<etf>_full_cycles.csv            (candidate low dates, for 'modal_low')
+
+Entry / exit rules:
+-------------------
+- 'usfr_peak':  the USFR peak day of the cycle
+- 'month_end':  last trading day of the USFR peak month (undefined while the
+                price file ends before that month does)
+- 'ex_date':    first trading day of the following month (monthly ex-date of the
+                same-month ETFs, i.e. the day of the distribution drop)
+- 'modal_low':  the candidate's most common low day-of-month (from its
+                full_cycles Low_Date), in the month after the USFR peak
+
+How:
+----
+Each rule maps (month × candidate) to a row of the price matrix; returns are
+one aligned gather (prices[exit_rows, cols] / prices[entry_rows, cols]), so
+the cost does not grow with Python loops over months or candidates.
+
+Output:
+-------
+- data/etf_rotation_backtest.csv with columns:
+  Month, USFR_Peak_Date, USFR_Peak, USFR_Return_Low_to_Peak%, <ETF>_Return%...,
+  Best_Rotation_ETF, Best_Rotation_Return%
+
+Usage:
+------
+    python -m scripts.analyze_rotations [--entry usfr_peak] [--exit month_end]
+"""
+
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
 
-# Load ETF price data and USFR peak dates
-df = pd.read_csv("etf_prices_2023_2025.csv", index_col=0, parse_dates=True)
-df.index = pd.to_datetime(df.index, utc=True).tz_localize(None)
-
-usfr_peaks_df = pd.read_csv("usfr_peaks.csv", parse_dates=["USFR_Peak_Date", "USFR_Low_Date"])
-usfr_peaks_df["Month"] = usfr_peaks_df["USFR_Peak_Date"].dt.to_period("M")
-
-# ETFs to evaluate
-etfs = ['SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
-usfr = 'USFR'
-
-results = []
-
-for _, row in usfr_peaks_df.iterrows():
-    peak_date = row["USFR_Peak_Date"]
-    low_date = row["USFR_Low_Date"]
-    month_str = row["Month"].strftime("%Y-%m")
-
-    try:
-        usfr_peak_price = df.loc[peak_date, usfr]
-        usfr_low_price = df.loc[low_date, usfr]
-        usfr_return = (usfr_peak_price - usfr_low_price) / usfr_low_price * 100
-    except:
-        usfr_return = None
-        usfr_peak_price = None
-
-    # End of month
-    month_end = peak_date + pd.offsets.MonthEnd(0)
-    df_eom = df[(df.index >= peak_date) & (df.index <= month_end)]
-
-    result_row = {
-        "Month": month_str,
-        "USFR_Peak_Date": peak_date.strftime("%Y-%m-%d"),
-        "USFR_Peak": round(usfr_peak_price, 5) if usfr_peak_price else None,
-        "USFR_Return_Low_to_Peak%": round(usfr_return, 3) if usfr_return else None
-    }
-
-    for etf in etfs:
-        try:
-            price_on_peak = df.loc[peak_date, etf]
-            price_eom = df_eom[etf].dropna().iloc[-1]
-            pct_gain = (price_eom - price_on_peak) / price_on_peak * 100
-            result_row[f"{etf}_Return%"] = round(pct_gain, 3)
-        except:
-            result_row[f"{etf}_Return%"] = None
-
-
-    # Determine best ETF to rotate into
-    rotation_candidates = {etf: result_row.get(f"{etf}_Return%") for etf in etfs}
-    valid_returns = {k: v for k, v in rotation_candidates.items() if v is not None}
-
-    if valid_returns:
-        best_etf = max(valid_returns, key=valid_returns.get)
-        result_row["Best_Rotation_ETF"] = best_etf
-        result_row["Best_Rotation_Return%"] = valid_returns[best_etf]
-    else:
-        result_row["Best_Rotation_ETF"] = None
-        result_row["Best_Rotation_Return%"] = None
-
-    results.append(result_row)
-
-# Export results
-summary_df = pd.DataFrame(results)
-summary_df.to_csv("etf_rotation_backtest.csv", index=False)
-
-print("✅ Backtest complete. Output saved to etf_rotation_backtest.csv.")
+from utils.data_loader import load_price_frame
+from utils.profiling import profiled
+
+DATA_PATH = "data/etf_prices_2023_2025.csv"
+USFR_CYCLES_CSV = "signals/usfr_full_cycles.csv"
+SIGNALS_DIR = "signals"
+OUTPUT_CSV = "data/etf_rotation_backtest.csv"
+
+USFR = 'USFR'
+ROTATION_ETFS = ['SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+
+def load_usfr_peaks(path=USFR_CYCLES_CSV):
+    """USFR cycles with parsed Low_Date / Peak_Date, one row per peak month."""
+    return prepare_usfr_peaks(pd.read_csv(path))
+
+def prepare_usfr_peaks(cycles):
+    """Same as load_usfr_peaks() for an in-memory USFR cycles frame; open cycles are dropped."""
+    if 'Cycle_Complete' in cycles.columns:
+        cycles = cycles[cycles['Cycle_Complete'].astype(str).str.lower() == 'true']
+    cycles = cycles.copy()
+    cycles['Low_Date'] = pd.to_datetime(cycles['Low_Date'])
+    cycles['Peak_Date'] = pd.to_datetime(cycles['Peak_Date'])
+    cycles = cycles.sort_values('Peak_Date').drop_duplicates('Peak_Date', keep='last')
+    return cycles.reset_index(drop=True)
+
+def modal_low_days(candidates, signals_dir=SIGNALS_DIR):
+    """Most common Low_Date day-of-month per candidate (NaN if no cycles file)."""
+    days = np.full(len(candidates), np.nan)
+    for j, etf in enumerate(candidates):
+        path = os.path.join(signals_dir, f"{etf.lower()}_full_cycles.csv")
+        if not os.path.exists(path):
+            continue
+        low_dates = pd.to_datetime(pd.read_csv(path)['Low_Date'], errors='coerce').dropna()
+        if not low_dates.empty:
+            days[j] = low_dates.dt.day.mode().iloc[0]
+    return days
+
+def _month_ids(dates):
+    return np.asarray(dates.year) * 12 + np.asarray(dates.month) - 1
+
+def _month_open(last_date):
+    """True if the month of `last_date` has sessions after it."""
+    from utils.synthetic_market import market_calendar
+    month_end = last_date + pd.offsets.MonthEnd(0)
+    return len(market_calendar(last_date, month_end)) > 1
+
+def _rule_rows(rule, dates, peak_dates, n_candidates, modal_days=None):
+    """
+    Price-matrix row for each (month, candidate) under a rule; -1 where undefined.
+    """
+    n_months = len(peak_dates)
+    month_ids = _month_ids(dates)
+    peak_month = _month_ids(peak_dates)
+
+    if rule == 'usfr_peak':
+        rows = np.searchsorted(dates.values, peak_dates.values)
+        found = (rows < len(dates)) & (dates.values[np.minimum(rows, len(dates) - 1)] == peak_dates.values)
+        rows = np.where(found, rows, -1)
+        return np.repeat(rows[:, None], n_candidates, axis=1)
+
+    if rule == 'month_end':
+        rows = np.searchsorted(month_ids, peak_month, side='right') - 1
+        rows = np.where((rows >= 0) & (month_ids[np.maximum(rows, 0)] == peak_month), rows, -1)
+        if len(dates) and _month_open(dates[-1]):
+            rows = np.where(peak_month == month_ids[-1], -1, rows)   # month end not reached yet
+        return np.repeat(rows[:, None], n_candidates, axis=1)
+
+    if rule == 'ex_date':
+        rows = np.searchsorted(month_ids, peak_month + 1, side='left')
+        valid = (rows < len(dates)) & (month_ids[np.minimum(rows, len(dates) - 1)] == peak_month + 1)
+        rows = np.where(valid, rows, -1)
+        return np.repeat(rows[:, None], n_candidates, axis=1)
+
+    if rule == 'modal_low':
+        if modal_days is None:
+            raise ValueError("modal_low rule needs modal low days per candidate")
+        next_month = peak_month + 1
+        month_start = pd.to_datetime({'year': next_month // 12, 'month': next_month % 12 + 1, 'day': 1})
+        target = (month_start.values[:, None]
+                  + (np.nan_to_num(modal_days, nan=1) - 1).astype('timedelta64[D]')[None, :])
+        rows = np.searchsorted(dates.values, target.ravel()).reshape(n_months, n_candidates)
+        clipped = np.minimum(rows, len(dates) - 1)
+        valid = (rows < len(dates)) & (month_ids[clipped] == next_month[:, None]) & ~np.isnan(modal_days)[None, :]
+        return np.where(valid, rows, -1)
+
+    raise ValueError(f"Unknown rotation rule: {rule}")
+
+def rotation_returns(prices, peak_dates, candidates, entry='usfr_peak', exit='month_end', modal_days=None):
+    """
+    Percent return of every candidate between the entry and exit rule, per month.
+
+    Parameters:
+        prices (pd.DataFrame): Date-indexed price matrix containing the candidates.
+        peak_dates (pd.DatetimeIndex): USFR peak dates, one per month.
+        candidates (list): Rotation candidate columns.
+
+    Returns:
+        np.ndarray (months × candidates) of % returns, NaN where a rule has no
+        trading day or the exit is before the entry (a same-day exit is 0%).
+    """
+    dates = prices.index
+    peak_dates = pd.DatetimeIndex(peak_dates)
+    if modal_days is None and 'modal_low' in (entry, exit):
+        modal_days = modal_low_days(candidates)
+
+    values = prices[candidates].to_numpy(dtype=float)
+    entry_rows = _rule_rows(entry, dates, peak_dates, len(candidates), modal_days)
+    exit_rows = _rule_rows(exit, dates, peak_dates, len(candidates), modal_days)
+    cols = np.arange(len(candidates))[None, :]
+
+    valid = (entry_rows >= 0) & (exit_rows >= entry_rows)
+    entry_px = values[np.maximum(entry_rows, 0), cols]
+    exit_px = values[np.maximum(exit_rows, 0), cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = (exit_px - entry_px) / entry_px * 100
+    return np.where(valid, returns, np.nan)
+
+@profiled()
+def build_rotation_table(prices, usfr_cycles, candidates=ROTATION_ETFS, entry='usfr_peak', exit='month_end'):
+    """Rotation backtest table in the data/etf_rotation_backtest.csv layout."""
+    peak_dates = pd.DatetimeIndex(usfr_cycles['Peak_Date'])
+    low_dates = pd.DatetimeIndex(usfr_cycles['Low_Date'])
+    returns = rotation_returns(prices, peak_dates, candidates, entry, exit)
+
+    usfr = prices[USFR]
+    usfr_peak = usfr.reindex(peak_dates).to_numpy()
+    usfr_low = usfr.reindex(low_dates).to_numpy()
+
+    table = pd.DataFrame({
+        'Month': peak_dates.strftime('%Y-%m'),
+        'USFR_Peak_Date': peak_dates.strftime('%Y-%m-%d'),
+        'USFR_Peak': np.round(usfr_peak, 5),
+        'USFR_Return_Low_to_Peak%': np.round((usfr_peak - usfr_low) / usfr_low * 100, 3),
+    })
+    returns_df = pd.DataFrame(np.round(returns, 3), columns=[f"{etf}_Return%" for etf in candidates])
+    table = pd.concat([table, returns_df], axis=1)
+
+    has_any = ~np.isnan(returns).all(axis=1)
+    best = np.argmax(np.where(np.isnan(returns), -np.inf, returns), axis=1)
+    table['Best_Rotation_ETF'] = np.where(has_any, np.asarray(candidates)[best], None)
+    table['Best_Rotation_Return%'] = np.where(has_any, returns_df.to_numpy()[np.arange(len(best)), best], np.nan)
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest rotations after USFR monthly peaks")
+    rules = ['usfr_peak', 'month_end', 'ex_date', 'modal_low']
+    parser.add_argument('--entry', default='usfr_peak', choices=rules)
+    parser.add_argument('--exit', default='month_end', choices=rules)
+    parser.add_argument('--output', default=OUTPUT_CSV)
+    args = parser.parse_args()
+
+    prices = load_price_frame(DATA_PATH)
+    usfr_cycles = load_usfr_peaks()
+    candidates = [etf for etf in ROTATION_ETFS if etf in prices.columns]
+
+    summary_df = build_rotation_table(prices, usfr_cycles, candidates, args.entry, args.exit)
+    summary_df.to_csv(args.output, index=False)
+    print(f"✅ Backtest complete ({args.entry} → {args.exit}, {len(summary_df)} months). "
+          f"Output saved to {args.output}.")
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ from datetime import datetime, timedelta, date
 from dateutil import parser
 from utils.usfr_distribution import get_usfr_distribution_dates
 from utils.usfr_peak_confidence import check_against_ex_date
+from utils.profiling import profiled
 
 
 def get_us_market_holidays(year):
@@ -72,6 +73,7 @@ def get_next_market_day(date_obj):
             holidays = get_us_market_holidays(date_obj.year)
     return date_obj
 
+@profiled()
 def check_etf_signal_with_countdown(etf, signal_type):
     """
     Load full cycles CSV signal file and return modal day, next signal date, and days until signal.
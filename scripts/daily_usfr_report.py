@@ -13,56 +13,58 @@ Linux/Mac: Use cron
 """
 
 import datetime
-from scripts import is_today_usfr_low  # assuming is_today_usfr_low is a function, else adapt
+import os
 
-# If is_today_usfr_low.py is a standalone script, refactor it to a function like this:
-# def check_usfr_low():
-#    ... your existing code ...
-#    return summary_string
+from scripts.is_today_usfr_low import check_usfr_low
+from utils.signal_db import changes_since, last_seq, read_cursor, set_cursor, sync_all
 
-# For demo, I’ll simulate calling that function here
-def check_usfr_low():
-    # Paste your logic from is_today_usfr_low.py here inside a function
-    # Return the summary string instead of print
-    import pandas as pd
-    
-    df = pd.read_csv("signals/usfr_post_peak_lows.csv", parse_dates=['USFR_Peak_Date', 'USFR_Low_Date'])
-    
-    today = pd.Timestamp(datetime.datetime.now().date())
-    
-    row = df[df['USFR_Low_Date'] == today]
-    if not row.empty:
-        r = row.iloc[0]
-        summary = (
-            f"📅 Today IS the USFR low day!\n"
-            f"• Peak Date: {r['USFR_Peak_Date'].strftime('%Y-%m-%d')} at ${r['USFR_Peak']:.2f}\n"
-            f"• Projected Low Date: {r['USFR_Low_Date'].strftime('%Y-%m-%d')} at ${r['USFR_Low']:.2f}\n"
-            f"• Drop: {r['Drop_%']:.3f}%\n"
-            f"• Today: {today.strftime('%Y-%m-%d')}\n"
-        )
+REPORTS_DIR = "reports"
+MAX_CHANGE_LINES = 20        # longer change sets are summarized per table
+CONSUMER = 'usfr_report'
+
+def signal_changes_section(report_date, ticker='USFR'):
+    """
+    Rows of the signal store that changed since the previous day's report.
+
+    Returns (section text, log position to commit with commit_changes() once
+    the report is saved). A rerun on the same day starts from the same point
+    ('usfr_report:<date>' cursor), so it lists the day's changes again.
+    """
+    sync_all()
+    day_key = f"{CONSUMER}:{report_date}"
+    start = read_cursor(day_key)
+    if start is None:
+        start = read_cursor(CONSUMER) or 0
+    end = last_seq()
+    changes = changes_since(start, ticker=ticker)
+    changes = changes[changes['seq'] <= end]
+    position = {'day_key': day_key, 'start': start, 'end': end}
+    if changes.empty:
+        return "\n\nSignal changes since last report: none", position
+    if len(changes) > MAX_CHANGE_LINES:
+        counts = changes.groupby(['tbl', 'op']).size()
+        lines = [f"  {tbl:<6} {op:<6} {n} rows" for (tbl, op), n in counts.items()]
     else:
-        # Find closest low date
-        future_lows = df[df['USFR_Low_Date'] > today]
-        if not future_lows.empty:
-            next_low = future_lows.iloc[0]
-            days_until = (next_low['USFR_Low_Date'] - today).days
-            summary = (
-                f"📅 Today is NOT the USFR low day.\n"
-                f"• Peak Date: {next_low['USFR_Peak_Date'].strftime('%Y-%m-%d')} at ${next_low['USFR_Peak']:.2f}\n"
-                f"• Projected Low Date: {next_low['USFR_Low_Date'].strftime('%Y-%m-%d')} at ${next_low['USFR_Low']:.2f}\n"
-                f"• Drop: {next_low['Drop_%']:.3f}%\n"
-                f"• Today: {today.strftime('%Y-%m-%d')} — {days_until} day(s) from low\n"
-            )
-        else:
-            summary = "No upcoming USFR low dates found in data."
-    return summary
+        lines = [f"  {c.tbl:<6} {c.month}  {c.op:<6} {c.columns or ''}".rstrip() for c in changes.itertuples()]
+    return "\n\nSignal changes since last report:\n" + "\n".join(lines), position
 
+def commit_changes(position):
+    """Advance the cursors after the report file is written."""
+    set_cursor(position['day_key'], position['start'])
+    set_cursor(CONSUMER, position['end'])
 
-if __name__ == "__main__":
-    report = check_usfr_low()
+def main():
+    report_date = datetime.datetime.now().strftime('%Y-%m-%d')
+    changes, position = signal_changes_section(report_date)
+    report = check_usfr_low() + changes
     print(report)
-    
+
     # Save to a daily log file
-    log_filename = f"reports/usfr_report_{datetime.datetime.now().strftime('%Y-%m-%d')}.txt"
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    log_filename = f"{REPORTS_DIR}/usfr_report_{report_date}.txt"
     with open(log_filename, "w") as f:
         f.write(report)
+    commit_changes(position)
+
+if __name__ == "__main__":
+    main()
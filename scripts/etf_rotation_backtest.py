@@ -1,25 +1,52 @@
+# scripts/etf_rotation_backtest.py
+"""
+Summarizes the USFR-peak rotation backtest (data/etf_rotation_backtest.csv,
+written by scripts/analyze_rotations.py).
+
+Functions:
+- summarize_rotation_backtest(df, etfs) -> (avg_returns, df), no file I/O
+- main() -> prints average returns and negative months, writes
+  signals/etf_rotation_analysis_summary.csv
+"""
+
 import pandas as pd
 
-# Load backtest summary CSV
-df = pd.read_csv("data/etf_rotation_backtest.csv")
+INPUT_CSV = "data/etf_rotation_backtest.csv"
+OUTPUT_CSV = "signals/etf_rotation_analysis_summary.csv"
 
 etfs = ['SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
 
-# Calculate average post-USFR-peak returns per ETF
-avg_returns = {etf: df[f"{etf}_Return%"].mean() for etf in etfs}
+def summarize_rotation_backtest(df, etf_list=etfs):
+    """
+    Average post-USFR-peak return per ETF, and the backtest frame with an
+    'Any_Negative_Return' flag per month (the input frame is not modified).
+    """
+    return_cols = [f"{etf}_Return%" for etf in etf_list]
+
+    # Calculate average post-USFR-peak returns per ETF
+    avg_returns = {etf: df[f"{etf}_Return%"].mean() for etf in etf_list}
+
+    # Highlight months with any negative returns
+    df = df.assign(Any_Negative_Return=df[return_cols].lt(0).any(axis=1))
+    return avg_returns, df
+
+def main():
+    # Load backtest summary CSV
+    df = pd.read_csv(INPUT_CSV)
+    avg_returns, df = summarize_rotation_backtest(df)
 
-print("📈 Average ETF returns after USFR peak (monthly):")
-for etf, avg_ret in avg_returns.items():
-    print(f"{etf}: {avg_ret:.3f}%")
+    print("📈 Average ETF returns after USFR peak (monthly):")
+    for etf, avg_ret in avg_returns.items():
+        print(f"{etf}: {avg_ret:.3f}%")
 
-# Highlight months with any negative returns
-df['Any_Negative_Return'] = df[[f"{etf}_Return%" for etf in etfs]].lt(0).any(axis=1)
+    neg_months = df[df['Any_Negative_Return']]
 
-neg_months = df[df['Any_Negative_Return']]
+    print("\n📉 Months with any ETF showing negative return post-USFR peak:")
+    print(neg_months[['Month'] + [f"{etf}_Return%" for etf in etfs]])
 
-print("\n📉 Months with any ETF showing negative return post-USFR peak:")
-print(neg_months[['Month'] + [f"{etf}_Return%" for etf in etfs]])
+    # Optional: Save this filtered analysis
+    df.to_csv(OUTPUT_CSV, index=False)
+    print(f"\n✅ Analysis summary saved to {OUTPUT_CSV}")
 
-# Optional: Save this filtered analysis
-df.to_csv("signals/etf_rotation_analysis_summary.csv", index=False)
-print("\n✅ Analysis summary saved to signals/etf_rotation_analysis_summary.csv")
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,76 @@
 """
-fetch_etf_data.py – updated 6/20/25
+fetch_etf_data.py – updated 6/22/25
 Script to fetch ETF daily price and volume data from Yahoo Finance.
 Saves output to CSV for use in swing signal scripts and dashboard.
+
+Functions:
+- fetch_prices(etfs, start_date, end_date) -> DataFrame (Date column + price/volume columns)
+- save_prices(df, path)                    -> writes the CSV
+- merge_prices(existing, fresh)            -> replace fetched columns in an existing price file
+- main()                                   -> fetch through today and save
 """
 
 import yfinance as yf
 import pandas as pd
 from datetime import datetime
 
+OUTPUT_CSV = "data/etf_prices_2023_2025.csv"
+
 # ETFs in your rotation strategy
 etfs = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
 start_date = '2023-01-01'
-end_date = datetime.today().strftime('%Y-%m-%d')  # Auto-update to today
 
-# Download unadjusted daily closing price and volume for each ETF
-data = {}
-for etf in etfs:
-    print(f"📥 Downloading {etf}...")
-    ticker = yf.Ticker(etf)
-    hist = ticker.history(start=start_date, end=end_date, auto_adjust=False)
-    data[etf] = hist['Close']
-    data[f"{etf}_Volume"] = hist['Volume']
+def fetch_prices(etf_list=etfs, start=start_date, end=None):
+    """
+    Download unadjusted daily closing price and volume for each ETF.
+
+    Returns:
+        DataFrame with a 'Date' column, then '<ETF>' and '<ETF>_Volume' columns.
+    """
+    end = end or datetime.today().strftime('%Y-%m-%d')  # Auto-update to today
+
+    data = {}
+    for etf in etf_list:
+        print(f"📥 Downloading {etf}...")
+        ticker = yf.Ticker(etf)
+        hist = ticker.history(start=start, end=end, auto_adjust=False)
+        data[etf] = hist['Close']
+        data[f"{etf}_Volume"] = hist['Volume']
+
+    # Combine into a single DataFrame
+    df = pd.DataFrame(data)
+
+    # Preprocess for saving: remove timezone if present, reset index, rename column
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.index = pd.to_datetime(df.index, errors='coerce')
+
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
 
-# Combine into a single DataFrame
-df = pd.DataFrame(data)
+    df.reset_index(inplace=True)
+    df.rename(columns={'index': 'Date'}, inplace=True)
+    return df
 
-# Preprocess for saving: remove timezone if present, reset index, rename column
-if not isinstance(df.index, pd.DatetimeIndex):
-    df.index = pd.to_datetime(df.index, errors='coerce')
+def save_prices(df, path=OUTPUT_CSV):
+    df.to_csv(path, index=False)
+    print(f"✅ Price data saved to {path}")
 
-if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
-    df.index = df.index.tz_localize(None)
+def merge_prices(existing, fresh):
+    """
+    Overlay freshly fetched columns on the stored price frame (both with a
+    'Date' column), keeping the columns of ETFs that were not fetched.
+    """
+    existing = existing.copy()
+    existing['Date'] = pd.to_datetime(existing['Date'], utc=True).dt.tz_convert(None)
+    fresh = fresh.copy()
+    fresh['Date'] = pd.to_datetime(fresh['Date'])
+    kept = existing.drop(columns=[c for c in fresh.columns if c != 'Date'], errors='ignore')
+    merged = kept.merge(fresh, on='Date', how='outer').sort_values('Date')
+    columns = list(existing.columns) + [c for c in fresh.columns if c not in existing.columns]
+    return merged[columns].reset_index(drop=True)
 
-df.reset_index(inplace=True)
-df.rename(columns={'index': 'Date'}, inplace=True)
+def main():
+    save_prices(fetch_prices())
 
-# Save to CSV
-df.to_csv("data/etf_prices_2023_2025.csv", index=False)
-print("✅ Price data saved to data/etf_prices_2023_2025.csv")
+if __name__ == "__main__":
+    main()
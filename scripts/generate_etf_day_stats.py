@@ -4,45 +4,96 @@ generate_etf_day_stats.py
 Purpose:
 --------
 Generate a lookup table of daily price statistics for each Treasury ETF,
-broken down by trading day number within each calendar month.
+broken down by trading day number within each calendar month, counted both
+from the start of the month and back from the month end.
 
 Why:
 ----
 This table helps compare the current month's trading day price against
 historical averages and ranges for that specific trading day in prior months,
 enabling better detection of unusual price movements or expected values.
+Month-end ETFs peak on the last trading day, whose number from the start of
+the month varies (19-23), so the same stats keyed from the month end line
+those days up.
 
 Input:
 ------
 - CSV file with daily ETF prices for multiple ETFs (e.g., data/etf_prices_2023_2025.csv)
   The file must include a 'Date' column and columns for each ETF ticker.
+  Ranges in data/price_quarantine.csv (utils/data_quality.py) are left out.
 
 Output:
 -------
-- CSV file with stats saved as signals/etf_day_stats.csv, containing:
+- signals/etf_day_stats.csv:
   ETF, Trading_Day, Count, Mean, Min, Max, Median, Std
+- signals/etf_day_stats_from_end.csv (1 = last trading day of the month):
+  ETF, Trading_Day_From_End, Count, Mean, Min, Max, Median, Std
+- logs/etf_day_stats_state.json: running moments for incremental refreshes
 
 How:
 ----
-- Assign a "trading day" number within each month for each date (starting at 1).
-- For each ETF and trading day number, calculate summary statistics over all months.
-- Save these aggregated stats for fast historical reference and comparison.
+- Full build: all tickers are melted into one long frame; trading day numbers
+  come from one groupby cumcount over (ETF, month), and the stats from one
+  groupby aggregation per key. A ticker's latest month only counts for the
+  from-end table once a later month has started (until then its last day is
+  not known).
+- Incremental (default once a state file exists): only bars after each
+  ticker's last folded date are read into the running state. Count, min and
+  max are exact; mean and variance use Welford's update. The median is exact
+  while a key has at most EXACT_LIMIT values (kept sorted; one value per
+  month, so about 20 years); beyond that the key switches to a P² streaming
+  estimate (Jain & Chlamtac, 5 markers) with constant memory. Bars of the open month
+  are held until the month closes, then folded into the from-end stats.
+  Use --full after price history is revised (a refetch that rewrites old rows).
+- Cost of a refresh: O(new bars), plus reading the price CSV.
 
+Usage:
+------
+    python -m scripts.generate_etf_day_stats          # incremental if state exists
+    python -m scripts.generate_etf_day_stats --full
 """
 
-import pandas as pd
+import argparse
+import bisect
+import json
+import math
 import os
 
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_price_frame, quarantine_version
+
 INPUT_CSV = 'data/etf_prices_2023_2025.csv'
 OUTPUT_CSV = 'signals/etf_day_stats.csv'
+OUTPUT_FROM_END_CSV = 'signals/etf_day_stats_from_end.csv'
+STATE_PATH = 'logs/etf_day_stats_state.json'
 ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
 
-os.makedirs('signals', exist_ok=True)
+# basis -> day column; 'start' counts from the first trading day of the month
+BASES = {'start': 'Trading_Day', 'end': 'Trading_Day_From_End'}
+STAT_COLUMNS = ['Count', 'Mean', 'Min', 'Max', 'Median', 'Std']
+EXACT_LIMIT = 256               # values kept per key before the median becomes a P² estimate
+
+def price_tickers(df_all):
+    """ETF price columns of the wide frame, known ETFs first."""
+    columns = [c for c in df_all.columns if c != 'Date' and not c.endswith('_Volume')]
+    return [e for e in ETF_LIST if e in columns] + [c for c in columns if c not in ETF_LIST]
+
+def to_long(df_all, tickers=None):
+    """Wide price frame -> Date, ETF, Price rows (no NaN prices), sorted by ETF then Date."""
+    tickers = tickers or price_tickers(df_all)
+    long = df_all.assign(Date=pd.to_datetime(df_all['Date'])).melt(
+        id_vars='Date', value_vars=tickers, var_name='ETF', value_name='Price')
+    long = long.dropna(subset=['Price'])
+    long['ETF'] = pd.Categorical(long['ETF'], categories=tickers)
+    return long.sort_values(['ETF', 'Date'], kind='stable').reset_index(drop=True)
 
 def assign_trading_day(df):
     """
-    Add a 'Trading_Day' column that numbers each trading day within
-    a given month starting at 1.
+    Add 'Trading_Day' (1 = first trading day of the month) and
+    'Trading_Day_From_End' (1 = last) columns, per ETF when an 'ETF' column
+    is present, plus 'Month_Closed' (a later month exists for that ETF).
 
     Parameters:
     -----------
@@ -50,72 +101,236 @@ def assign_trading_day(df):
 
     Returns:
     --------
-    DataFrame with new 'Trading_Day' column
+    DataFrame with the new columns and a 'YearMonth' month number
     """
-    df = df.sort_values('Date').copy()
-    # Create a YearMonth period for grouping
-    df['YearMonth'] = df['Date'].dt.to_period('M')
-    # Assign trading day by counting days within each YearMonth group
-    df['Trading_Day'] = df.groupby('YearMonth').cumcount() + 1
+    by = ['ETF'] if 'ETF' in df.columns else []
+    df = df.sort_values(by + ['Date'], kind='stable').copy()
+    df['YearMonth'] = df['Date'].dt.year * 12 + df['Date'].dt.month - 1
+    groups = df.groupby(by + ['YearMonth'], observed=True, sort=False)
+    position = groups.cumcount()
+    df['Trading_Day'] = position + 1
+    df['Trading_Day_From_End'] = groups['Date'].transform('size') - position
+    last_month = df.groupby(by, observed=True)['YearMonth'].transform('max') if by else df['YearMonth'].max()
+    df['Month_Closed'] = df['YearMonth'] < last_month
     return df
 
-def generate_lookup_table(df_all):
+def _basis_rows(days, basis):
+    return days if basis == 'start' else days[days['Month_Closed']]
+
+def _format(table, basis):
+    table = table.reset_index()
+    table['ETF'] = table['ETF'].astype(str)
+    table['Count'] = table['Count'].astype(int)
+    table[STAT_COLUMNS[1:]] = table[STAT_COLUMNS[1:]].astype(float).round(5)
+    return table[['ETF', BASES[basis]] + STAT_COLUMNS]
+
+def generate_lookup_table(df_all, tickers=None, basis='start'):
     """
     Generate the lookup table with statistics for each ETF and trading day.
 
     Parameters:
     -----------
     df_all: DataFrame with Date and ETF price columns
+    tickers: ETF columns to include (default: every price column)
+    basis: 'start' (Trading_Day) or 'end' (Trading_Day_From_End)
 
     Returns:
     --------
-    DataFrame with aggregated stats: ETF, Trading_Day, Count, Mean, Min, Max, Median, Std
+    DataFrame with aggregated stats: ETF, <day column>, Count, Mean, Min, Max, Median, Std
     """
+    days = _basis_rows(assign_trading_day(to_long(df_all, tickers)), basis)
+    grouped = days.groupby(['ETF', BASES[basis]], observed=True)['Price']
+    table = grouped.agg(Count='count', Mean='mean', Min='min', Max='max', Median='median', Std='std')
+    return _format(table, basis)
+
+# ------------------------------------------------------------ running state
+
+def _p2_positions(n):
+    """Desired marker positions (1-based) for the median after n observations."""
+    return [1, 1 + (n - 1) / 4, 1 + (n - 1) / 2, 1 + 3 * (n - 1) / 4, n]
+
+def _p2_add(sketch, x, n):
+    """Fold x into a P² median sketch {'q', 'pos'}; n counts x."""
+    q, pos = sketch['q'], sketch['pos']
+    if x < q[0]:
+        q[0], k = x, 0
+    elif x >= q[4]:
+        q[4], k = x, 3
+    else:
+        k = max(i for i in range(4) if q[i] <= x)
+    for i in range(k + 1, 5):
+        pos[i] += 1
+    desired = _p2_positions(n)
+    for i in (1, 2, 3):
+        d = desired[i] - pos[i]
+        if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+            d = 1 if d > 0 else -1
+            parabolic = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1]))
+            if q[i - 1] < parabolic < q[i + 1]:
+                q[i] = parabolic
+            else:
+                q[i] = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+            pos[i] += d
+
+def _fold(entry, x):
+    """Add one price to a stats entry (Welford moments, min / max, median sketch)."""
+    entry['n'] += 1
+    n = entry['n']
+    delta = x - entry['mean']
+    entry['mean'] += delta / n
+    entry['m2'] += delta * (x - entry['mean'])
+    entry['min'] = min(entry['min'], x)
+    entry['max'] = max(entry['max'], x)
+    if 'values' in entry:
+        bisect.insort(entry['values'], x)
+        if n <= EXACT_LIMIT:
+            entry['median'] = float(np.median(entry['values']))
+            return
+        values = entry.pop('values')
+        positions = [int(p) for p in np.rint(_p2_positions(n))]
+        entry['sketch'] = {'q': [values[p - 1] for p in positions], 'pos': positions}
+    else:
+        _p2_add(entry['sketch'], x, n)
+    entry['median'] = entry['sketch']['q'][2]
+
+def _new_entry():
+    return {'n': 0, 'mean': 0.0, 'm2': 0.0, 'min': math.inf, 'max': -math.inf, 'median': None, 'values': []}
+
+def _entries_from_rows(rows, day_col):
+    """Running-state entries for every (ETF, day) group of `rows`, built vectorized."""
+    rows = rows.sort_values(['ETF', day_col, 'Price'], kind='stable')
+    groups = rows.groupby(['ETF', day_col], observed=True, sort=False)
+    prices = groups['Price']
+    agg = prices.agg(n='count', mean='mean', min='min', max='max', median='median')
+    agg['var0'] = prices.var(ddof=0)
+    rank = groups.cumcount().to_numpy() + 1
+    size = groups['Price'].transform('size').to_numpy()
+
+    # P² markers start on the order statistics nearest the desired positions
+    n = size.astype(float)
+    targets = np.rint(np.vstack([np.ones_like(n), 1 + (n - 1) / 4, 1 + (n - 1) / 2, 1 + 3 * (n - 1) / 4, n])).astype(int)
+    marker_values = [rows.loc[rank == t, ['ETF', day_col, 'Price']].set_index(['ETF', day_col])['Price']
+                     for t in targets]
+    values = prices.agg(list)
+
+    entries = {}
+    for key, row in agg.iterrows():
+        n = int(row['n'])
+        entry = {'n': n, 'mean': float(row['mean']), 'm2': float(row['var0']) * n,
+                 'min': float(row['min']), 'max': float(row['max']), 'median': float(row['median'])}
+        if n <= EXACT_LIMIT:
+            entry['values'] = [float(v) for v in values[key]]
+        else:
+            entry['sketch'] = {'q': [float(m[key]) for m in marker_values],
+                               'pos': [int(p) for p in np.rint(_p2_positions(n))]}
+        entries.setdefault(str(key[0]), {})[str(int(key[1]))] = entry
+    return entries
+
+def build_state(df_all, tickers=None, source=INPUT_CSV):
+    """Full rebuild of the running state from the whole price history."""
+    days = assign_trading_day(to_long(df_all, tickers))
+    state = {'source': source, 'stats': {}, 'tickers': {}}
+    for basis, col in BASES.items():
+        state['stats'][basis] = _entries_from_rows(_basis_rows(days, basis), col)
+    for etf, rows in days.groupby('ETF', observed=True):
+        last = rows[rows['YearMonth'] == rows['YearMonth'].max()]
+        state['tickers'][str(etf)] = {
+            'last_date': rows['Date'].max().strftime('%Y-%m-%d'),
+            'month': int(last['YearMonth'].iloc[0]),
+            'pending': [[d.strftime('%Y-%m-%d'), float(p)] for d, p in zip(last['Date'], last['Price'])],
+        }
+    return state
+
+def update_state(state, df_all, tickers=None):
+    """
+    Fold the bars newer than each ticker's last folded date into `state`.
+
+    Returns:
+        int: number of bars folded.
+    """
+    long = to_long(df_all, tickers)
+    folded = 0
+    for etf, rows in long.groupby('ETF', observed=True):
+        etf = str(etf)
+        ticker = state['tickers'].setdefault(etf, {'last_date': '', 'month': None, 'pending': []})
+        start = state['stats']['start'].setdefault(etf, {})
+        end = state['stats']['end'].setdefault(etf, {})
+        new = rows[rows['Date'] > pd.Timestamp(ticker['last_date'] or '1900-01-01')]
+        for date, price in zip(new['Date'], new['Price'].astype(float)):
+            month = date.year * 12 + date.month - 1
+            if month != ticker['month']:
+                # The open month is complete: its days from the end are now known
+                pending = ticker['pending']
+                for i, (_, old_price) in enumerate(pending):
+                    _fold(end.setdefault(str(len(pending) - i), _new_entry()), old_price)
+                ticker['month'], ticker['pending'] = month, []
+            ticker['pending'].append([date.strftime('%Y-%m-%d'), price])
+            _fold(start.setdefault(str(len(ticker['pending'])), _new_entry()), price)
+            ticker['last_date'] = date.strftime('%Y-%m-%d')
+            folded += 1
+    return folded
+
+def state_table(state, basis='start'):
+    """Stats table (same layout as generate_lookup_table) from the running state."""
     records = []
+    for etf, days in state['stats'][basis].items():
+        for day, e in days.items():
+            std = math.sqrt(e['m2'] / (e['n'] - 1)) if e['n'] > 1 else np.nan
+            records.append({'ETF': etf, BASES[basis]: int(day), 'Count': e['n'], 'Mean': e['mean'],
+                            'Min': e['min'], 'Max': e['max'], 'Median': e['median'], 'Std': std})
+    table = pd.DataFrame(records, columns=['ETF', BASES[basis]] + STAT_COLUMNS)
+    tickers = list(state['tickers'])
+    table['_Order'] = table['ETF'].map({etf: i for i, etf in enumerate(tickers)})
+    table = table.sort_values(['_Order', BASES[basis]], kind='stable').drop(columns='_Order')
+    table[STAT_COLUMNS[1:]] = table[STAT_COLUMNS[1:]].astype(float).round(5)
+    return table.reset_index(drop=True)
 
-    for etf in ETF_LIST:
-        # Extract date and price columns for the ETF
-        etf_df = df_all[['Date', etf]].dropna().copy()
-        etf_df = etf_df.rename(columns={etf: 'Price'})
-        etf_df['Date'] = pd.to_datetime(etf_df['Date'])
-
-        # Assign trading day number per month
-        etf_df = assign_trading_day(etf_df)
-
-        # Group prices by trading day number and calculate stats
-        grouped = etf_df.groupby('Trading_Day')['Price']
-
-        for trading_day, group in grouped:
-            count = group.count()
-            mean = group.mean()
-            min_val = group.min()
-            max_val = group.max()
-            median = group.median()
-            std = group.std()
-
-            records.append({
-                'ETF': etf,
-                'Trading_Day': trading_day,
-                'Count': count,
-                'Mean': round(mean, 5),
-                'Min': round(min_val, 5),
-                'Max': round(max_val, 5),
-                'Median': round(median, 5),
-                'Std': round(std, 5)
-            })
-
-    return pd.DataFrame(records)
-
-def main():
+def load_state(path=STATE_PATH):
     try:
-        df_all = pd.read_csv(INPUT_CSV)
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-trading-day price statistics")
+    parser.add_argument('--full', action='store_true', help="Rebuild from the whole history")
+    parser.add_argument('--input', default=INPUT_CSV)
+    args = parser.parse_args(argv)
+
+    try:
+        df_all = load_price_frame(args.input).reset_index()
     except Exception as e:
         print(f"❌ Failed to load input CSV: {e}")
         return
 
-    lookup_df = generate_lookup_table(df_all)
-    lookup_df.to_csv(OUTPUT_CSV, index=False)
-    print(f"✅ Lookup table saved to {OUTPUT_CSV}")
+    # A new quarantine can remove old bars, which folding cannot undo
+    source = {'path': args.input, 'quarantine': quarantine_version()}
+    state = None if args.full else load_state()
+    if state is None or state.get('source') != source:
+        state = build_state(df_all, source=source)
+        print(f"🧮 Full rebuild over {len(df_all)} days")
+        # Exact medians and moments straight from the aggregation
+        tables = {basis: generate_lookup_table(df_all, basis=basis) for basis in BASES}
+    else:
+        folded = update_state(state, df_all)
+        print(f"🧮 Folded {folded} new bars into the running stats")
+        tables = {basis: state_table(state, basis) for basis in BASES}
+    save_state(state)
+
+    for basis, path in (('start', OUTPUT_CSV), ('end', OUTPUT_FROM_END_CSV)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tables[basis].to_csv(path, index=False)
+        print(f"✅ Lookup table saved to {path}")
 
 if __name__ == "__main__":
     main()
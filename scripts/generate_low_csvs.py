@@ -11,17 +11,25 @@ Input:
 
 Output:
 - signals/[etf]_post_peak_lows.csv
+
+Functions:
+- find_post_peak_lows(etf, df)  -> lows DataFrame for one ETF
+- build_low_csvs(df, etfs)      -> {etf: lows DataFrame}, no file I/O
 """
 
 import pandas as pd
 import os
 from datetime import timedelta
+from utils.data_loader import load_price_frame
+from utils.fixed_point import extreme_dates
+from utils.profiling import profiled
 
 ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
 INPUT_CSV = 'data/etf_prices_2023_2025.csv'
 OUTPUT_DIR = 'signals'
 REB_THRESHOLD = 0.000  # capture all drops for now
 
+@profiled()
 def find_post_peak_lows(etf_name: str, df: pd.DataFrame) -> pd.DataFrame:
     """Find post-peak lows based on ETF-specific timing rules."""
     etf_df = df[['Date', etf_name]].dropna().copy()
@@ -30,7 +38,7 @@ def find_post_peak_lows(etf_name: str, df: pd.DataFrame) -> pd.DataFrame:
 
     monthly_lows = []
 
-    for month, group in etf_df.groupby(pd.Grouper(freq='M')):
+    for month, group in etf_df.groupby(pd.Grouper(freq='ME')):
         if group.empty:
             continue
 
@@ -39,8 +47,8 @@ def find_post_peak_lows(etf_name: str, df: pd.DataFrame) -> pd.DataFrame:
             peak_window = group[(group.index.day >= 18) & (group.index.day <= 25)]
             if peak_window.empty:
                 continue
-            peak_date = peak_window[etf_name].idxmax()
-            peak_value = peak_window[etf_name].max()
+            peak_value, peak_dates = extreme_dates(peak_window[etf_name], 'max')
+            peak_date = peak_dates[0]
             lookahead_end = peak_date + timedelta(days=6)
             low_window = etf_df.loc[peak_date + timedelta(days=1):lookahead_end]
 
@@ -69,10 +77,9 @@ def find_post_peak_lows(etf_name: str, df: pd.DataFrame) -> pd.DataFrame:
         if low_window.empty:
             continue
 
-        low_date = low_window[etf_name].idxmin()
-        low_value = low_window[etf_name].min()
-
-        multi_low_dates = low_window[low_window[etf_name] == low_value].index
+        # Ties are compared in 1/10,000-dollar ticks (utils/fixed_point.py)
+        low_value, multi_low_dates = extreme_dates(low_window[etf_name], 'min')
+        low_date = multi_low_dates[0]
         is_multi_day_low = len(multi_low_dates) > 1
 
         drop_pct = round(((low_value - peak_value) / peak_value) * 100, 3)
@@ -103,19 +110,23 @@ def find_post_peak_lows(etf_name: str, df: pd.DataFrame) -> pd.DataFrame:
 
     return pd.DataFrame(monthly_lows)
 
+def build_low_csvs(df, etf_list=ETF_LIST):
+    """Post-peak lows per ETF from a frame with a 'Date' column."""
+    return {etf: find_post_peak_lows(etf, df) for etf in etf_list}
+
 def main():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
     try:
-        df = pd.read_csv(INPUT_CSV)
+        df = load_price_frame(INPUT_CSV).reset_index()
     except Exception as e:
         print(f"❌ Failed to load input CSV: {e}")
         return
 
     for etf in ETF_LIST:
         print(f"📊 Processing {etf}...")
-        result_df = find_post_peak_lows(etf, df)
+        result_df = build_low_csvs(df, [etf])[etf]
 
         if not result_df.empty:
             output_file = os.path.join(OUTPUT_DIR, f"{etf.lower()}_post_peak_lows.csv")
@@ -25,6 +25,11 @@ Output:
   * [etf]_post_peak_highs.csv
   * Each contains detected monthly peak dates and prices per ETF.
 
+Functions:
+----------
+- build_peak_csvs(df, etfs, debug) -> {etf: peaks DataFrame}, no file I/O
+- main()                           -> reads the price CSV and writes the files above
+
 Usage:
 -------
 Run this script after updating historical price data to generate
@@ -32,24 +37,37 @@ fresh peak signals for the 6 Treasury ETFs.
 """
 
 import os
-import sys
 import pandas as pd
+from utils.data_loader import load_price_frame
 
-# Add project root to path so 'utils' can be imported from scripts/
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
+from utils import debug
 from utils.peak_detection import find_post_peak_peaks  # External function import
 
 ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
 INPUT_CSV = 'data/etf_prices_2023_2025.csv'
 OUTPUT_DIR = 'signals'
 
-# Ensure output folder exists
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+def build_peak_csvs(df, etf_list=ETF_LIST, debug=False):
+    """
+    Monthly post-peak highs per ETF from a frame with a 'Date' column.
+    ETFs whose detection raises are left out.
+    """
+    results = {}
+    for etf in etf_list:
+        try:
+            result_df = find_post_peak_peaks(etf, df, debug=debug)
+        except Exception as e:
+            print(f"❌ Error processing {etf}: {e}")
+            continue
+        results[etf] = result_df
+    return results
 
 def main():
+    # Ensure output folder exists
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
     try:
-        df = pd.read_csv(INPUT_CSV)
+        df = load_price_frame(INPUT_CSV).reset_index()
         print(f"✅ Loaded input CSV: {INPUT_CSV} with {len(df)} rows")
     except Exception as e:
         print(f"❌ Failed to load input CSV: {e}")
@@ -57,11 +75,9 @@ def main():
 
     for etf in ETF_LIST:
         print(f"\n📈 Processing {etf}...")
-        try:
-            # Enable debug to see detailed logs for skipped months etc.
-            result_df = find_post_peak_peaks(etf, df, debug=True)
-        except Exception as e:
-            print(f"❌ Error processing {etf}: {e}")
+        # Skipped-month logs follow utils.debug.debug_mode (they print inside the month loop)
+        result_df = build_peak_csvs(df, [etf], debug=debug.debug_mode).get(etf)
+        if result_df is None:
             continue
 
         if not result_df.empty:
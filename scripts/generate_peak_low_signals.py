@@ -1,12 +1,26 @@
 # scripts/generate_peak_low_signals.py
-"""ADD DESCRIPTION
-ADD DATE AND TIME WHEN UPDATED"""
+"""
+Long-form monthly peaks and post-peak lows for all 6 ETFs.
+
+Rules:
+- USFR peak: highest close on days 21–26 of the month
+- Other ETFs peak: last trading day of the month
+- Post-peak low: lowest close in the next 3 trading days
+
+Functions:
+- build_peak_low_signals(df, etfs) -> (peaks, lows) DataFrames, no file I/O
+- main() -> reads the price CSV and writes:
+    signals/all_etfs_peaks.csv
+    signals/all_etfs_post_peak_lows.csv
+
+Last updated: 2025-06-22
+"""
 
 import pandas as pd
 from datetime import datetime
+from utils.data_loader import load_price_frame
 
-df = pd.read_csv("data/etf_prices_2023_2025.csv", index_col=0, parse_dates=True)
-df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
+DATA_PATH = "data/etf_prices_2023_2025.csv"
 
 etfs = ["USFR", "SGOV", "TFLO", "BIL", "SHV", "ICSH"]
 
@@ -73,22 +87,32 @@ def find_post_peak_lows(df, etf, peak_df):
 
     return pd.DataFrame(lows)
 
-def main():
+def build_peak_low_signals(df, etf_list=etfs):
+    """
+    Peaks and post-peak lows for every ETF from a date-indexed price frame.
+
+    Returns:
+        (peaks, lows): long-form DataFrames with one row per (month, ETF).
+    """
     latest_date = df.index.max()
     months = pd.date_range(start="2023-01-01", end=latest_date, freq='MS')
 
     all_peaks = []
     all_lows = []
 
-    for etf in etfs:
+    for etf in etf_list:
         peak_df = find_peak_dates(df, etf, months)
         low_df = find_post_peak_lows(df, etf, peak_df)
 
         all_peaks.append(peak_df)
         all_lows.append(low_df)
 
-    pd.concat(all_peaks).to_csv("signals/all_etfs_peaks.csv", index=False)
-    pd.concat(all_lows).to_csv("signals/all_etfs_post_peak_lows.csv", index=False)
+    return pd.concat(all_peaks), pd.concat(all_lows)
+
+def main():
+    peaks, lows = build_peak_low_signals(load_price_frame(DATA_PATH))
+    peaks.to_csv("signals/all_etfs_peaks.csv", index=False)
+    lows.to_csv("signals/all_etfs_post_peak_lows.csv", index=False)
 
     print("✅ Peaks and post-peak lows saved (long-form) to signals/")
 
@@ -4,16 +4,20 @@ import pandas as pd
 from datetime import datetime
 import os
 
-print("🚀 SGOV script started")
-print("📆 Today is:", datetime.today().date())
+LOWS_CSV = "signals/sgov_post_peak_lows.csv"
 
-def check_sgov_low():
-    df = pd.read_csv("signals/sgov_post_peak_lows.csv", parse_dates=['SGOV_Peak_Date', 'SGOV_Low_Date'])
+def load_sgov_lows(path=LOWS_CSV):
+    return pd.read_csv(path, parse_dates=['SGOV_Peak_Date', 'SGOV_Low_Date'])
 
-    latest = df.iloc[-1]
-    print(f"📄 Latest SGOV low date in CSV: {latest['SGOV_Low_Date'].date()}, value: ${latest['SGOV_Low']:.2f}")
+def check_sgov_low(df=None, today=None):
+    """
+    Prints the SGOV low-day details for `today` and returns a one-line signal.
+    `df` defaults to signals/sgov_post_peak_lows.csv.
+    """
+    if df is None:
+        df = load_sgov_lows()
 
-    today = pd.Timestamp(datetime.today().date())
+    today = pd.Timestamp(today if today is not None else datetime.today().date())
     row = df[df['SGOV_Low_Date'] == today]
 
     if not row.empty:
@@ -27,3 +31,13 @@ def check_sgov_low():
     else:
         print("📉 Today is NOT a SGOV low day.")
         return "No SGOV signal today."
+
+if __name__ == "__main__":
+    print("🚀 SGOV script started")
+    print("📆 Today is:", datetime.today().date())
+
+    df = load_sgov_lows()
+    latest = df.iloc[-1]
+    print(f"📄 Latest SGOV low date in CSV: {latest['SGOV_Low_Date'].date()}, value: ${latest['SGOV_Low']:.2f}")
+
+    print(check_sgov_low(df))
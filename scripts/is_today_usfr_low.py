@@ -4,16 +4,20 @@ import pandas as pd
 from datetime import datetime
 import os
 
-print("🚀 Script started")
-print("📆 Today is:", datetime.today().date())
+LOWS_CSV = "signals/usfr_post_peak_lows.csv"
 
-def check_usfr_low():
-    df = pd.read_csv("signals/usfr_post_peak_lows.csv", parse_dates=['USFR_Peak_Date', 'USFR_Low_Date'])
+def load_usfr_lows(path=LOWS_CSV):
+    return pd.read_csv(path, parse_dates=['USFR_Peak_Date', 'USFR_Low_Date'])
 
-    latest = df.iloc[-1]
-    print(f"📄 Latest USFR low date in CSV: {latest['USFR_Low_Date'].date()}, value: ${latest['USFR_Low']:.2f}")
+def check_usfr_low(df=None, today=None):
+    """
+    Summary string saying whether `today` is a USFR post-peak low day, or how
+    far away the next one is. `df` defaults to signals/usfr_post_peak_lows.csv.
+    """
+    if df is None:
+        df = load_usfr_lows()
 
-    today = pd.Timestamp(datetime.today().date())
+    today = pd.Timestamp(today if today is not None else datetime.today().date())
 
     row = df[df['USFR_Low_Date'] == today]
     if not row.empty:
@@ -41,7 +45,14 @@ def check_usfr_low():
             return "No upcoming USFR low dates found in data."
 
 if __name__ == "__main__":
-    summary = check_usfr_low()
+    print("🚀 Script started")
+    print("📆 Today is:", datetime.today().date())
+
+    df = load_usfr_lows()
+    latest = df.iloc[-1]
+    print(f"📄 Latest USFR low date in CSV: {latest['USFR_Low_Date'].date()}, value: ${latest['USFR_Low']:.2f}")
+
+    summary = check_usfr_low(df)
     print(summary)
 
     # Ensure reports directory exists
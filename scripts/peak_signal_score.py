@@ -14,32 +14,32 @@ Exports:
 - get_all_peak_scores()
 """
 
-import pandas as pd
-from datetime import datetime, timedelta
-import os
+from utils.data_loader import load_price_frame
+from utils.factor_scoring import compute_factor_cube, combine_factors
 
 DATA_PATH = "data/etf_prices_2023_2025.csv"
 ETF_LIST = ["SGOV", "TFLO", "SHV", "BIL", "ICSH"]
 
 def load_data():
-    df = pd.read_csv(DATA_PATH, index_col=0, parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
+    df = load_price_frame(DATA_PATH)
     return df[ETF_LIST].dropna()
 
-def compute_score(df, etf, today):
+def compute_score(df, etf, today, cube=None):
+    """
+    Score `today` for one ETF: 0.7 high proximity + 0.3 calendar window
+    (day 27+ = 1, 25–26 = 0.5), weights from ETF_CONFIG.
+    Pass a precomputed `cube` to reuse factors across ETFs and days.
+    """
     if today not in df.index:
         return None, "No data for today", None
 
+    if cube is None:
+        cube = compute_factor_cube(df, tickers=ETF_LIST)
+    scores = combine_factors(cube)
+    row = cube['dates'].get_loc(today)
     today_price = df.loc[today, etf]
-    recent_window = df.loc[today - timedelta(days=10):today]
-    ten_day_high = recent_window[etf].max()
-    high_proximity = 1 - ((ten_day_high - today_price) / ten_day_high)
 
-    # Calendar timing score
-    day = today.day
-    calendar_score = 1 if day >= 27 else 0.5 if day >= 25 else 0
-
-    score = round((0.7 * high_proximity + 0.3 * calendar_score) * 100, 1)
+    score = round(scores[row, cube['tickers'].index(etf)], 1)
 
     message = (
         "✅ Likely Peak" if score >= 75 else
@@ -60,13 +60,18 @@ def get_peak_signal_score(etf: str):
         "price": round(price, 4) if price else None
     }
 
-def get_all_peak_scores():
-    df = load_data()
+def get_all_peak_scores(df=None):
+    """Scores for every ETF on the latest date; `df` defaults to load_data()."""
+    if df is None:
+        df = load_data()
+    else:
+        df = df[ETF_LIST].dropna()
     today = df.index.max()
+    cube = compute_factor_cube(df, tickers=ETF_LIST)
     results = {}
 
     for etf in ETF_LIST:
-        score, message, price = compute_score(df, etf, today)
+        score, message, price = compute_score(df, etf, today, cube=cube)
         results[etf] = {
             "date": today.strftime("%Y-%m-%d"),
             "score": score,
@@ -3,72 +3,65 @@ sgov_post_peak_lows.py
 This script will:
 
 - Load your existing price dataset
-- Find SGOV's monthly peak (between the 18th–23rd)
-- Identify the lowest price in the following 6 calendar days
+- Find SGOV's monthly peak (last trading day of the month)
+- Identify the lowest price in the first 6 business days of the next month
 - Export the results to signals/sgov_post_peak_lows.csv
+
+Functions:
+- find_sgov_post_peak_lows(df) -> (all_df, filtered_df), no file I/O
+- main() -> prints the pairs and writes signals/sgov_post_peak_lows_full.csv
+  and signals/sgov_post_peak_lows.csv
 """
 
 import pandas as pd
+from utils.data_loader import load_price_frame
 
-# Load data
-df = pd.read_csv("data/etf_prices_2023_2025.csv", index_col=0, parse_dates=True)
-df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
-
+DATA_PATH = "data/etf_prices_2023_2025.csv"
 sgov = 'SGOV'
 
-# Dynamic date range: start fixed, end = max date in data
-start_date = "2023-01-01"
-end_date = df.index.max().strftime("%Y-%m-%d")
-months = pd.date_range(start=start_date, end=end_date, freq='MS')
-
-all_results = []
-filtered_results = []
+def find_sgov_post_peak_lows(df, start_date="2023-01-01"):
+    """
+    SGOV peak-to-low pairs per month from a date-indexed price frame.
 
-for month_start in months:
-    month_end = month_start + pd.offsets.MonthEnd(0)
-    df_month = df[(df.index >= month_start) & (df.index <= month_end)]
+    Returns:
+        (all_df, filtered_df): every detected pair, and only pairs with a negative drop.
+    """
+    # Dynamic date range: start fixed, end = max date in data
+    end_date = df.index.max().strftime("%Y-%m-%d")
+    months = pd.date_range(start=start_date, end=end_date, freq='MS')
 
-    if df_month.empty or df_month[sgov].isnull().all():
-        continue
+    all_results = []
 
-    sgov_month_prices = df_month[sgov].dropna()
-    if sgov_month_prices.empty:
-        continue
+    for month_start in months:
+        month_end = month_start + pd.offsets.MonthEnd(0)
+        df_month = df[(df.index >= month_start) & (df.index <= month_end)]
 
-    # Use the last valid trading day of the month as the peak
-    sgov_peak_day = sgov_month_prices.index.max()
-    sgov_peak_price = sgov_month_prices.loc[sgov_peak_day]
+        if df_month.empty or df_month[sgov].isnull().all():
+            continue
 
-    # Post-peak window: first 6 business days of next month
-    next_month_start = month_end + pd.Timedelta(days=1)
-    next_month_end = next_month_start + pd.offsets.BDay(5)  # 6 business days total including start
-    df_next = df[(df.index >= next_month_start) & (df.index <= next_month_end)]
-    post_peak_prices = df_next[sgov].dropna()
+        sgov_month_prices = df_month[sgov].dropna()
+        if sgov_month_prices.empty:
+            continue
 
-    if post_peak_prices.empty:
-        continue
+        # Use the last valid trading day of the month as the peak
+        sgov_peak_day = sgov_month_prices.index.max()
+        sgov_peak_price = sgov_month_prices.loc[sgov_peak_day]
 
-    sgov_low_price = post_peak_prices.min()
-    sgov_low_day = post_peak_prices.idxmin()
+        # Post-peak window: first 6 business days of next month
+        next_month_start = month_end + pd.Timedelta(days=1)
+        next_month_end = next_month_start + pd.offsets.BDay(5)  # 6 business days total including start
+        df_next = df[(df.index >= next_month_start) & (df.index <= next_month_end)]
+        post_peak_prices = df_next[sgov].dropna()
 
-    drop_pct = (sgov_low_price - sgov_peak_price) / sgov_peak_price * 100
+        if post_peak_prices.empty:
+            continue
 
-    print(f"{month_start.strftime('%Y-%m')}: Peak {sgov_peak_price:.4f} on {sgov_peak_day.date()}, "
-          f"Low {sgov_low_price:.4f} on {sgov_low_day.date()}, Drop% = {drop_pct:.3f}")
+        sgov_low_price = post_peak_prices.min()
+        sgov_low_day = post_peak_prices.idxmin()
 
-    # Append all results
-    all_results.append({
-        "Month": month_start.strftime("%Y-%m"),
-        "SGOV_Peak_Date": sgov_peak_day.strftime("%Y-%m-%d"),
-        "SGOV_Peak": sgov_peak_price,
-        "SGOV_Low_Date": sgov_low_day.strftime("%Y-%m-%d"),
-        "SGOV_Low": sgov_low_price,
-        "Drop_%": round(drop_pct, 3)
-    })
+        drop_pct = (sgov_low_price - sgov_peak_price) / sgov_peak_price * 100
 
-    # Append only if drop is negative
-    if drop_pct < 0:
-        filtered_results.append({
+        all_results.append({
             "Month": month_start.strftime("%Y-%m"),
             "SGOV_Peak_Date": sgov_peak_day.strftime("%Y-%m-%d"),
             "SGOV_Peak": sgov_peak_price,
@@ -77,19 +70,33 @@ for month_start in months:
             "Drop_%": round(drop_pct, 3)
         })
 
-# Convert to DataFrame and save
-summary_all_df = pd.DataFrame(all_results)
-summary_filtered_df = pd.DataFrame(filtered_results)
+    summary_all_df = pd.DataFrame(all_results)
+    # Keep only months where the price actually dropped after the peak
+    if summary_all_df.empty:
+        summary_filtered_df = summary_all_df
+    else:
+        summary_filtered_df = summary_all_df[summary_all_df["Drop_%"] < 0].reset_index(drop=True)
+    return summary_all_df, summary_filtered_df
+
+def main():
+    summary_all_df, summary_filtered_df = find_sgov_post_peak_lows(load_price_frame(DATA_PATH))
+
+    for _, r in summary_all_df.iterrows():
+        print(f"{r['Month']}: Peak {r['SGOV_Peak']:.4f} on {r['SGOV_Peak_Date']}, "
+              f"Low {r['SGOV_Low']:.4f} on {r['SGOV_Low_Date']}, Drop% = {r['Drop_%']:.3f}")
+
+    print("\n🔎 All detected SGOV peak-low pairs (all months):")
+    print(summary_all_df)
 
-print("\n🔎 All detected SGOV peak-low pairs (all months):")
-print(summary_all_df)
+    print("\n📉 Filtered SGOV peak-low pairs (negative drops only):")
+    print(summary_filtered_df)
 
-print("\n📉 Filtered SGOV peak-low pairs (negative drops only):")
-print(summary_filtered_df)
+    summary_all_df.to_csv("signals/sgov_post_peak_lows_full.csv", index=False)
+    summary_filtered_df.to_csv("signals/sgov_post_peak_lows.csv", index=False)
 
-summary_all_df.to_csv("signals/sgov_post_peak_lows_full.csv", index=False)
-summary_filtered_df.to_csv("signals/sgov_post_peak_lows.csv", index=False)
+    print(f"\n✅ SGOV post-peak low analysis complete.")
+    print(f"📄 Full results saved to signals/sgov_post_peak_lows_full.csv")
+    print(f"📄 Filtered results saved to signals/sgov_post_peak_lows.csv")
 
-print(f"\n✅ SGOV post-peak low analysis complete.")
-print(f"📄 Full results saved to signals/sgov_post_peak_lows_full.csv")
-print(f"📄 Filtered results saved to signals/sgov_post_peak_lows.csv")
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,11 @@ Output:
 --------
 - Two CSV files containing clean USFR peak and low data respectively.
 
+Functions:
+----------
+- split_highs_lows(df) -> (highs, lows) DataFrames, no file I/O
+- main()               -> reads the input CSV and writes both output files
+
 Usage:
 -------
 Run as a standalone script after generating or updating
@@ -33,38 +38,57 @@ signals/usfr_post_peak_highs.csv to refresh the separate peak and low files.
 """
 
 
+
 import pandas as pd
 import os
 
-# Load the original file
-input_file = "signals/usfr_post_peak_highs.csv"
-df = pd.read_csv(input_file, parse_dates=["USFR_Low_Date", "USFR_Peak_Date"])
+INPUT_FILE = "signals/usfr_post_peak_highs.csv"
+HIGHS_FILE = "signals/usfr_post_peak_highs_only.csv"
+LOWS_FILE = "signals/usfr_post_peak_lows_only.csv"
+
+def split_highs_lows(df):
+    """
+    Valid, non-overlapping low → high cycles from the combined USFR frame.
+
+    Returns:
+        (highs, lows): DataFrames with USFR_Peak_Date/USFR_Peak and
+        USFR_Low_Date/USFR_Low columns.
+    """
+    # Sort chronologically by low date
+    df = df.sort_values(by="USFR_Low_Date").reset_index(drop=True)
+
+    # Step 1: Track valid low → high cycles
+    lows = []
+    highs = []
+
+    last_high_date = pd.Timestamp("2000-01-01")  # baseline
 
-# Sort chronologically by low date
-df = df.sort_values(by="USFR_Low_Date").reset_index(drop=True)
+    for _, row in df.iterrows():
+        low_date = row["USFR_Low_Date"]
+        low_price = row["USFR_Low"]
+        high_date = row["USFR_Peak_Date"]
+        high_price = row["USFR_Peak"]
 
-# Step 1: Track valid low → high cycles
-lows = []
-highs = []
+        # Only treat this high as valid if it's after the last high
+        if low_date > last_high_date:
+            lows.append({"USFR_Low_Date": low_date, "USFR_Low": low_price})
+            highs.append({"USFR_Peak_Date": high_date, "USFR_Peak": high_price})
+            last_high_date = high_date
 
-last_high_date = pd.Timestamp("2000-01-01")  # baseline
+    return pd.DataFrame(highs), pd.DataFrame(lows)
 
-for _, row in df.iterrows():
-    low_date = row["USFR_Low_Date"]
-    low_price = row["USFR_Low"]
-    high_date = row["USFR_Peak_Date"]
-    high_price = row["USFR_Peak"]
+def main():
+    # Load the original file
+    df = pd.read_csv(INPUT_FILE, parse_dates=["USFR_Low_Date", "USFR_Peak_Date"])
+    highs, lows = split_highs_lows(df)
 
-    # Only treat this high as valid if it's after the last high
-    if low_date > last_high_date:
-        lows.append({"USFR_Low_Date": low_date, "USFR_Low": low_price})
-        highs.append({"USFR_Peak_Date": high_date, "USFR_Peak": high_price})
-        last_high_date = high_date
+    # Save clean output
+    highs.to_csv(HIGHS_FILE, index=False)
+    lows.to_csv(LOWS_FILE, index=False)
 
-# Save clean output
-pd.DataFrame(highs).to_csv("signals/usfr_post_peak_highs_only.csv", index=False)
-pd.DataFrame(lows).to_csv("signals/usfr_post_peak_lows_only.csv", index=False)
+    print("✅ Split complete. Files written:")
+    print(f" • {HIGHS_FILE}")
+    print(f" • {LOWS_FILE}")
 
-print("✅ Split complete. Files written:")
-print(" • signals/usfr_post_peak_highs_only.csv")
-print(" • signals/usfr_post_peak_lows_only.csv")
+if __name__ == "__main__":
+    main()
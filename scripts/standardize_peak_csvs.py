@@ -1,3 +1,10 @@
+# scripts/standardize_peak_csvs.py
+"""
+Renames ETF-prefixed columns (e.g. SGOV_Peak_Date) in the same-month ETFs'
+signals/*_post_peak_highs.csv files to the standard Peak_Date / Peak /
+Low_Date / Low names, in place.
+"""
+
 import pandas as pd
 import os
 
@@ -5,26 +12,31 @@ signals_dir = "signals"
 file_suffix = "_post_peak_highs.csv"
 etfs = ["SGOV", "BIL", "SHV", "TFLO", "ICSH"]
 
-for etf in etfs:
-    file_path = os.path.join(signals_dir, f"{etf.lower()}{file_suffix}")
-    if not os.path.exists(file_path):
-        print(f"❌ File not found: {file_path}")
-        continue
+def standardize_columns(df, etf):
+    """Rename all ETF-specific columns to standard ones (returns a new frame)."""
+    rename_map = {
+        f"{etf}_Peak_Date": "Peak_Date",
+        f"{etf}_Peak": "Peak",
+        f"{etf}_Low_Date": "Low_Date",
+        f"{etf}_Low": "Low"
+    }
+    return df.rename(columns=rename_map)
+
+def main():
+    for etf in etfs:
+        file_path = os.path.join(signals_dir, f"{etf.lower()}{file_suffix}")
+        if not os.path.exists(file_path):
+            print(f"❌ File not found: {file_path}")
+            continue
 
-    try:
-        df = pd.read_csv(file_path)
+        try:
+            df = standardize_columns(pd.read_csv(file_path), etf)
 
-        # Rename all ETF-specific columns to standard ones
-        rename_map = {
-            f"{etf}_Peak_Date": "Peak_Date",
-            f"{etf}_Peak": "Peak",
-            f"{etf}_Low_Date": "Low_Date",
-            f"{etf}_Low": "Low"
-        }
-        df.rename(columns=rename_map, inplace=True)
+            # Save it back
+            df.to_csv(file_path, index=False)
+            print(f"✅ Standardized: {file_path}")
+        except Exception as e:
+            print(f"⚠️ Error processing {file_path}: {e}")
 
-        # Save it back
-        df.to_csv(file_path, index=False)
-        print(f"✅ Standardized: {file_path}")
-    except Exception as e:
-        print(f"⚠️ Error processing {file_path}: {e}")
+if __name__ == "__main__":
+    main()
@@ -4,70 +4,58 @@
 # Internal renaming of 'Cycle_Start_Month' to 'Cycle_Month' for consistency.
 # Uses debug_print from utils.debug with debug_mode toggle.
 
-# Step 1 — Fix ModuleNotFoundError in update_modal_days.py
-
-# At the top of scripts/update_modal_days.py, insert this so it can find utils/:
-'''
-import sys
-import os
-
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-'''
-import sys
-import os
-
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Run from the repository root: python -m scripts.update_modal_days
 
 import pandas as pd
 from datetime import datetime
+from utils.data_loader import load_price_frame
 from utils.debug import debug_print
-
-def update_peak_modal_day(etf: str):
-    price_path = 'data/etf_prices_2023_2025.csv'
-    cycles_path = f'signals/{etf.lower()}_full_cycles.csv'
-
-    try:
-        prices = pd.read_csv(price_path)
-        cycles = pd.read_csv(cycles_path)
-    except FileNotFoundError:
-        print(f"[WARN] Missing file for {etf}, skipping.")
-        return
-
-    # Parse 'Date' column to datetime
-    prices['Date'] = pd.to_datetime(prices['Date'])
-
+from utils.profiling import profiled
+from utils.changeset import diff_rows
+from utils.signal_db import sync_csv
+
+PRICE_PATH = 'data/etf_prices_2023_2025.csv'
+
+@profiled()
+def apply_peak_modal_day(cycles, prices, etf, today=None):
+    """
+    Set Peak_Modal_Day of the latest cycle to the date of this month's highest close.
+
+    Parameters:
+        cycles (pd.DataFrame): *_full_cycles.csv rows (not modified).
+        prices (pd.DataFrame): Date-indexed price frame (utils.data_loader.load_price_frame).
+        today (datetime): Defines the current month (default: now).
+
+    Returns:
+        (updated cycles copy, peak date 'YYYY-MM-DD'), or (None, None) if
+        there is no price data for the ETF in the current month.
+    """
     etf_price_col = etf.upper()      # e.g. 'USFR'
-    etf_volume_col = etf.upper() + '_Volume'  # e.g. 'USFR_Volume'
-
     if etf_price_col not in prices.columns:
         print(f"[ERROR] ETF price column {etf_price_col} not found in CSV")
-        return
-
-    # Extract relevant columns for this ETF, rename locally
-    prices_etf = prices[['Date', etf_price_col, etf_volume_col]].copy()
-    prices_etf.rename(columns={etf_price_col: 'Price', etf_volume_col: 'Volume'}, inplace=True)
+        return None, None
 
     # Debug output - only if debug_mode = True
-    debug_print(f"prices_etf sample for {etf}:\n{prices_etf.head()}")
+    debug_print(f"prices sample for {etf}:\n{prices[etf_price_col].head()}")
 
+    cycles = cycles.copy()
     # Internal rename for consistency if needed (no permanent CSV change)
     if 'Cycle_Start_Month' in cycles.columns and 'Cycle_Month' not in cycles.columns:
         cycles.rename(columns={'Cycle_Start_Month': 'Cycle_Month'}, inplace=True)
 
     # Get current year-month string e.g. '2025-06'
-    today = datetime.today()
+    today = today or datetime.today()
     current_month = today.strftime('%Y-%m')
 
     # Filter ETF prices to current month only
-    month_prices = prices_etf[prices_etf['Date'].dt.strftime('%Y-%m') == current_month]
+    month_prices = prices.loc[prices.index.strftime('%Y-%m') == current_month, etf_price_col].dropna()
 
     if month_prices.empty:
         print(f"[INFO] No price data for {etf} in {current_month}")
-        return
+        return None, None
 
-    # Find row with highest 'Price' (corrected from 'Close')
-    peak_row = month_prices.loc[month_prices['Price'].idxmax()]
-    peak_date = peak_row['Date'].strftime('%Y-%m-%d')
+    # Date of the highest close this month
+    peak_date = month_prices.idxmax().strftime('%Y-%m-%d')
 
     # Add 'Peak_Modal_Day' column if missing (will be None initially)
     if 'Peak_Modal_Day' not in cycles.columns:
@@ -75,17 +63,41 @@ def update_peak_modal_day(etf: str):
 
     # Update last row's Peak_Modal_Day with the peak_date (string formatted)
     cycles.at[cycles.index[-1], 'Peak_Modal_Day'] = peak_date
+    return cycles, peak_date
+
+def update_peak_modal_day(etf: str, prices=None):
+    cycles_path = f'signals/{etf.lower()}_full_cycles.csv'
+
+    try:
+        if prices is None:
+            prices = load_price_frame(PRICE_PATH)
+        cycles = pd.read_csv(cycles_path)
+    except FileNotFoundError:
+        print(f"[WARN] Missing file for {etf}, skipping.")
+        return
+
+    before = cycles.rename(columns={'Cycle_Start_Month': 'Cycle_Month'})
+    cycles, peak_date = apply_peak_modal_day(cycles, prices, etf)
+    if cycles is None:
+        return
+
+    # Leave the file (and everything downstream of it) alone when nothing moved
+    if diff_rows(before, cycles, keys=['Cycle_Month']).empty:
+        print(f"[UNCHANGED] {etf} Peak_Modal_Day already {peak_date}")
+        return
 
     # Save updated cycles CSV
     cycles.to_csv(cycles_path, index=False)
+    sync_csv(cycles_path)
 
     print(f"[UPDATED] {etf} Peak_Modal_Day → {peak_date}")
 
 def update_all_modal_days():
     # List ETFs to update
     etfs = ['SGOV', 'BIL', 'SHV', 'TFLO', 'ICSH']
+    prices = load_price_frame(PRICE_PATH)
     for etf in etfs:
-        update_peak_modal_day(etf)
+        update_peak_modal_day(etf, prices)
 
 if __name__ == "__main__":
     update_all_modal_days()
@@ -7,13 +7,10 @@ Outputs CSV with monthly peak/low dates, drop %, and modal low day (for countdow
 Last update: 6/15/2025, 10:26 PM
 """
 
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import pandas as pd
 from collections import Counter
 from utils.data_loader import load_etf_data
+from utils.fixed_point import extreme_dates
 from config.etf_parameters import ETF_CONFIG, get_peak_day_window
 
 def detect_post_peak_lows(df, etf_symbol='USFR'):
@@ -40,9 +37,8 @@ def detect_post_peak_lows(df, etf_symbol='USFR'):
         if df_peak_window.empty:
             continue
 
-        max_price = df_peak_window[etf_symbol].max()
-        peak_candidates = df_peak_window[df_peak_window[etf_symbol] == max_price]
-        etf_peak_day = peak_candidates.index.max()
+        max_price, peak_days = extreme_dates(df_peak_window[etf_symbol], 'max')
+        etf_peak_day = peak_days.max()
         etf_peak_price = max_price
 
         post_peak = df[df.index > etf_peak_day]
@@ -52,8 +48,8 @@ def detect_post_peak_lows(df, etf_symbol='USFR'):
         if post_peak_trading_days.empty:
             continue
 
-        low_price = post_peak_trading_days[etf_symbol].min()
-        low_day = post_peak_trading_days[post_peak_trading_days[etf_symbol] == low_price].index[0]
+        low_price, low_days = extreme_dates(post_peak_trading_days[etf_symbol], 'min')
+        low_day = low_days[0]
         drop_pct = (low_price - etf_peak_price) / etf_peak_price * 100
         drop_pct = round(drop_pct, 3) if etf_peak_price > 0 and low_price > 0 and drop_pct > -5 else None
 
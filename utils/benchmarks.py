@@ -0,0 +1,296 @@
+"""
+utils/benchmarks.py
+Benchmark suite on a synthetic market, with history and regression checks
+
+Purpose:
+--------
+Times the main workloads (loading the CSV / fixed-point store, cycle
+detection, peak / low detection, scoring, countdowns, backtests) on a seeded
+synthetic market of N tickers × M years (utils/synthetic_market.py), so slow paths show up before production
+data grows into them. Every run is appended to a history file and compared
+against a saved baseline; a benchmark whose median time exceeds the
+baseline by more than the threshold is flagged as a regression.
+
+How:
+----
+- One context per run: the synthetic frame, its CSV, and a scratch working
+  directory holding signals/*_full_cycles.csv built from it (countdowns and
+  cycle-signal backtests read those files by relative path). Synthetic
+  tickers get ETF_CONFIG entries copied from their profile ETF for the
+  duration of the run.
+- Each benchmark is a dict {'name', 'run'}; 'run' takes the context. It runs
+  once to warm up, then `repeat` times; best and median wall times are kept.
+  Detector output (progress prints) is discarded while timing.
+- History: logs/benchmarks/history.jsonl, one JSON object per run (time,
+  commit, versions, scale, results). Baseline: logs/benchmarks/baseline.json,
+  median ms per benchmark and scale, written with --save-baseline.
+
+Usage:
+------
+    python -m utils.benchmarks                              # 24 tickers × 5 years
+    python -m utils.benchmarks --n-tickers 120 --years 10 --only peak_detection low_detection
+    python -m utils.benchmarks --save-baseline
+    python main.py bench --repeat 5 --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.synthetic_market import generate_market, synthetic_config, synthetic_tickers, write_market
+
+HISTORY_PATH = "logs/benchmarks/history.jsonl"
+BASELINE_PATH = "logs/benchmarks/baseline.json"
+DISTRIBUTION_PDF = "signals/usfr_distribution_schedule.pdf"
+
+def _is_usfr_like(ticker):
+    return ticker.rstrip('0123456789') == 'USFR'
+
+def _usfr_cycles(prices, ticker):
+    from analysis.usfr_full_cycles import detect_usfr_full_cycles
+    return detect_usfr_full_cycles(prices[[ticker]].dropna().rename(columns={ticker: 'USFR'}))
+
+# ----------------------------------------------------------------- benchmarks
+
+def bench_load(ctx):
+    from utils import data_loader
+    data_loader._PRICE_FRAME_CACHE.clear()
+    data_loader.load_price_frame(ctx['csv'])
+
+def bench_load_fixed_store(ctx):
+    from utils import data_loader
+    data_loader._PRICE_FRAME_CACHE.clear()
+    data_loader.load_price_frame(ctx['npz'])
+
+def bench_same_month_cycles(ctx):
+    from analysis.etf_full_cycles_same_month import build_same_month_cycles
+    build_same_month_cycles(ctx['prices'], ctx['same_month'])
+
+def bench_usfr_cycles(ctx):
+    for ticker in ctx['usfr_like']:
+        _usfr_cycles(ctx['prices'], ticker)
+
+def bench_peak_detection(ctx):
+    from scripts.generate_peak_csvs import build_peak_csvs
+    build_peak_csvs(ctx['frame'], ctx['tickers'])
+
+def bench_low_detection(ctx):
+    from scripts.generate_low_csvs import build_low_csvs
+    build_low_csvs(ctx['frame'], ctx['tickers'])
+
+def bench_scoring(ctx):
+    from utils.factor_scoring import combine_factors, compute_factor_cube
+    combine_factors(compute_factor_cube(ctx['prices'], tickers=ctx['tickers']))
+
+def bench_countdown(ctx):
+    from scripts.analyze_signals import check_etf_signal_with_countdown
+    with contextlib.chdir(ctx['workdir']):
+        for ticker in ctx['countdown_tickers']:
+            for signal in ('low', 'peak'):
+                check_etf_signal_with_countdown(ticker, signal)
+
+def bench_rotation_backtest(ctx):
+    from scripts.analyze_rotations import build_rotation_table, prepare_usfr_peaks
+    candidates = [t for t in ctx['tickers'] if not _is_usfr_like(t)]
+    build_rotation_table(ctx['prices'], prepare_usfr_peaks(ctx['cycles']['USFR']), candidates)
+
+def bench_swing_simulator(ctx):
+    from analysis.swing_simulator import load_cycle_signals, make_variants, simulate
+    prices = ctx['prices'][ctx['tickers']]
+    sells, buys = load_cycle_signals(prices.index, ctx['tickers'], os.path.join(ctx['workdir'], 'signals'))
+    simulate(prices, sells, buys, make_variants())
+
+def bench_optimal_rotation(ctx):
+    from analysis.optimal_rotation import optimal_path
+    optimal_path(ctx['prices'][ctx['tickers']])
+
+BENCHMARKS = [
+    {'name': 'load_prices', 'run': bench_load},
+    {'name': 'load_fixed_store', 'run': bench_load_fixed_store},
+    {'name': 'same_month_cycles', 'run': bench_same_month_cycles},
+    {'name': 'usfr_cycles', 'run': bench_usfr_cycles},
+    {'name': 'peak_detection', 'run': bench_peak_detection},
+    {'name': 'low_detection', 'run': bench_low_detection},
+    {'name': 'scoring', 'run': bench_scoring},
+    {'name': 'countdown', 'run': bench_countdown},
+    {'name': 'rotation_backtest', 'run': bench_rotation_backtest},
+    {'name': 'swing_simulator', 'run': bench_swing_simulator},
+    {'name': 'optimal_rotation', 'run': bench_optimal_rotation},
+]
+
+# ------------------------------------------------------------------- running
+
+@contextlib.contextmanager
+def benchmark_context(n_tickers=24, years=5.0, seed=0):
+    """Synthetic market, its CSV and a scratch signals/ directory; removed on exit."""
+    from analysis.etf_full_cycles_same_month import build_same_month_cycles
+    from config.etf_parameters import ETF_CONFIG
+    from utils.fixed_point import save_price_store
+
+    tickers = synthetic_tickers(n_tickers)
+    extra = synthetic_config(tickers)
+    ETF_CONFIG.update(extra)
+    workdir = tempfile.mkdtemp(prefix="etf_bench_")
+    try:
+        prices = generate_market(n_tickers, years, seed=seed)
+        csv_path = write_market(prices, os.path.join(workdir, "prices.csv"))
+        npz_path = os.path.join(workdir, "prices.npz")
+        save_price_store(prices, npz_path)
+        signals_dir = os.path.join(workdir, "signals")
+        os.makedirs(signals_dir)
+
+        same_month = [t for t in tickers if not _is_usfr_like(t)]
+        usfr_like = [t for t in tickers if _is_usfr_like(t)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            cycles = build_same_month_cycles(prices, same_month)
+            cycles.update({t: _usfr_cycles(prices, t) for t in usfr_like})
+        for ticker, table in cycles.items():
+            table.to_csv(os.path.join(signals_dir, f"{ticker.lower()}_full_cycles.csv"), index=False)
+
+        # USFR countdowns read the distribution schedule PDF; leave USFR out without it
+        if os.path.exists(DISTRIBUTION_PDF):
+            shutil.copy(DISTRIBUTION_PDF, signals_dir)
+            countdown_tickers = list(tickers)
+        else:
+            countdown_tickers = [t for t in tickers if t != 'USFR']
+
+        yield {
+            'prices': prices, 'frame': prices.reset_index(), 'csv': csv_path, 'npz': npz_path, 'workdir': workdir,
+            'tickers': tickers, 'same_month': same_month, 'usfr_like': usfr_like,
+            'countdown_tickers': countdown_tickers, 'cycles': cycles,
+            'n_tickers': n_tickers, 'years': years, 'days': len(prices),
+        }
+    finally:
+        for ticker in extra:
+            ETF_CONFIG.pop(ticker, None)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def time_benchmark(bench, ctx, repeat=3):
+    """Best and median milliseconds of `repeat` runs after one warm-up run."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        bench['run'](ctx)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bench['run'](ctx)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {'benchmark': bench['name'], 'best_ms': round(min(timings), 3),
+            'median_ms': round(statistics.median(timings), 3)}
+
+def run_suite(n_tickers=24, years=5.0, repeat=3, only=None, seed=0, benchmarks=BENCHMARKS):
+    """Time each selected benchmark; returns (results list, scale dict)."""
+    selected = [b for b in benchmarks if not only or b['name'] in only]
+    results = []
+    with benchmark_context(n_tickers, years, seed) as ctx:
+        scale = {'n_tickers': n_tickers, 'years': years, 'days': ctx['days'], 'seed': seed}
+        print(f"🧪 Synthetic market: {n_tickers} ETFs × {ctx['days']} trading days")
+        for bench in selected:
+            row = time_benchmark(bench, ctx, repeat)
+            results.append(row)
+            print(f"  {row['benchmark']:<20} best {row['best_ms']:>10.1f} ms   median {row['median_ms']:>10.1f} ms")
+    return results, scale
+
+# -------------------------------------------------------- history / baseline
+
+def _scale_key(name, scale):
+    return f"{name}@{scale['n_tickers']}x{scale['years']:g}y"
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def append_history(results, scale, path=HISTORY_PATH):
+    record = {
+        'time': datetime.now().isoformat(timespec="seconds"),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.node(),
+        **scale,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+    return record
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(results, scale, path=BASELINE_PATH):
+    """Set the baseline for these benchmarks at this scale (others are kept)."""
+    baseline = load_baseline(path)
+    baseline.update({_scale_key(r['benchmark'], scale): r['median_ms'] for r in results})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(dict(sorted(baseline.items())), f, indent=2)
+
+def compare_to_baseline(results, scale, baseline, threshold=0.10):
+    """
+    Rows of (benchmark, baseline ms, median ms, change) and the names whose
+    median exceeds the baseline by more than `threshold` (fraction).
+    """
+    rows, regressions = [], []
+    for r in results:
+        base = baseline.get(_scale_key(r['benchmark'], scale))
+        change = r['median_ms'] / base - 1 if base else None
+        rows.append({'Benchmark': r['benchmark'], 'Baseline_ms': base, 'Median_ms': r['median_ms'],
+                     'Change_%': round(change * 100, 1) if change is not None else None})
+        if change is not None and change > threshold:
+            regressions.append(r['benchmark'])
+    return pd.DataFrame(rows), regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite on a synthetic ETF market")
+    parser.add_argument('--n-tickers', type=int, default=24)
+    parser.add_argument('--years', type=float, default=5.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', choices=[b['name'] for b in BENCHMARKS], metavar='NAME')
+    parser.add_argument('--threshold', type=float, default=0.10, help="Regression threshold (fraction)")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--no-history', action='store_true')
+    args = parser.parse_args(argv)
+
+    results, scale = run_suite(args.n_tickers, args.years, args.repeat, args.only, args.seed)
+    if not args.no_history:
+        append_history(results, scale)
+
+    table, regressions = compare_to_baseline(results, scale, load_baseline(), args.threshold)
+    has_baseline = table['Baseline_ms'].notna().any()
+    if has_baseline:
+        print(table.to_string(index=False))
+    if args.save_baseline:
+        save_baseline(results, scale)
+        print(f"📌 Baseline saved to {BASELINE_PATH}")
+    elif not has_baseline:
+        print("ℹ️ No baseline for this scale yet (use --save-baseline)")
+    elif regressions:
+        print(f"❌ Regression above {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    else:
+        print("✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+utils/changeset.py
+Keyed row-level diff between two versions of a signal table
+
+Purpose:
+--------
+After a rebuild there was no way to tell which cycles, peaks or lows changed,
+so every consumer redid all of its work. diff_rows() compares new detector
+output with the previously persisted rows and returns only the inserts,
+updates and deletes; utils/signal_db.py applies that change set to the store
+and appends it to a change log that downstream steps read incrementally.
+
+How:
+----
+- Rows are keyed (default: ticker, month); for duplicate keys the last row wins.
+- Each side is put in a canonical form before hashing, so a REAL read back
+  from SQLite and an Int64 / float64 column from a CSV hash the same:
+  columns whose non-null values are all numeric become float64, the rest
+  become strings (nulls as an empty marker). Columns present on only one
+  side count as null on the other.
+- One 64-bit hash per row (pd.util.hash_pandas_object) is compared on the
+  key index; only rows whose hashes differ are compared column by column to
+  list what changed.
+
+Functions:
+----------
+- canonical(df)                     -> frame in the hashed representation
+- row_hashes(df, keys)              -> uint64 Series indexed by key
+- diff_rows(old, new, keys)         -> DataFrame: *keys, op, columns
+- summarize(changes)                -> {'insert': n, 'update': n, 'delete': n}
+
+Usage:
+------
+    from utils.changeset import diff_rows
+    changes = diff_rows(persisted, rebuilt, keys=['ticker', 'month'])
+    changes[changes['op'] == 'update']
+"""
+
+import numpy as np
+import pandas as pd
+
+KEYS = ['ticker', 'month']
+OPS = ['insert', 'update', 'delete']
+_NULL = "\x00"
+
+def _as_float(values):
+    """float64 copy of `values` if every non-null value is numeric, else None."""
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.notna().sum() != values.notna().sum():
+        return None
+    return numbers.astype('float64')
+
+def canonical(df):
+    """Numeric-looking columns as float64, everything else as str (null -> marker)."""
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        numbers = _as_float(values)
+        if numbers is not None:
+            out[col] = numbers.to_numpy()
+        else:
+            out[col] = values.astype(object).where(values.notna(), _NULL).astype(str).to_numpy(dtype=object)
+    return pd.DataFrame(out, index=df.index)
+
+def _prepare(df, keys, columns):
+    df = df.drop_duplicates(keys, keep='last')
+    values = df.reindex(columns=columns)
+    values.index = pd.MultiIndex.from_frame(df[keys].astype(str))
+    return canonical(values)
+
+def row_hashes(df, keys=KEYS, columns=None):
+    """One uint64 per row of the non-key `columns`, indexed by the key columns."""
+    columns = columns or [c for c in df.columns if c not in keys]
+    values = _prepare(df, keys, columns)
+    return pd.Series(pd.util.hash_pandas_object(values, index=False).to_numpy(), index=values.index)
+
+def diff_rows(old, new, keys=KEYS, ignore=()):
+    """
+    Change set turning `old` into `new`.
+
+    Parameters:
+        old, new (pd.DataFrame): rows with the key columns (either may be empty).
+        keys (list): columns identifying a row.
+        ignore (iterable): columns left out of the comparison (e.g. 'updated_at').
+
+    Returns:
+        pd.DataFrame with the key columns, 'op' ('insert', 'update', 'delete')
+        and 'columns' (comma-separated changed columns for updates), ordered
+        by key.
+    """
+    skip = set(keys) | set(ignore)
+    columns = list(dict.fromkeys([c for c in list(old.columns) + list(new.columns) if c not in skip]))
+    before, after = _prepare(old, keys, columns), _prepare(new, keys, columns)
+    old_hash = pd.Series(pd.util.hash_pandas_object(before, index=False).to_numpy(), index=before.index)
+    new_hash = pd.Series(pd.util.hash_pandas_object(after, index=False).to_numpy(), index=after.index)
+
+    inserted = new_hash.index.difference(old_hash.index)
+    deleted = old_hash.index.difference(new_hash.index)
+    common = new_hash.index.intersection(old_hash.index)
+    updated = common[new_hash.loc[common].to_numpy() != old_hash.loc[common].to_numpy()]
+
+    changed_cols = [""] * len(updated)
+    if len(updated):
+        a, b = before.loc[updated], after.loc[updated]
+        differs = np.column_stack([
+            ~((a[c].to_numpy() == b[c].to_numpy())
+              | (pd.isna(a[c].to_numpy()) & pd.isna(b[c].to_numpy())))
+            for c in columns]) if columns else np.zeros((len(updated), 0), dtype=bool)
+        changed_cols = [",".join(c for c, d in zip(columns, row) if d) for row in differs]
+
+    parts = []
+    for op, index, cols in (('insert', inserted, None), ('update', updated, changed_cols), ('delete', deleted, None)):
+        part = index.to_frame(index=False, name=list(keys))
+        part['op'] = op
+        part['columns'] = cols if cols is not None else ""
+        parts.append(part)
+    changes = pd.concat(parts, ignore_index=True)
+    return changes.sort_values(list(keys), kind='stable').reset_index(drop=True)
+
+def summarize(changes):
+    counts = changes['op'].value_counts() if len(changes) else {}
+    return {op: int(counts.get(op, 0)) for op in OPS}
@@ -0,0 +1,421 @@
+"""
+utils/cli.py
+Unified command line for the ETF swing signal system
+
+Purpose:
+--------
+One entry point instead of main.py, test_signal.py and a dozen standalone
+scripts. Each subcommand wraps the existing functions:
+
+    fetch       download prices (all ETFs, or merge a subset into the price file)
+    detect      rebuild full cycles / post-peak highs and lows (pipeline stages)
+    score       peak signal scores for the latest trading day
+    countdown   next Low / Peak modal day and days until it
+    report      today's low / peak checks (the old main.py output)
+    backtest    run one of the backtest engines with its own arguments
+    bench       benchmark suite on a synthetic market (utils/benchmarks.py)
+    snapshot    take / list / diff / restore signal snapshots (utils/snapshots.py)
+    percentile  today's price vs the same trading day historically (utils/day_percentiles.py)
+    forecast    next peak value of every ETF, or its backfilled error (utils/peak_forecast.py)
+    intraday    ingest minute bars, daily resample, intraday windows (utils/intraday.py)
+    serve       keep a warm process that the other subcommands reuse
+
+How:
+----
+- Only argparse is imported up front; each subcommand imports its modules
+  (pandas, scripts.*, analysis.*) when it runs.
+- --tickers takes names separated by spaces or commas ('all' for every ETF).
+- `serve` starts a local daemon (multiprocessing.connection on 127.0.0.1
+  with a random authkey, published in logs/cli_server.json, mode 0600).
+  While it runs, other invocations from the same directory send their
+  arguments to it (JSON, never pickles) and print its output, so imports and the parsed price frame stay in memory
+  between calls. load_price_frame() re-reads the CSV when the file changes.
+  Restart the daemon after editing code. --local bypasses it.
+
+Usage:
+------
+    python main.py report
+    python main.py countdown --tickers USFR,SGOV --signal low
+    python main.py detect --in-memory
+    python main.py detect --partitioned --workers 4
+    python main.py backtest optimal --spread-bps 2
+    python main.py --profile detect --in-memory     # timings to logs/profiles/
+    python main.py serve &            # then repeat any command, warm
+    python main.py serve --stop
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import secrets
+import sys
+import traceback
+
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+PRICES = "data/etf_prices_2023_2025.csv"
+SERVER_FILE = "logs/cli_server.json"
+
+DETECT_STAGES = ['same_month_cycles', 'usfr_cycles', 'peak_csvs', 'low_csvs', 'modal_days']
+
+# Engine name -> 'module:function'; remaining arguments are passed to its parser
+BACKTEST_ENGINES = {
+    'rotation': 'scripts.analyze_rotations:main',
+    'rotation-summary': 'scripts.etf_rotation_backtest:main',
+    'swing': 'analysis.swing_simulator:main',
+    'optimal': 'analysis.optimal_rotation:main',
+    'walk-forward': 'analysis.walk_forward:main',
+    'bootstrap': 'analysis.cycle_bootstrap:main',
+    'calibration': 'analysis.score_calibration:main',
+}
+
+def _resolve(call):
+    import importlib
+    module_name, func = call.split(':')
+    module = importlib.import_module(module_name)
+    return module, getattr(module, func)
+
+def parse_tickers(values, default=ETF_LIST):
+    """['USFR,SGOV', 'bil'] -> ['USFR', 'SGOV', 'BIL']; None or 'all' -> default."""
+    if not values:
+        return list(default)
+    tickers = [t.strip().upper() for v in values for t in v.split(',') if t.strip()]
+    return list(default) if 'ALL' in tickers else tickers
+
+# ---------------------------------------------------------------- subcommands
+
+def _cmd_fetch(args):
+    import pandas as pd
+    from scripts.fetch_etf_data import fetch_prices, merge_prices, save_prices, start_date
+
+    tickers = parse_tickers(args.tickers)
+    fresh = fetch_prices(tickers, args.start or start_date)
+    if set(tickers) != set(ETF_LIST) and os.path.exists(args.output):
+        fresh = merge_prices(pd.read_csv(args.output), fresh)
+    save_prices(fresh, args.output)
+
+def _latest_cycles(full_cycles, tickers):
+    import pandas as pd
+    rows = []
+    for etf in tickers:
+        cycles = full_cycles.get(etf)
+        if cycles is None or cycles.empty:
+            rows.append({'ETF': etf, 'Cycles': 0})
+            continue
+        last = cycles.iloc[-1]
+        rows.append({'ETF': etf, 'Cycles': len(cycles),
+                     'Last_Low_Date': last['Low_Date'], 'Low': last['Low'],
+                     'Last_Peak_Date': last['Peak_Date'], 'Peak': last['Peak'],
+                     'Gain_%': last['Gain_%']})
+    return pd.DataFrame(rows)
+
+def _cmd_detect(args):
+    tickers = parse_tickers(args.tickers)
+    if args.in_memory or args.partitioned:
+        from utils.pipeline import run_in_memory
+        from utils.partitions import run_partitioned
+        results = run_partitioned(workers=args.workers) if args.partitioned else run_in_memory()
+        print(_latest_cycles(results['full_cycles'], tickers).to_string(index=False))
+        return 0
+
+    import pandas as pd
+    from utils.pipeline import run_pipeline
+
+    stages = args.stages or DETECT_STAGES
+    status = run_pipeline(targets=stages, force=stages if args.force else (), skip=['fetch'],
+                          dry_run=args.dry_run)
+    if args.dry_run:
+        return 0
+    full_cycles = {}
+    for etf in tickers:
+        path = f"signals/{etf.lower()}_full_cycles.csv"
+        if os.path.exists(path):
+            full_cycles[etf] = pd.read_csv(path)
+    print(_latest_cycles(full_cycles, tickers).to_string(index=False))
+    return 1 if any(s in ('failed', 'blocked') for s in status.values()) else 0
+
+def _cmd_score(args):
+    import pandas as pd
+    from analysis.usfr_peak_signal import ETF_PEERS, compute_score
+    from scripts.peak_signal_score import get_all_peak_scores
+    from utils.data_loader import load_price_frame
+
+    tickers = parse_tickers(args.tickers)
+    prices = load_price_frame(PRICES)
+    scores = get_all_peak_scores(prices)
+    if 'USFR' in tickers:
+        usfr = prices[['USFR'] + ETF_PEERS].dropna()
+        today = usfr.index.max()
+        score, message, price = compute_score(today, usfr)
+        scores['USFR'] = {"date": today.strftime("%Y-%m-%d"), "score": score, "message": message,
+                          "price": round(price, 4) if price else None}
+
+    rows = [{'ETF': etf, **scores[etf]} for etf in tickers if etf in scores]
+    if args.log:
+        from utils.factor_scoring import SCORER_ETF, SCORER_USFR, scorer_version
+        from utils.signal_log import log_scores
+        # USFR comes from its own scorer; the rest from scripts/peak_signal_score.py
+        log_scores([{'date': r['date'], 'ticker': r['ETF'], 'score': r['score'],
+                     'signal': r['message'], 'price': r['price'],
+                     'scorer_version': scorer_version(SCORER_USFR if r['ETF'] == 'USFR' else SCORER_ETF)}
+                    for r in rows if r['score'] is not None])
+    print(pd.DataFrame(rows).to_string(index=False))
+
+def _cmd_countdown(args):
+    from scripts.analyze_signals import check_etf_signal_with_countdown
+
+    for etf in parse_tickers(args.tickers):
+        for signal in args.signal:
+            result = check_etf_signal_with_countdown(etf, signal)
+            print(f"ETF: {etf} Signal: {signal.capitalize()}")
+            print("Message:", result['text'])
+            print("Days until next:", result['days_until'])
+            print("---")
+
+def _cmd_report(args):
+    from datetime import datetime
+    from scripts.analyze_lows import check_low
+    from scripts.analyze_peaks import check_peak
+
+    tickers = parse_tickers(args.tickers)
+    print(f"📆 Today is: {datetime.today().date()}\n")
+    for etf in tickers:
+        print(f"\n🔍 Checking LOW signal for {etf}...")
+        print(check_low(etf))
+    for etf in tickers:
+        print(f"\n🔍 Checking PEAK signal for {etf}...")
+        print(check_peak(etf))
+    if args.save:
+        from scripts.daily_usfr_report import main as daily_usfr_report
+        print()
+        daily_usfr_report()
+
+def _cmd_backtest(args):
+    module, func = _resolve(BACKTEST_ENGINES[args.engine])
+    saved_argv = sys.argv
+    sys.argv = [module.__name__] + args.engine_args
+    try:
+        func()
+    finally:
+        sys.argv = saved_argv
+
+def _cmd_bench(args):
+    from utils.benchmarks import main as run_benchmarks
+    return run_benchmarks(args.extra_args)
+
+def _cmd_snapshot(args):
+    from utils.snapshots import main as run_snapshots
+    return run_snapshots(args.extra_args)
+
+def _cmd_percentile(args):
+    from utils.day_percentiles import main as run_percentiles
+    return run_percentiles(args.extra_args or ['score'])
+
+def _cmd_forecast(args):
+    from utils.peak_forecast import main as run_forecast
+    return run_forecast(args.extra_args)
+
+def _cmd_intraday(args):
+    from utils.intraday import main as run_intraday
+    return run_intraday(args.extra_args)
+
+# --------------------------------------------------------------- warm server
+# Messages are JSON bytes: conn.recv() would unpickle whatever a client sends.
+
+def _send_json(conn, obj):
+    conn.send_bytes(json.dumps(obj).encode())
+
+def _recv_json(conn):
+    return json.loads(conn.recv_bytes().decode())
+
+def _write_private(path, obj):
+    """Write JSON readable by the owner only (the file holds the authkey)."""
+    if os.path.exists(path):
+        os.remove(path)                   # O_CREAT keeps an existing file's mode
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(obj, f)
+
+def serve(server_file=SERVER_FILE):
+    """Answer forwarded invocations until `serve --stop` (one at a time)."""
+    from multiprocessing.connection import Listener
+
+    authkey = secrets.token_bytes(16)
+    with Listener(('127.0.0.1', 0), authkey=authkey) as listener:
+        # Warm up: the modules every subcommand needs, and the parsed price frame
+        for module in ('pandas', 'scripts.analyze_signals', 'scripts.peak_signal_score',
+                       'analysis.usfr_peak_signal', 'utils.pipeline'):
+            __import__(module)
+        from utils.data_loader import load_price_frame
+        load_price_frame(PRICES)
+
+        os.makedirs(os.path.dirname(server_file), exist_ok=True)
+        host, port = listener.address
+        _write_private(server_file, {'host': host, 'port': port, 'authkey': authkey.hex(),
+                                     'pid': os.getpid(), 'cwd': os.getcwd()})
+        print(f"🔥 Serving on {host}:{port} (pid {os.getpid()}); stop with: python main.py serve --stop")
+        try:
+            while True:
+                try:
+                    with listener.accept() as conn:
+                        argv = _recv_json(conn)
+                        if argv == 'stop':
+                            _send_json(conn, [0, "🛑 Server stopped\n"])
+                            break
+                        if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+                            _send_json(conn, [2, "❌ Expected a list of arguments\n"])
+                            continue
+                        _send_json(conn, list(_run_captured(argv)))
+                except (EOFError, OSError, ValueError) as e:
+                    print(f"⚠️ Dropped client: {e}")
+        finally:
+            if os.path.exists(server_file):
+                os.remove(server_file)
+
+def _run_captured(argv):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            code = run(argv)
+        except SystemExit as e:                  # argparse errors / --help
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+    return code, out.getvalue()
+
+def _forward(argv, server_file=SERVER_FILE):
+    """Run `argv` in the warm server; None if no server is reachable from here."""
+    if not os.path.exists(server_file):
+        return None
+    from multiprocessing.connection import Client
+    try:
+        with open(server_file) as f:
+            info = json.load(f)
+        if info['cwd'] != os.getcwd():
+            return None
+        with Client((info['host'], info['port']), authkey=bytes.fromhex(info['authkey'])) as conn:
+            _send_json(conn, argv)
+            code, output = _recv_json(conn)
+    except (OSError, EOFError, ValueError, KeyError):
+        return None
+    print(output, end='')
+    return code
+
+# ----------------------------------------------------------------- arguments
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="ETF swing signal system")
+    parser.add_argument('--local', action='store_true', help="Run in this process even if a server is up")
+    parser.add_argument('--profile', action='store_true',
+                        help="Record stage / detector timings to logs/profiles/")
+    parser.add_argument('--profile-memory', action='store_true', help="Also record tracemalloc peaks")
+    sub = parser.add_subparsers(dest='command')
+
+    tickers = argparse.ArgumentParser(add_help=False)
+    tickers.add_argument('--tickers', nargs='+', metavar='ETF',
+                         help="ETFs, space or comma separated, or 'all' (default: all)")
+
+    p = sub.add_parser('fetch', parents=[tickers], help="Download prices from Yahoo Finance")
+    p.add_argument('--start', default=None, help="First date (default: 2023-01-01)")
+    p.add_argument('--output', default=PRICES)
+    p.set_defaults(handler=_cmd_fetch)
+
+    p = sub.add_parser('detect', parents=[tickers], help="Rebuild cycle and peak / low signal files")
+    p.add_argument('--stages', nargs='+', choices=DETECT_STAGES, help="Pipeline stages (default: all detection)")
+    p.add_argument('--force', action='store_true', help="Rerun the stages even if up to date")
+    p.add_argument('--dry-run', action='store_true', help="Show what would run")
+    p.add_argument('--in-memory', action='store_true', help="Detect without writing any files")
+    p.add_argument('--partitioned', action='store_true',
+                   help="Like --in-memory, streaming the price file in month partitions (utils/partitions.py)")
+    p.add_argument('--workers', type=int, default=None, help="Process pool size for --partitioned")
+    p.set_defaults(handler=_cmd_detect)
+
+    p = sub.add_parser('score', parents=[tickers], help="Peak signal scores for the latest day")
+    p.add_argument('--log', action='store_true', help="Upsert the scores into signals/signals.db")
+    p.set_defaults(handler=_cmd_score)
+
+    p = sub.add_parser('countdown', parents=[tickers], help="Days until the next Low / Peak modal day")
+    p.add_argument('--signal', nargs='+', choices=['low', 'peak'], default=['low', 'peak'],
+                   type=str.lower)
+    p.set_defaults(handler=_cmd_countdown)
+
+    p = sub.add_parser('report', parents=[tickers], help="Today's low / peak checks")
+    p.add_argument('--save', action='store_true', help="Also write reports/usfr_report_<date>.txt")
+    p.set_defaults(handler=_cmd_report)
+
+    p = sub.add_parser('backtest', help="Run a backtest engine (arguments after the engine go to it)")
+    p.add_argument('engine', choices=sorted(BACKTEST_ENGINES))
+    p.add_argument('engine_args', nargs=argparse.REMAINDER)
+    p.set_defaults(handler=_cmd_backtest)
+
+    p = sub.add_parser('bench', help="Benchmark suite on a synthetic market (arguments go to utils.benchmarks)")
+    p.set_defaults(handler=_cmd_bench, passthrough=True)
+
+    p = sub.add_parser('snapshot', help="Signal file snapshots (arguments go to utils.snapshots)")
+    p.set_defaults(handler=_cmd_snapshot, passthrough=True)
+
+    p = sub.add_parser('percentile', help="Price percentile by trading day (arguments go to utils.day_percentiles)")
+    p.set_defaults(handler=_cmd_percentile, passthrough=True)
+
+    p = sub.add_parser('forecast', help="Peak value forecast for all ETFs (arguments go to utils.peak_forecast)")
+    p.set_defaults(handler=_cmd_forecast, passthrough=True)
+
+    p = sub.add_parser('intraday', help="Minute-bar store and intraday windows (arguments go to utils.intraday)")
+    p.set_defaults(handler=_cmd_intraday, passthrough=True)
+
+    p = sub.add_parser('serve', help="Keep a warm process for repeated invocations")
+    p.add_argument('--stop', action='store_true', help="Stop the running server")
+    return parser
+
+def parse(argv):
+    """Parse `argv`; subcommands with passthrough=True keep unknown options in args.extra_args."""
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, 'passthrough', False):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.extra_args = extra
+    return args
+
+def run(argv):
+    """Run one invocation in this process; returns the exit code."""
+    args = parse(argv)
+    if args.command is None:
+        args = parse(list(argv) + ['report'])
+    if not (args.profile or args.profile_memory):
+        return args.handler(args) or 0
+
+    from utils import profiling
+    profiling.enable(memory=args.profile_memory)
+    try:
+        with profiling.span(f"cli:{args.command}"):
+            code = args.handler(args)
+        profiling.print_summary()
+        profiling.write_run(args.command)
+    finally:
+        profiling.disable()
+        profiling.reset()
+    return code or 0
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    args = parse(argv)
+
+    if args.command == 'serve':
+        if not args.stop:
+            serve()
+            return 0
+        code = _forward('stop')
+        if code is None:
+            print("ℹ️ No server running")
+        return 0
+
+    if not args.local:
+        code = _forward(argv)
+        if code is not None:
+            return code
+    return run(argv)
+
+if __name__ == "__main__":
+    sys.exit(main())
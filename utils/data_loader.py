@@ -1,15 +1,69 @@
-# utils/data_loader.py 
+# utils/data_loader.py
 # Create a helper module to load and preprocess ETF data
 
+import os
 import pandas as pd
 
-# Your load_etf_data() function reads the CSV and preprocesses 
+PRICE_CSV = 'data/etf_prices_2023_2025.csv'
+QUARANTINE_CSV = 'data/price_quarantine.csv'   # written by utils/data_quality.py
+
+# Your load_etf_data() function reads the CSV and preprocesses
 # the DataFrame (including forward-filling and date parsing).
 def load_etf_data(filepath):
-    df = pd.read_csv(filepath)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df.set_index('Date', inplace=True)
-    df = df.sort_index()
-    df = df.asfreq('B')  # Optional: aligns index to business days
+    from utils.synthetic_market import market_calendar
+    df = load_price_frame(filepath)
+    # Align to NYSE sessions (not asfreq('B'), which turned holidays into
+    # fake flat days); only sessions missing from the file are forward-filled
+    sessions = market_calendar(df.index.min(), df.index.max())
+    df = df.reindex(sessions.rename('Date'))
     df.ffill(inplace=True)
     return df
+
+# Parsed price frames keyed by (path, mtime_ns, size) so every scorer and
+# dashboard refresh shares one read of the CSV until the file changes.
+_PRICE_FRAME_CACHE = {}
+
+def _version(path):
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def quarantine_version(quarantine=QUARANTINE_CSV):
+    """[mtime_ns, size] of the quarantine file (None if absent), for caches of derived outputs."""
+    version = _version(quarantine)
+    return list(version) if version else None
+
+def load_price_frame(filepath=PRICE_CSV, quarantine=QUARANTINE_CSV):
+    """
+    Load the wide price/volume CSV with a naive DatetimeIndex, sorted by date.
+    A .npz path is read as the fixed-point store (utils/fixed_point.py);
+    prices are always returned in dollars.
+
+    Ranges listed in the `quarantine` file (utils/data_quality.py) are
+    removed: duplicate dates keep their last row, bad rows are dropped and
+    bad ticker ranges become NaN. Pass quarantine=None for the raw file.
+
+    The parsed frame is cached per file version (path + modification time), so
+    repeated calls in one process do not re-read the CSV. Treat the returned
+    frame as read-only; select columns (which copies) before modifying it.
+    """
+    stat = os.stat(filepath)
+    key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size, quarantine, _version(quarantine))
+    df = _PRICE_FRAME_CACHE.get(key)
+    if df is None:
+        if str(filepath).endswith('.npz'):
+            from utils.fixed_point import load_price_store
+            df = load_price_store(filepath)
+        else:
+            df = pd.read_csv(filepath, index_col=0, parse_dates=True)
+            df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
+        df.index.name = 'Date'
+        df = df.sort_index(kind='stable')
+        if key[-1] is not None:
+            from utils.data_quality import apply_quarantine, load_quarantine
+            df = apply_quarantine(df, load_quarantine(quarantine))
+        for stale in [k for k in _PRICE_FRAME_CACHE if k[0] == key[0] and k[3] == quarantine]:
+            del _PRICE_FRAME_CACHE[stale]
+        _PRICE_FRAME_CACHE[key] = df
+    return df
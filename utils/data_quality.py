@@ -0,0 +1,221 @@
+"""
+utils/data_quality.py
+Vectorized data-quality gate for the price store
+
+Purpose:
+--------
+The detectors trusted the price file as-is: holidays forward-filled by
+load_etf_data() become fake flat days, duplicate dates and stale repeated
+closes go unnoticed, and a bad print becomes a peak or a low. This stage
+checks every ticker in one pass over the price / volume matrices, prints a
+compact report and writes the affected ranges to a quarantine file that
+utils/data_loader.load_price_frame() applies on load.
+
+Checks:
+-------
+(E = error, quarantined; W = warning; I = info, reported only)
+- duplicate_date    E  the same date more than once (the last row is kept)
+- non_session       E  a row on a weekend / NYSE holiday (dropped)
+- missing_session   W  an NYSE session absent from the file
+- missing_price     W  a NaN close inside a ticker's listed span
+- non_positive      E  close <= 0
+- stale_run         E  STALE_RUN or more identical closes in a row (all but the first)
+- repeated_row      E  close and volume both equal to the previous session's
+- outlier_jump      E  |log return| > MAX_JUMP (a jump that reverts the next day: the first day)
+- volume_missing    W  volume NaN or <= 0 on a priced day
+- volume_spike      W  volume > VOLUME_SPIKE × the median of the prior VOLUME_WINDOW sessions
+- float_noise       I  closes off the 1/10,000 grid (yfinance float32 residue), count per ticker
+
+How:
+----
+- Each check is one boolean matrix (dates × tickers); flagged cells are
+  merged into [Start, End] ranges per ticker with one diff over the padded
+  matrix. Row-level checks use ETF '*'.
+- The quarantine (data/price_quarantine.csv) holds the error ranges; clean
+  data leaves it empty, so loaded frames are unchanged.
+
+Functions:
+----------
+- validate(frame)                   -> DataFrame: ETF, Check, Severity, Start, End, Rows
+- quarantine_ranges(issues)         -> the error rows
+- apply_quarantine(frame, ranges)   -> frame with quarantined cells NaN / rows dropped
+- format_report(issues)             -> compact text report
+- main()                            pipeline stage: validate, report, write the quarantine
+
+Usage:
+------
+    python -m utils.data_quality
+    python -m utils.data_quality --input data/etf_prices_2023_2025.csv --all
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import PRICE_CSV, QUARANTINE_CSV
+
+STALE_RUN = 6          # identical closes in a row (T-bill ETFs reach 4 on real ties)
+MAX_JUMP = 0.02        # |log return|; ex-dividend drops are ~0.5%
+VOLUME_SPIKE = 100.0
+VOLUME_WINDOW = 21
+PRICE_GRID = 10_000    # 1/10,000 dollar
+
+SEVERITY = {
+    'duplicate_date': 'error', 'non_session': 'error', 'missing_session': 'warning',
+    'missing_price': 'warning', 'non_positive': 'error', 'stale_run': 'error',
+    'repeated_row': 'error', 'outlier_jump': 'error', 'volume_missing': 'warning',
+    'volume_spike': 'warning', 'float_noise': 'info',
+}
+COLUMNS = ['ETF', 'Check', 'Severity', 'Start', 'End', 'Rows']
+
+def _ranges(flags, dates, names, check):
+    """Runs of True in each column of `flags` -> issue rows."""
+    if not flags.any():
+        return []
+    padded = np.zeros((flags.shape[0] + 2, flags.shape[1]), dtype=np.int8)
+    padded[1:-1] = flags
+    edges = np.diff(padded, axis=0)
+    cols, starts = np.nonzero(edges.T == 1)        # column-major: ranges grouped by ticker
+    _, ends = np.nonzero(edges.T == -1)
+    return [{'ETF': names[c], 'Check': check, 'Severity': SEVERITY[check],
+             'Start': dates[s], 'End': dates[e - 1], 'Rows': int(e - s)}
+            for c, s, e in zip(cols, starts, ends)]
+
+def _run_lengths(same):
+    """Length so far of the run of True ending at each cell (column-wise; 0 where False)."""
+    idx = np.arange(same.shape[0])[:, None]
+    last_break = np.maximum.accumulate(np.where(~same, idx, -1), axis=0)
+    return idx - last_break
+
+def validate(frame):
+    """
+    Run every check on a Date-indexed price frame (raw, not quarantined).
+
+    Returns:
+        pd.DataFrame with COLUMNS, one row per flagged range (float_noise: one
+        row per ticker spanning the file, Rows = number of noisy closes).
+    """
+    from utils.synthetic_market import market_calendar
+
+    tickers = [c for c in frame.columns if not c.endswith('_Volume')]
+    dates = frame.index
+    prices = frame[tickers].to_numpy(np.float64)
+    volume = frame.reindex(columns=[f"{t}_Volume" for t in tickers]).to_numpy(np.float64)
+    issues = []
+    if not len(frame):
+        return pd.DataFrame(issues, columns=COLUMNS)
+
+    sessions = market_calendar(dates.min(), dates.max())
+    row_checks = {
+        'duplicate_date': dates.duplicated(keep='last'),
+        'non_session': ~dates.isin(sessions),
+    }
+    for check, flags in row_checks.items():
+        issues += _ranges(np.asarray(flags)[:, None], dates, ['*'], check)
+    bad_row = np.asarray(dates.duplicated(keep=False) | row_checks['non_session'])
+    missing = ~sessions.isin(dates)
+    issues += _ranges(missing[:, None], sessions, ['*'], 'missing_session')
+
+    priced = ~np.isnan(prices)
+    seen = np.maximum.accumulate(priced, axis=0)
+    remaining = np.maximum.accumulate(priced[::-1], axis=0)[::-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_ret = np.diff(np.log(np.where(prices > 0, prices, np.nan)), axis=0, prepend=np.nan)
+        same = np.vstack([np.zeros((1, len(tickers)), bool), prices[1:] == prices[:-1]])
+        same_volume = np.vstack([np.zeros((1, len(tickers)), bool), volume[1:] == volume[:-1]])
+        run = _run_lengths(same)
+        run_end = same & ~np.vstack([same[1:], np.zeros((1, len(tickers)), bool)])
+        run_total = pd.DataFrame(np.where(run_end, run, np.nan)).bfill().to_numpy()
+        stale = same & (run_total >= STALE_RUN - 1)
+        jump = np.abs(np.nan_to_num(log_ret)) > MAX_JUMP
+        # a bad print jumps and reverts: only the first of the two returns is flagged
+        reverts = jump & np.vstack([np.zeros((1, len(tickers)), bool), jump[:-1]]) \
+            & (np.sign(log_ret) != np.sign(np.vstack([np.full((1, len(tickers)), np.nan), log_ret[:-1]])))
+        base = pd.DataFrame(volume).rolling(VOLUME_WINDOW, min_periods=5).median().shift().to_numpy()
+        spike = volume > VOLUME_SPIKE * base
+
+    checks = {
+        'missing_price': ~priced & seen & remaining,
+        'non_positive': priced & (prices <= 0),
+        'stale_run': stale,
+        'repeated_row': same & same_volume & priced & ~bad_row[:, None],
+        'outlier_jump': jump & ~reverts,
+        'volume_missing': priced & ~(volume > 0),
+        'volume_spike': spike,
+    }
+    for check, flags in checks.items():
+        issues += _ranges(flags, dates, tickers, check)
+
+    noisy = priced & (np.abs(prices * PRICE_GRID - np.round(prices * PRICE_GRID)) > 1e-6)
+    for t, n in zip(tickers, noisy.sum(axis=0)):
+        if n:
+            issues.append({'ETF': t, 'Check': 'float_noise', 'Severity': 'info',
+                           'Start': dates.min(), 'End': dates.max(), 'Rows': int(n)})
+    return pd.DataFrame(issues, columns=COLUMNS)
+
+def quarantine_ranges(issues):
+    return issues[issues['Severity'] == 'error'].reset_index(drop=True)
+
+def load_quarantine(path=QUARANTINE_CSV):
+    """Quarantined ranges (empty frame if the file is missing)."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(path, parse_dates=['Start', 'End'])
+
+def apply_quarantine(frame, ranges):
+    """
+    Copy of `frame` without the quarantined data: duplicate dates keep their
+    last row, other row-level ranges are dropped, ticker ranges become NaN
+    (close and volume).
+    """
+    if ranges is None or not len(ranges):
+        return frame
+    frame = frame.copy()
+    rows = ranges[ranges['ETF'] == '*']
+    if (rows['Check'] == 'duplicate_date').any():
+        frame = frame[~frame.index.duplicated(keep='last')]
+    for start, end in rows.loc[rows['Check'] != 'duplicate_date', ['Start', 'End']].itertuples(index=False):
+        frame = frame[(frame.index < start) | (frame.index > end)]
+    for etf, start, end in ranges.loc[ranges['ETF'] != '*', ['ETF', 'Start', 'End']].itertuples(index=False):
+        columns = [c for c in (etf, f"{etf}_Volume") if c in frame.columns]
+        frame.loc[(frame.index >= start) & (frame.index <= end), columns] = np.nan
+    return frame
+
+def format_report(issues, show_all=False):
+    """Counts per check and severity, then the error / warning ranges (first 20 unless show_all)."""
+    if not len(issues):
+        return "✅ Price data passed all checks"
+    counts = issues.groupby(['Severity', 'Check'])['Rows'].agg(['count', 'sum'])
+    lines = ["🔎 Data quality", counts.rename(columns={'count': 'ranges', 'sum': 'rows'}).to_string()]
+    listed = issues[issues['Severity'] != 'info']
+    if len(listed):
+        shown = listed if show_all else listed.head(20)
+        lines += ["", shown.assign(Start=shown['Start'].dt.strftime('%Y-%m-%d'),
+                                   End=shown['End'].dt.strftime('%Y-%m-%d')).to_string(index=False)]
+        if len(shown) < len(listed):
+            lines.append(f"... {len(listed) - len(shown)} more (--all)")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the price file and quarantine bad ranges")
+    parser.add_argument('--input', default=PRICE_CSV)
+    parser.add_argument('--quarantine', default=QUARANTINE_CSV)
+    parser.add_argument('--all', action='store_true', help="List every flagged range")
+    args = parser.parse_args(argv)
+
+    from utils.data_loader import load_price_frame
+    issues = validate(load_price_frame(args.input, quarantine=None))
+    print(format_report(issues, show_all=args.all))
+    ranges = quarantine_ranges(issues)
+    os.makedirs(os.path.dirname(args.quarantine) or ".", exist_ok=True)
+    ranges.assign(Start=ranges['Start'].dt.strftime('%Y-%m-%d'),
+                  End=ranges['End'].dt.strftime('%Y-%m-%d')).to_csv(args.quarantine, index=False)
+    if len(ranges):
+        print(f"🚧 {len(ranges)} ranges ({ranges['Rows'].sum()} rows) quarantined in {args.quarantine}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
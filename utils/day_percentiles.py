@@ -0,0 +1,263 @@
+"""
+utils/day_percentiles.py
+Memory-mapped percentile / z-score lookup by ticker and trading day of month
+
+Purpose:
+--------
+Answers "where is today's price versus this trading day historically" without
+re-reading the price history: for each (ticker, trading day of month) the
+historical closes are kept sorted in a flat array on disk, memory-mapped, so a
+live price is placed by one offset lookup and a binary search. One call
+scores the whole universe, which is what an intraday anomaly screen needs.
+
+Storage:
+--------
+signals/day_percentiles/
+- start_values.npy / end_values.npy     float64, all segments back to back,
+                                        each segment sorted ascending
+- start_offsets.npy / end_offsets.npy   int64, segment k = values[off[k]:off[k+1]]
+- start_moments.npy / end_moments.npy   float64 (keys × 2): mean, std (ddof=1)
+- meta.json                             tickers, max_day, source file + quarantine versions
+Segment key = ticker index × (max_day + 1) + trading day. 'start' counts
+trading days from the first of the month (1 = first), 'end' back from the
+month end (1 = last), as in scripts/generate_etf_day_stats.py; a ticker's
+open month is only in the 'end' arrays once it has closed.
+
+How:
+----
+- build_index() reuses generate_etf_day_stats.assign_trading_day() on the
+  long price frame and writes the arrays with one sort.
+- load_index() maps the arrays read-only (np.load(mmap_mode='r')); pages
+  are read on first touch and shared between processes.
+- The live trading day of a date comes from the NYSE calendar
+  (utils/synthetic_market.market_calendar), so it is known before the
+  day's bar is in the price file.
+- Percentile = mid-rank (values below + half the ties) / count × 100.
+
+Functions:
+----------
+- build_index(df_all, out_dir)                      write the arrays
+- ensure_index(price_csv, out_dir)                  rebuild when the price file changed
+- load_index(out_dir)                               memory-mapped index dict
+- trading_day(date, basis)                          trading day number of a date
+- percentile_rank(index, ticker, price, day, basis) -> (percentile, z, count)
+- score_universe(prices, date, basis)               -> DataFrame for all tickers
+
+Usage:
+------
+    python -m utils.day_percentiles build
+    python -m utils.day_percentiles score                       # latest closes
+    python -m utils.day_percentiles score --date 2025-06-18 --basis end SGOV=100.55 USFR=50.44
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+from datetime import date as _date
+
+import numpy as np
+import pandas as pd
+
+from scripts.generate_etf_day_stats import BASES, INPUT_CSV, assign_trading_day, to_long
+from utils.data_loader import load_price_frame, quarantine_version
+
+INDEX_DIR = "signals/day_percentiles"
+
+def _source_version(path):
+    stat = os.stat(path)
+    return {'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'quarantine': quarantine_version()}
+
+def build_index(df_all, out_dir=INDEX_DIR, source=None):
+    """
+    Write the sorted-segment arrays for both bases.
+
+    Parameters:
+        df_all (pd.DataFrame): wide price frame with a 'Date' column.
+        source (dict): version of the file df_all came from (stored in meta.json).
+
+    Returns:
+        dict: the metadata written.
+    """
+    days = assign_trading_day(to_long(df_all))
+    tickers = [str(t) for t in days['ETF'].cat.categories]
+    max_day = int(max(days['Trading_Day'].max(), days['Trading_Day_From_End'].max()))
+    width = max_day + 1
+    n_keys = len(tickers) * width
+    os.makedirs(out_dir, exist_ok=True)
+
+    for basis, day_col in BASES.items():
+        rows = days if basis == 'start' else days[days['Month_Closed']]
+        keys = rows['ETF'].cat.codes.to_numpy(np.int64) * width + rows[day_col].to_numpy(np.int64)
+        prices = rows['Price'].to_numpy(np.float64)
+        order = np.lexsort((prices, keys))
+        keys, prices = keys[order], prices[order]
+        counts = np.bincount(keys, minlength=n_keys)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        sums = np.bincount(keys, weights=prices, minlength=n_keys)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sums / counts
+            sq = np.bincount(keys, weights=(prices - mean[keys]) ** 2, minlength=n_keys)
+            std = np.sqrt(sq / (counts - 1))
+        std[counts < 2] = np.nan
+
+        np.save(os.path.join(out_dir, f"{basis}_values.npy"), prices)
+        np.save(os.path.join(out_dir, f"{basis}_offsets.npy"), offsets)
+        np.save(os.path.join(out_dir, f"{basis}_moments.npy"), np.column_stack([mean, std]))
+
+    meta = {'tickers': tickers, 'max_day': max_day, 'source': source,
+            'last_date': days['Date'].max().strftime('%Y-%m-%d')}
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+def ensure_index(price_csv=INPUT_CSV, out_dir=INDEX_DIR):
+    """Rebuild the index if it is missing or was built from another version of price_csv."""
+    version = _source_version(price_csv)
+    try:
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            if json.load(f).get('source') == version:
+                return False
+    except (OSError, ValueError):
+        pass
+    build_index(load_price_frame(price_csv).reset_index(), out_dir, source=version)
+    return True
+
+def load_index(out_dir=INDEX_DIR):
+    """Memory-mapped arrays and metadata: {'meta', 'ticker_index', basis: {'values', 'offsets', 'moments'}}."""
+    with open(os.path.join(out_dir, "meta.json")) as f:
+        meta = json.load(f)
+    index = {'meta': meta, 'ticker_index': {t: i for i, t in enumerate(meta['tickers'])}}
+    for basis in BASES:
+        index[basis] = {part: np.load(os.path.join(out_dir, f"{basis}_{part}.npy"), mmap_mode='r')
+                        for part in ('values', 'offsets', 'moments')}
+    return index
+
+@functools.lru_cache(maxsize=64)
+def _month_sessions(month_start):
+    from utils.synthetic_market import market_calendar
+    return market_calendar(month_start, month_start + pd.offsets.MonthEnd(0))
+
+def trading_day(day, basis='start'):
+    """Trading day number of `day` within its month on the NYSE calendar (None on a holiday / weekend)."""
+    day = pd.Timestamp(day).normalize()
+    sessions = _month_sessions(day.replace(day=1))
+    if day not in sessions:
+        return None
+    position = sessions.get_loc(day)
+    return position + 1 if basis == 'start' else len(sessions) - position
+
+def percentile_rank(index, ticker, price, day, basis='start'):
+    """
+    Place `price` among the historical closes of `ticker` on trading day `day`.
+
+    Returns:
+        (percentile 0-100, z-score, count); (nan, nan, 0) without history.
+    """
+    t = index['ticker_index'].get(ticker.upper())
+    width = index['meta']['max_day'] + 1
+    if t is None or day is None or not 0 < day < width:
+        return np.nan, np.nan, 0
+    arrays = index[basis]
+    key = t * width + day
+    start, end = int(arrays['offsets'][key]), int(arrays['offsets'][key + 1])
+    count = end - start
+    if count == 0:
+        return np.nan, np.nan, 0
+    segment = arrays['values'][start:end]
+    below = np.searchsorted(segment, price, side='left')
+    upto = np.searchsorted(segment, price, side='right')
+    mean, std = arrays['moments'][key]
+    z = (price - mean) / std if std > 0 else np.nan
+    return (below + upto) / 2 / count * 100, float(z), count
+
+def score_universe(prices, day=None, basis='start', index=None):
+    """
+    Percentile rank and z-score of every ticker's live price for one day.
+
+    Parameters:
+        prices (dict or pd.Series): ticker -> price.
+        day: date being scored (default today); sets the trading day number.
+        basis (str): 'start' or 'end'.
+
+    Returns:
+        pd.DataFrame: ETF, Trading_Day, Price, Count, Mean, Std, Percentile, Z_Score
+    """
+    index = index or load_index()
+    prices = pd.Series(dict(prices), dtype=float)
+    tickers = [str(t).upper() for t in prices.index]
+    day_number = trading_day(day or _date.today(), basis)
+    width = index['meta']['max_day'] + 1
+    arrays = index[basis]
+
+    t = np.array([index['ticker_index'].get(tk, -1) for tk in tickers], dtype=np.int64)
+    valid = (t >= 0) & (day_number is not None) & (0 < (day_number or 0) < width)
+    keys = np.where(valid, t * width + (day_number or 0), 0)
+    lo = np.where(valid, arrays['offsets'][keys], 0)
+    hi = np.where(valid, arrays['offsets'][keys + 1], 0)
+    x = prices.to_numpy()
+    below = _batch_searchsorted(arrays['values'], lo, hi, x, 'left') - lo
+    upto = _batch_searchsorted(arrays['values'], lo, hi, x, 'right') - lo
+    count = hi - lo
+    mean, std = arrays['moments'][keys].T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct = np.where(count > 0, (below + upto) / 2 / count * 100, np.nan)
+        z = np.where((count > 0) & (std > 0), (x - mean) / std, np.nan)
+    return pd.DataFrame({
+        'ETF': tickers, 'Trading_Day': day_number, 'Price': x, 'Count': count,
+        'Mean': np.where(count > 0, mean, np.nan).round(5), 'Std': np.where(count > 0, std, np.nan).round(5),
+        'Percentile': pct.round(1), 'Z_Score': z.round(2),
+    })
+
+def _batch_searchsorted(values, lo, hi, x, side='left'):
+    """
+    np.searchsorted of x[i] within values[lo[i]:hi[i]] for all i at once
+    (positions are absolute). A vectorized binary search: about log2 of the
+    longest segment passes over the batch.
+    """
+    lo, hi = lo.copy(), hi.copy()
+    while True:
+        active = lo < hi
+        if not active.any():
+            return lo
+        mid = (lo + hi) // 2
+        probe = values[np.where(active, mid, 0)]
+        go_right = active & ((probe < x) if side == 'left' else (probe <= x))
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Percentile of a price versus the same trading day historically")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="Rebuild the memory-mapped index")
+    p.add_argument('--input', default=INPUT_CSV)
+    p = sub.add_parser('score', help="Score live prices (default: the latest closes)")
+    p.add_argument('prices', nargs='*', metavar='TICKER=PRICE')
+    p.add_argument('--date', help="Day being scored (default: last date in the price file)")
+    p.add_argument('--basis', choices=sorted(BASES), default='start')
+    p.add_argument('--input', default=INPUT_CSV)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        meta = build_index(load_price_frame(args.input).reset_index(), source=_source_version(args.input))
+        print(f"✅ Index for {len(meta['tickers'])} tickers saved to {INDEX_DIR}")
+        return 0
+
+    ensure_index(args.input)
+    if args.prices:
+        prices = {k: float(v) for k, v in (item.split('=', 1) for item in args.prices)}
+        day = args.date or _date.today()
+    else:
+        frame = load_price_frame(args.input)
+        latest = frame.drop(columns=[c for c in frame.columns if c.endswith('_Volume')]).iloc[-1].dropna()
+        prices, day = latest.to_dict(), args.date or frame.index[-1]
+    table = score_universe(prices, day, args.basis)
+    print(f"📅 {pd.Timestamp(day):%Y-%m-%d}  (trading day {table['Trading_Day'].iloc[0]} from the {args.basis})")
+    print(table.drop(columns='Trading_Day').to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+utils/equivalence.py
+Golden-output equivalence harness: legacy scripts vs. faster engines
+
+Purpose:
+--------
+A faster detector may only replace a legacy script if it writes the same
+signal files. This runs the legacy implementation and every registered engine
+on the same inputs, diffs their outputs cell by cell with a numeric tolerance,
+times both sides, and writes a row-level report of every difference. The
+legacy output can also be checked against the committed signal files
+(golden mode) to catch drift in the legacy code itself.
+
+How:
+----
+- OUTPUTS lists the checked output families. Each has a 'legacy' function,
+  zero or more 'engines', and the 'keys' that identify a row. All of them take
+  a dataset {'name', 'prices', 'csv', 'tickers'} and return {label: DataFrame},
+  where the label is the signal file stem (signals/<label>.csv).
+- Legacy functions read the price CSV the way their scripts do. Engines start
+  from the shared date-indexed frame; the initial engine of each family is
+  the in-memory pipeline path (utils/pipeline.run_in_memory), the second the
+  month-partition path (utils/partitions.py). Faster engines are added to a
+  family's 'engines' dict as 'module:function' strings.
+- Datasets: the repository price file, and a seeded synthetic market
+  (utils/synthetic_market.py) for scale and edge-case coverage.
+- Both outputs go through a CSV round trip (exactly what would be written)
+  before comparing, so dtype differences that do not change the file are not
+  reported. Numeric cells match within rtol/atol; everything else must be equal.
+  Rows are aligned on the keys, so a missing or extra row is one report line.
+- Reports: reports/equivalence/summary.csv and <family>_<dataset>_<side>.csv
+  for every check with differences.
+
+Usage:
+------
+    python -m utils.equivalence                       # engines vs legacy, repo + synthetic data
+    python -m utils.equivalence --golden              # legacy vs committed signals/*.csv
+    python -m utils.equivalence --only post_peak_highs --synthetic-tickers 60 --years 8
+"""
+
+import argparse
+import importlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+PRICES = "data/etf_prices_2023_2025.csv"
+SIGNALS_DIR = "signals"
+REPORT_DIR = "reports/equivalence"
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+
+def _is_usfr_like(ticker):
+    return ticker.rstrip('0123456789') == 'USFR'
+
+def _read_like_scripts(csv):
+    """Price CSV parsed as utils.data_loader.load_price_frame does (without its cache)."""
+    df = pd.read_csv(csv, index_col=0, parse_dates=True)
+    df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)
+    df.index.name = 'Date'
+    return df.sort_index()
+
+# ------------------------------------------------------- legacy implementations
+
+def legacy_usfr_full_cycles(data):
+    from analysis.usfr_full_cycles import detect_usfr_full_cycles, load_usfr_data
+    return {'usfr_full_cycles': detect_usfr_full_cycles(load_usfr_data(data['csv']))}
+
+def legacy_same_month_cycles(data):
+    from analysis.etf_full_cycles_same_month import build_same_month_cycles
+    etfs = [t for t in data['tickers'] if not _is_usfr_like(t)]
+    cycles = build_same_month_cycles(_read_like_scripts(data['csv']), etfs)
+    return {f"{etf.lower()}_full_cycles": table for etf, table in cycles.items()}
+
+def legacy_post_peak_highs(data):
+    from scripts.generate_peak_csvs import build_peak_csvs
+    highs = build_peak_csvs(pd.read_csv(data['csv']), data['tickers'])
+    return {f"{etf.lower()}_post_peak_highs": table for etf, table in highs.items()}
+
+def legacy_post_peak_lows(data):
+    from scripts.generate_low_csvs import build_low_csvs
+    etfs = [t for t in data['tickers'] if not _is_usfr_like(t)]
+    lows = build_low_csvs(pd.read_csv(data['csv']), etfs)
+    return {f"{etf.lower()}_post_peak_lows": table for etf, table in lows.items()}
+
+def legacy_usfr_post_peak_lows(data):
+    from scripts.usfr_post_peak_lows import detect_post_peak_lows
+    from utils.data_loader import load_etf_data
+    return {'usfr_post_peak_lows': detect_post_peak_lows(load_etf_data(data['csv']), 'USFR')}
+
+def legacy_all_etfs_peaks(data):
+    from scripts.generate_peak_low_signals import build_peak_low_signals
+    peaks, lows = build_peak_low_signals(_read_like_scripts(data['csv']), data['tickers'])
+    return {'all_etfs_peaks': peaks, 'all_etfs_post_peak_lows': lows}
+
+# ---------------------------------------------- in-memory pipeline engines
+
+def memory_usfr_full_cycles(data):
+    from analysis.usfr_full_cycles import detect_usfr_full_cycles
+    return {'usfr_full_cycles': detect_usfr_full_cycles(data['prices'][['USFR']].dropna())}
+
+def memory_same_month_cycles(data):
+    from analysis.etf_full_cycles_same_month import build_same_month_cycles
+    etfs = [t for t in data['tickers'] if not _is_usfr_like(t)]
+    cycles = build_same_month_cycles(data['prices'], etfs)
+    return {f"{etf.lower()}_full_cycles": table for etf, table in cycles.items()}
+
+def memory_post_peak_highs(data):
+    from scripts.generate_peak_csvs import build_peak_csvs
+    highs = build_peak_csvs(data['prices'].reset_index(), data['tickers'])
+    return {f"{etf.lower()}_post_peak_highs": table for etf, table in highs.items()}
+
+def memory_post_peak_lows(data):
+    from scripts.generate_low_csvs import build_low_csvs
+    etfs = [t for t in data['tickers'] if not _is_usfr_like(t)]
+    lows = build_low_csvs(data['prices'].reset_index(), etfs)
+    return {f"{etf.lower()}_post_peak_lows": table for etf, table in lows.items()}
+
+def memory_all_etfs_peaks(data):
+    from scripts.generate_peak_low_signals import build_peak_low_signals
+    peaks, lows = build_peak_low_signals(data['prices'], data['tickers'])
+    return {'all_etfs_peaks': peaks, 'all_etfs_post_peak_lows': lows}
+
+# ------------------------------------------- month-partition engines
+
+def _partitioned(data, job, etfs):
+    from utils.partitions import frame_chunks, run_jobs
+    return run_jobs(frame_chunks(data['prices']), {job: etfs}, workers=0)[job]
+
+def partitioned_usfr_full_cycles(data):
+    return {'usfr_full_cycles': _partitioned(data, 'usfr_full_cycles', ['USFR'])['USFR']}
+
+def partitioned_same_month_cycles(data):
+    etfs = [t for t in data['tickers'] if not _is_usfr_like(t)]
+    cycles = _partitioned(data, 'same_month_cycles', etfs)
+    return {f"{etf.lower()}_full_cycles": cycles[etf] for etf in etfs}
+
+def partitioned_post_peak_highs(data):
+    highs = _partitioned(data, 'post_peak_highs', data['tickers'])
+    return {f"{etf.lower()}_post_peak_highs": highs[etf] for etf in data['tickers']}
+
+def partitioned_post_peak_lows(data):
+    etfs = [t for t in data['tickers'] if not _is_usfr_like(t)]
+    lows = _partitioned(data, 'post_peak_lows', etfs)
+    return {f"{etf.lower()}_post_peak_lows": lows[etf] for etf in etfs}
+
+# Families of outputs. 'ignore': columns rewritten outside the detector
+# (modal days are updated in place by scripts/update_modal_days.py).
+OUTPUTS = [
+    {'name': 'usfr_full_cycles', 'legacy': legacy_usfr_full_cycles, 'keys': ['Low_Date'],
+     'engines': {'in_memory': memory_usfr_full_cycles, 'partitioned': partitioned_usfr_full_cycles}},
+    {'name': 'same_month_cycles', 'legacy': legacy_same_month_cycles, 'keys': ['Cycle_Month'],
+     'ignore': ['Low_Modal_Day', 'Peak_Modal_Day'], 'engines': {'in_memory': memory_same_month_cycles,
+                                                             'partitioned': partitioned_same_month_cycles}},
+    {'name': 'post_peak_highs', 'legacy': legacy_post_peak_highs, 'keys': ['Month'],
+     'engines': {'in_memory': memory_post_peak_highs, 'partitioned': partitioned_post_peak_highs}},
+    {'name': 'post_peak_lows', 'legacy': legacy_post_peak_lows, 'keys': ['Month'],
+     'engines': {'in_memory': memory_post_peak_lows, 'partitioned': partitioned_post_peak_lows}},
+    {'name': 'usfr_post_peak_lows', 'legacy': legacy_usfr_post_peak_lows, 'keys': ['Month'],
+     'engines': {}},
+    {'name': 'all_etfs_peaks', 'legacy': legacy_all_etfs_peaks, 'keys': ['ETF', 'Month'],
+     'engines': {'in_memory': memory_all_etfs_peaks}},
+]
+
+# ------------------------------------------------------------------ comparison
+
+def _roundtrip(df):
+    """
+    The frame as it reads back after to_csv(index=False), with '*Date*'
+    columns in ISO format (older signal files were saved as m/d/Y).
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    if not buffer.getvalue().strip():
+        return pd.DataFrame()
+    df = pd.read_csv(buffer)
+    for col in [c for c in df.columns if 'Date' in c and not pd.api.types.is_numeric_dtype(df[c])]:
+        parsed = pd.to_datetime(df[col], errors='coerce', format='mixed')
+        df[col] = parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), df[col])
+    return df
+
+def _keyed(df, keys):
+    keys = [k for k in keys if k in df.columns]
+    if not keys:
+        return df.assign(_Row=np.arange(len(df))).set_index('_Row')
+    occurrence = df.groupby(keys, sort=False).cumcount().rename('_Dup')
+    return df.set_index(keys + [occurrence])
+
+def _fmt_key(key):
+    key = key if isinstance(key, tuple) else (key,)
+    parts = [str(k) for k in key]
+    return '|'.join(parts[:-1] if len(parts) > 1 and parts[-1] in ('0', '0.0') else parts)
+
+def compare_frames(expected, actual, keys, rtol=1e-9, atol=1e-6, ignore=()):
+    """
+    Row-level differences between two outputs.
+
+    Returns:
+        pd.DataFrame with Key, Column, Expected, Actual, Status in
+        {'missing_row', 'extra_row', 'missing_column', 'extra_column', 'changed'};
+        empty when the outputs match.
+    """
+    expected = _roundtrip(expected).drop(columns=list(ignore), errors='ignore')
+    actual = _roundtrip(actual).drop(columns=list(ignore), errors='ignore')
+    rows = []
+    for col in expected.columns.difference(actual.columns, sort=False):
+        rows.append({'Key': '', 'Column': col, 'Expected': 'present', 'Actual': None, 'Status': 'missing_column'})
+    for col in actual.columns.difference(expected.columns, sort=False):
+        rows.append({'Key': '', 'Column': col, 'Expected': None, 'Actual': 'present', 'Status': 'extra_column'})
+
+    exp, act = _keyed(expected, keys), _keyed(actual, keys)
+    for key in exp.index.difference(act.index, sort=False):
+        rows.append({'Key': _fmt_key(key), 'Column': '', 'Expected': 'row', 'Actual': None, 'Status': 'missing_row'})
+    for key in act.index.difference(exp.index, sort=False):
+        rows.append({'Key': _fmt_key(key), 'Column': '', 'Expected': None, 'Actual': 'row', 'Status': 'extra_row'})
+
+    common_rows = exp.index.intersection(act.index, sort=False)
+    common_cols = [c for c in exp.columns if c in act.columns]
+    e, a = exp.loc[common_rows, common_cols], act.loc[common_rows, common_cols]
+    for col in common_cols:
+        ev, av = e[col], a[col]
+        if pd.api.types.is_numeric_dtype(ev) and pd.api.types.is_numeric_dtype(av) \
+                and not pd.api.types.is_bool_dtype(ev):
+            same = np.isclose(ev.to_numpy(float), av.to_numpy(float), rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            same = (ev.astype(str) == av.astype(str)).to_numpy()
+        for key in common_rows[~same]:
+            rows.append({'Key': _fmt_key(key), 'Column': col, 'Expected': ev[key], 'Actual': av[key],
+                         'Status': 'changed'})
+    return pd.DataFrame(rows, columns=['Key', 'Column', 'Expected', 'Actual', 'Status'])
+
+def _resolve(func):
+    if callable(func):
+        return func
+    module, name = func.split(':')
+    return getattr(importlib.import_module(module), name)
+
+def _timed(func, data):
+    with redirect_stdout(io.StringIO()):           # detectors print progress
+        start = time.perf_counter()
+        result = _resolve(func)(data)
+    return result, (time.perf_counter() - start) * 1000
+
+# --------------------------------------------------------------------- datasets
+
+def repository_dataset(csv=PRICES):
+    from utils.data_loader import load_price_frame
+    return {'name': 'repo', 'prices': load_price_frame(csv), 'csv': csv, 'tickers': list(ETF_LIST)}
+
+def synthetic_dataset(n_tickers=12, years=3.0, seed=0, workdir=None):
+    """Synthetic market written to a CSV in `workdir` (default: a new temporary directory)."""
+    from utils.synthetic_market import generate_market, write_market
+    prices = generate_market(n_tickers, years, seed=seed)
+    workdir = workdir or tempfile.mkdtemp(prefix="etf_equivalence_")
+    csv = write_market(prices, os.path.join(workdir, f"synthetic_{n_tickers}x{years:g}y_{seed}.csv"))
+    return {'name': f"synthetic_{n_tickers}x{years:g}y", 'prices': prices, 'csv': csv,
+            'tickers': [c for c in prices.columns if not c.endswith('_Volume')]}
+
+# ------------------------------------------------------------------------ runs
+
+def _check(family, side, dataset, expected, actual, legacy_ms, other_ms, rtol, atol, report_dir):
+    labels = sorted(set(expected) | set(actual))
+    diffs = []
+    for label in labels:
+        if label not in actual:
+            diffs.append(pd.DataFrame([{'Key': label, 'Column': '', 'Expected': 'file', 'Actual': None,
+                                        'Status': 'missing_output'}]))
+            continue
+        if label not in expected:
+            continue
+        diff = compare_frames(expected[label], actual[label], family['keys'], rtol, atol, family.get('ignore', ()))
+        diffs.append(diff.assign(Output=label))
+    diff = pd.concat(diffs, ignore_index=True) if diffs else pd.DataFrame()
+    if len(diff) and report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+        diff.to_csv(os.path.join(report_dir, f"{family['name']}_{dataset['name']}_{side}.csv"), index=False)
+    return {
+        'Family': family['name'], 'Dataset': dataset['name'], 'Against': side,
+        'Outputs': len(labels), 'Differences': len(diff),
+        'Legacy_ms': round(legacy_ms, 1), 'Other_ms': round(other_ms, 1) if other_ms is not None else None,
+        'Speedup': round(legacy_ms / other_ms, 2) if other_ms else None,
+        'Status': 'PASS' if diff.empty else 'FAIL',
+    }
+
+def _golden_outputs(labels, signals_dir):
+    out = {}
+    for label in labels:
+        path = os.path.join(signals_dir, f"{label}.csv")
+        if os.path.exists(path):
+            out[label] = pd.read_csv(path)
+    return out
+
+def run_equivalence(datasets, outputs=OUTPUTS, golden=False, rtol=1e-9, atol=1e-6,
+                    report_dir=REPORT_DIR, signals_dir=SIGNALS_DIR):
+    """
+    Compare every family on every dataset.
+
+    golden=True compares the legacy output on the repository data with the
+    committed signal files; otherwise each engine is compared with legacy.
+
+    Returns:
+        pd.DataFrame: one summary row per (family, dataset, engine or 'golden').
+    """
+    rows = []
+    for dataset in datasets:
+        for family in outputs:
+            if 'USFR' not in dataset['tickers'] and family['name'].startswith('usfr'):
+                continue
+            legacy, legacy_ms = _timed(family['legacy'], dataset)
+            if golden:
+                reference = _golden_outputs(legacy, signals_dir)
+                legacy = {label: legacy[label] for label in reference}
+                rows.append(_check(family, 'golden', dataset, reference, legacy, legacy_ms, None,
+                                   rtol, atol, report_dir))
+                continue
+            for engine, func in family['engines'].items():
+                actual, engine_ms = _timed(func, dataset)
+                rows.append(_check(family, engine, dataset, legacy, actual, legacy_ms, engine_ms,
+                                   rtol, atol, report_dir))
+    return pd.DataFrame(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check faster engines reproduce the legacy signal files")
+    parser.add_argument('--golden', action='store_true', help="Legacy vs committed signals/*.csv")
+    parser.add_argument('--only', nargs='+', choices=[f['name'] for f in OUTPUTS], metavar='FAMILY')
+    parser.add_argument('--synthetic-tickers', type=int, default=12, help="0 to skip synthetic data")
+    parser.add_argument('--years', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    parser.add_argument('--atol', type=float, default=1e-6)
+    args = parser.parse_args(argv)
+
+    outputs = [f for f in OUTPUTS if not args.only or f['name'] in args.only]
+    datasets = [repository_dataset()]
+    if args.synthetic_tickers and not args.golden:
+        datasets.append(synthetic_dataset(args.synthetic_tickers, args.years, args.seed))
+
+    try:
+        summary = run_equivalence(datasets, outputs, args.golden, args.rtol, args.atol)
+    finally:
+        for dataset in datasets[1:]:
+            shutil.rmtree(os.path.dirname(dataset['csv']), ignore_errors=True)
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    summary.to_csv(os.path.join(REPORT_DIR, "summary.csv"), index=False)
+    print(summary.to_string(index=False))
+    failed = summary[summary['Status'] == 'FAIL']
+    if len(failed):
+        print(f"❌ {len(failed)} check(s) differ; row-level reports in {REPORT_DIR}/")
+        return 1
+    print(f"✅ All {len(summary)} checks match")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
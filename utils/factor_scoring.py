@@ -0,0 +1,254 @@
+"""
+utils/factor_scoring.py
+Shared factor-matrix scoring for Treasury ETF peak signals
+
+Purpose:
+--------
+The peak scorers (analysis/usfr_peak_signal.py, analysis/sgov_peak_signal.py,
+scripts/peak_signal_score.py and utils/peak_signal_score.py) combine the same
+handful of indicators with different weights. This module computes every
+registered factor once, for every date and ticker, into one
+(date × ticker × factor) array, then combines it with per-ticker weight
+vectors taken from ETF_CONFIG in config/etf_parameters.py.
+
+Factors:
+--------
+- high_proximity:  1 - distance below the 10-calendar-day high (as a fraction)
+- calendar_window: 1 / 0.5 / 0 from the ticker's 'score_calendar_days' windows
+- peer_divergence: 1 if price > peer mean + 0.05, 0.5 if > + 0.01, else 0
+- macro:           0.5 placeholder for reverse repo / macro indicators
+- near_high:       1 if within 0.03% of the prior 10-trading-day high
+- volume_spike:    1 if volume >= 1.3x the prior 5-trading-day average
+- late_month:      1 if calendar day >= 28
+- repeat_high:     1 if the close equals the prior close
+
+Adding a factor means writing one function decorated with @register_factor;
+adding a ticker is one more column of the price matrix. Neither adds another
+pass over the data.
+
+Functions:
+----------
+- compute_factor_cube(df, tickers=None, factors=None, overrides=None) -> dict
+- weight_matrix(tickers, factors, weights=None) -> np.ndarray
+- combine_factors(cube, weights=None, scale=100) -> np.ndarray
+- score_frame(cube, weights=None, scale=100) -> pd.DataFrame
+- scorer_version(scorer) -> str, e.g. 'sgov-factor-v1'
+"""
+
+import numpy as np
+import pandas as pd
+from config.etf_parameters import get_score_config
+from utils.fixed_point import MISSING, to_fixed
+from utils.profiling import profiled
+
+# Bumped whenever factor definitions or default weights change, so logged
+# scores from different scorer generations can be told apart.
+SCORER_VERSION = 'factor-v1'
+
+# Scorers that log to utils/signal_log. Each combines the factors with its own
+# weights, so each logs under its own version: two scorers of one ticker on the
+# same day must not overwrite each other's row.
+SCORER_USFR = 'usfr'            # analysis/usfr_peak_signal.py
+SCORER_SGOV = 'sgov'            # analysis/sgov_peak_signal.py
+SCORER_ETF = 'etf'              # scripts/peak_signal_score.py
+
+def scorer_version(scorer):
+    return f"{scorer}-{SCORER_VERSION}"
+
+# Registered factor functions, in registration order
+FACTORS = {}
+
+def register_factor(name):
+    """
+    Decorator registering a factor function under `name`.
+
+    A factor function takes the shared context dict built by
+    compute_factor_cube() and returns a float array of shape (dates, tickers),
+    NaN where the factor is undefined.
+    """
+    def decorator(func):
+        FACTORS[name] = func
+        return func
+    return decorator
+
+def _calendar_mask(ctx, day_range):
+    start, end = day_range
+    day = ctx['day'][:, None]
+    if start >= 1:
+        return (day >= start) & (day <= end)
+    last_day = ctx['days_in_month'][:, None]
+    return (day >= last_day + start) & (day <= last_day + end)
+
+@register_factor('high_proximity')
+def high_proximity(ctx):
+    prices = ctx['prices']
+    # '11D' window = (today - 11 days, today], i.e. df.loc[today - 10 days:today]
+    high_10d = prices.rolling('11D').max().to_numpy()
+    values = prices.to_numpy()
+    return 1 - ((high_10d - values) / high_10d)
+
+@register_factor('calendar_window')
+def calendar_window(ctx):
+    out = np.zeros((len(ctx['dates']), len(ctx['tickers'])))
+    for j, etf in enumerate(ctx['tickers']):
+        full_range, half_range = ctx['params'][etf]['score_calendar_days']
+        full = _calendar_mask(ctx, full_range)[:, 0]
+        half = _calendar_mask(ctx, half_range)[:, 0]
+        out[:, j] = np.where(full, 1.0, np.where(half, 0.5, 0.0))
+    return out
+
+@register_factor('peer_divergence')
+def peer_divergence(ctx):
+    values = ctx['prices'].to_numpy()
+    n = values.shape[1]
+    if n < 2:
+        return np.full(values.shape, np.nan)
+    peer_mean = (values.sum(axis=1, keepdims=True) - values) / (n - 1)
+    divergence = values - peer_mean
+    return np.where(divergence > 0.05, 1.0, np.where(divergence > 0.01, 0.5, 0.0))
+
+@register_factor('macro')
+def macro(ctx):
+    return np.full((len(ctx['dates']), len(ctx['tickers'])), 0.5)
+
+def prior_high_10d(prices):
+    """Highest close of the prior 10 trading days (today excluded; needs 5+ days)."""
+    return prices.shift(1).rolling(10, min_periods=5).max().to_numpy()
+
+def prior_avg_volume_5d(volumes):
+    """Average volume of the prior 5 trading days (today excluded)."""
+    return volumes.shift(1).rolling(5, min_periods=1).mean().to_numpy()
+
+@register_factor('near_high')
+def near_high(ctx):
+    prices = ctx['prices']
+    prior_high = prior_high_10d(prices)
+    values = prices.to_numpy()
+    near = np.abs(values - prior_high) / prior_high <= 0.0003
+    return np.where(np.isnan(prior_high), np.nan, near.astype(float))
+
+@register_factor('volume_spike')
+def volume_spike(ctx):
+    volumes = ctx['volumes']
+    if volumes is None:
+        return np.full((len(ctx['dates']), len(ctx['tickers'])), np.nan)
+    avg_5d = prior_avg_volume_5d(volumes)
+    values = volumes.to_numpy()
+    spike = values >= 1.3 * avg_5d
+    return np.where(np.isnan(avg_5d), np.nan, spike.astype(float))
+
+@register_factor('late_month')
+def late_month(ctx):
+    late = (ctx['day'] >= 28).astype(float)
+    return np.repeat(late[:, None], len(ctx['tickers']), axis=1)
+
+@register_factor('repeat_high')
+def repeat_high(ctx):
+    # Compared in 1/10,000-dollar ticks: float residue no longer breaks a tie
+    values = to_fixed(ctx['prices'].to_numpy(np.float64))
+    out = np.full(values.shape, np.nan)
+    out[1:] = ((values[1:] == values[:-1]) & (values[1:] != MISSING)).astype(float)
+    return out
+
+def build_context(df, tickers=None, overrides=None):
+    """
+    Build the shared factor context from a wide price frame.
+
+    Parameters:
+        df (pd.DataFrame): DatetimeIndex, one price column per ticker and
+            optional '<TICKER>_Volume' columns.
+        tickers (list): Price columns to score (default: every non-volume column).
+        overrides (dict): Optional {ticker: {setting: value}} merged over the
+            ETF_CONFIG score settings (e.g. a different calendar window).
+
+    Returns:
+        dict with 'dates', 'tickers', 'prices', 'volumes', 'params', 'day',
+        'days_in_month'.
+    """
+    if tickers is None:
+        tickers = [c for c in df.columns if not str(c).endswith('_Volume')]
+    tickers = list(tickers)
+    volume_cols = [f"{t}_Volume" for t in tickers]
+    volumes = df[volume_cols].set_axis(tickers, axis=1) if all(c in df.columns for c in volume_cols) else None
+
+    params = {}
+    for etf in tickers:
+        params[etf] = get_score_config(etf)
+        params[etf].update((overrides or {}).get(etf, {}))
+
+    dates = df.index
+    return {
+        'dates': dates,
+        'tickers': tickers,
+        'prices': df[tickers],
+        'volumes': volumes,
+        'params': params,
+        'day': np.asarray(dates.day),
+        'days_in_month': np.asarray(dates.days_in_month),
+    }
+
+@profiled()
+def compute_factor_cube(df, tickers=None, factors=None, overrides=None):
+    """
+    Compute factors for every date and ticker in one pass over the price matrix.
+
+    Returns:
+        dict with:
+            - values (np.ndarray): shape (dates, tickers, factors)
+            - dates (pd.DatetimeIndex), tickers (list), factors (list)
+            - params (dict): per-ticker score settings used
+    """
+    ctx = build_context(df, tickers, overrides)
+    factors = list(FACTORS) if factors is None else list(factors)
+    values = np.empty((len(ctx['dates']), len(ctx['tickers']), len(factors)))
+    for k, name in enumerate(factors):
+        values[:, :, k] = FACTORS[name](ctx)
+    return {
+        'values': values,
+        'dates': ctx['dates'],
+        'tickers': ctx['tickers'],
+        'factors': factors,
+        'params': ctx['params'],
+    }
+
+def weight_matrix(tickers, factors, weights=None):
+    """
+    Build a (tickers × factors) weight matrix.
+
+    `weights` may be None (per-ticker 'score_weights' from ETF_CONFIG), a single
+    {factor: weight} dict applied to every ticker, or {ticker: {factor: weight}}
+    (tickers missing from the mapping keep their ETF_CONFIG weights).
+    """
+    shared = weights is not None and any(key in FACTORS for key in weights)
+    matrix = np.zeros((len(tickers), len(factors)))
+    for j, etf in enumerate(tickers):
+        if shared:
+            ticker_weights = weights
+        elif weights is not None and etf in weights:
+            ticker_weights = weights[etf]
+        else:
+            ticker_weights = get_score_config(etf)['score_weights']
+        for k, name in enumerate(factors):
+            matrix[j, k] = ticker_weights.get(name, 0.0)
+    return matrix
+
+@profiled()
+def combine_factors(cube, weights=None, scale=100):
+    """
+    Weighted sum of the factor cube → array of shape (dates, tickers).
+
+    Factors with zero weight for a ticker are skipped, so undefined (NaN)
+    factors only affect tickers that actually use them.
+    """
+    w = weight_matrix(cube['tickers'], cube['factors'], weights)
+    values = cube['values']
+    total = np.zeros(values.shape[:2])
+    for k in range(values.shape[2]):
+        used = w[:, k] != 0
+        if used.any():
+            total[:, used] += w[used, k] * values[:, used, k]
+    return total * scale
+
+def score_frame(cube, weights=None, scale=100):
+    """Combined scores as a DataFrame indexed by date with one column per ticker."""
+    return pd.DataFrame(combine_factors(cube, weights, scale), index=cube['dates'], columns=cube['tickers'])
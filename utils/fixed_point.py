@@ -0,0 +1,158 @@
+"""
+utils/fixed_point.py
+Scaled-integer (fixed-point) prices: int32 in 1/10,000 dollars
+
+Purpose:
+--------
+Prices arrive as float64 text with 15+ digits (yfinance float32 residue such
+as 50.27000045776367), and the peak / low detectors decide ties with exact
+float equality (Multi_Peak_Days, `peak_candidates[... == max_price]`,
+Repeat_High). Two closes that print the same at 4 decimals can differ in the
+last bits and stop being a tie. Comparing ticks (round(price × 10,000) as an
+int32) makes ties exact and halves the memory of the stored price matrix
+versus float64.
+
+How:
+----
+- to_fixed() converts at the edge: scalars -> int, ndarrays -> int32 with
+  MISSING for NaN, Series / DataFrames -> nullable 'Int32' (NaN -> <NA>).
+- from_fixed() converts back to float64 dollars (MISSING / <NA> -> NaN).
+- extreme_dates() is the tie helper the detectors share: the extreme and
+  every date reaching it, compared in ticks. The extreme itself is returned
+  in dollars from the input, so the signal CSVs keep their values.
+- The binary price store (.npz: int64 dates, int32 ticks, int64 volumes) is
+  an alternative to the CSV; load_price_frame() reads it when given a .npz
+  path and returns dollars. The store is the only fixed-point price frame:
+  the detectors take dollars and compare in ticks through extreme_dates().
+- int32 ticks cover prices up to $214,748.3647; larger values raise
+  OverflowError rather than wrap.
+
+Functions:
+----------
+- to_fixed(values)                     dollars -> ticks
+- from_fixed(values)                   ticks -> dollars
+- extreme_dates(values, kind)          -> (extreme in dollars, DatetimeIndex of tied dates)
+- tick_count(values, price)            number of values tied with price
+- save_price_store(frame, path)        write the .npz store
+- load_price_store(path)               wide frame in dollars
+
+Usage:
+------
+    python -m utils.fixed_point data/etf_prices_2023_2025.csv data/etf_prices.npz
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+SCALE = 10_000
+FIXED_DTYPE = np.int32
+MISSING = np.iinfo(FIXED_DTYPE).min
+_MAX_TICKS = np.iinfo(FIXED_DTYPE).max
+
+def _ticks(values):
+    """float array of dollars -> float array of ticks, range-checked."""
+    ticks = np.rint(np.asarray(values, dtype=np.float64) * SCALE)
+    if np.nanmax(np.abs(ticks), initial=0) > _MAX_TICKS:
+        raise OverflowError(f"Price above {_MAX_TICKS / SCALE} does not fit {np.dtype(FIXED_DTYPE).name} ticks")
+    return ticks
+
+def _int_array(ticks, missing):
+    """Nullable 'Int32' array without an object round trip."""
+    return pd.arrays.IntegerArray(np.where(missing, 0, ticks).astype(FIXED_DTYPE), missing)
+
+def to_fixed(values):
+    """Dollars -> ticks of 1/SCALE dollar (see the module docstring for the container types)."""
+    if isinstance(values, pd.DataFrame):
+        return values.apply(to_fixed)
+    if isinstance(values, pd.Series):
+        ticks = _ticks(values.to_numpy(dtype=np.float64, na_value=np.nan))
+        return pd.Series(_int_array(ticks, np.isnan(ticks)), index=values.index, name=values.name)
+    if np.ndim(values) == 0:
+        return None if pd.isna(values) else int(_ticks(values))
+    ticks = _ticks(values)
+    return np.where(np.isnan(ticks), MISSING, ticks).astype(FIXED_DTYPE)
+
+def from_fixed(values):
+    """Ticks -> float64 dollars."""
+    if isinstance(values, pd.DataFrame):
+        return values.apply(from_fixed)
+    if isinstance(values, pd.Series):
+        return values.astype('Float64').div(SCALE).astype(np.float64)
+    if np.ndim(values) == 0:
+        return np.nan if values is None or pd.isna(values) or values == MISSING else int(values) / SCALE
+    values = np.asarray(values)
+    return np.where(values == MISSING, np.nan, values / SCALE)
+
+def extreme_dates(values, kind='max'):
+    """
+    Extreme of a dollar Series and every index label reaching it in ticks.
+
+    Returns:
+        (float, pd.Index): the extreme in dollars (from `values`, NaN if all
+        missing) and the tied labels in their original order.
+    """
+    # Integral float64 ticks compare exactly and skip building an 'Int32' Series per window
+    dollars = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    ticks = np.rint(dollars * SCALE)
+    if np.isnan(ticks).all():
+        return np.nan, values.index[:0]
+    best = np.nanmax(ticks) if kind == 'max' else np.nanmin(ticks)
+    extreme = np.nanmax(dollars) if kind == 'max' else np.nanmin(dollars)
+    return extreme, values.index[ticks == best]
+
+def tick_count(values, price):
+    """Number of `values` (dollars) equal to `price` in ticks."""
+    dollars = np.asarray(values, dtype=np.float64)
+    return int((np.rint(dollars * SCALE) == np.rint(price * SCALE)).sum())
+
+def save_price_store(frame, path):
+    """Write a Date-indexed wide price / volume frame as int32 ticks + int64 volumes."""
+    tickers = [c for c in frame.columns if not c.endswith('_Volume')]
+    volumes = frame.reindex(columns=[f"{t}_Volume" for t in tickers]).to_numpy(np.float64)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path,
+             dates=frame.index.to_numpy('datetime64[ns]').astype(np.int64),
+             tickers=np.array(tickers),
+             prices=to_fixed(frame[tickers].to_numpy(np.float64)),
+             volumes=np.where(np.isnan(volumes), -1, volumes).astype(np.int64))
+
+def load_price_store(path):
+    """
+    Wide frame from a .npz store, in the load_price_frame() layout
+    (<TICKER>, <TICKER>_Volume columns), prices in dollars.
+    """
+    with np.load(path) as store:
+        index = pd.DatetimeIndex(store['dates'].astype('datetime64[ns]'), name='Date')
+        tickers = [str(t) for t in store['tickers']]
+        prices, volumes = store['prices'], store['volumes'].astype(np.float64)
+    volumes[volumes < 0] = np.nan
+    columns = {}
+    for j, t in enumerate(tickers):
+        ticks = prices[:, j]
+        columns[t] = from_fixed(ticks)
+        columns[f"{t}_Volume"] = volumes[:, j]
+    return pd.DataFrame(columns, index=index)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the price CSV to the fixed-point .npz store")
+    parser.add_argument('input', nargs='?', default="data/etf_prices_2023_2025.csv")
+    parser.add_argument('output', nargs='?', default="data/etf_prices.npz")
+    args = parser.parse_args(argv)
+
+    from utils.data_loader import load_price_frame
+    frame = load_price_frame(args.input)
+    save_price_store(frame, args.output)
+    tickers = [c for c in frame.columns if not c.endswith('_Volume')]
+    noisy = int((np.abs(frame[tickers].to_numpy() * SCALE - np.rint(frame[tickers].to_numpy() * SCALE)) > 1e-6).sum())
+    print(f"✅ {len(frame)} rows × {len(tickers)} tickers saved to {args.output} "
+          f"({os.path.getsize(args.output):,} bytes; prices {frame[tickers].to_numpy().nbytes:,} -> "
+          f"{len(frame) * len(tickers) * np.dtype(FIXED_DTYPE).itemsize:,} bytes in memory; "
+          f"{noisy} closes rounded to the 1/{SCALE:,} grid)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""
+utils/intraday.py
+Minute-bar ingestion into a partitioned store, with daily resampling
+
+Purpose:
+--------
+Peaks happen around ex-dates and month end, and the daily close hides when
+during the day the top printed. This module streams minute-bar files into a
+store partitioned by ticker and day, keeps a daily OHLCV table per ticker up
+to date from the partitions it touched, and reads intraday windows back one
+day at a time, so years of minute data for hundreds of tickers never have to
+be in memory at once.
+
+Storage:
+--------
+data/intraday/
+- <TICKER>/<YYYY>/<YYYY-MM-DD>.npz   one session: time (int64 ns, exchange
+                                     time), open/high/low/close (int32 ticks
+                                     of 1/10,000 dollar, utils/fixed_point.py),
+                                     volume (int64); sorted, unique times
+- <TICKER>/daily.csv                 Date, Open, High, Low, Close, Volume
+                                     (regular session 09:30-16:00)
+- manifest.json                      ingested source files (path, mtime, size)
+
+How:
+----
+- Source files are read with pd.read_csv(chunksize=CHUNK_ROWS). Columns are
+  matched case-insensitively (timestamp / datetime / date / time, symbol /
+  ticker, open / high / low / close / volume, or o / h / l / c / v); separate
+  Date and Time columns are combined; without a ticker column the ticker is
+  the file name up to the first '_' or '.'. A day whose bars are all stamped
+  midnight raises ValueError instead of collapsing to one bar.
+- Missing prices are stored as the fixed-point MISSING tick and skipped per
+  field by the daily bar and the intraday extremes.
+- Timestamps with a UTC offset (or epoch numbers) are converted to New York
+  time; naive ones are taken as exchange time.
+- Each chunk is grouped by (ticker, day) and merged into the day's partition
+  (later bars win on equal timestamps). Memory is one chunk plus one
+  partition. A day split across chunks is merged twice.
+- After each file, the daily bars of the touched days are recomputed from
+  their partitions and upserted into the ticker's daily.csv. A file whose
+  mtime and size are in the manifest is skipped.
+- daily_frame() returns the daily closes and volumes in the price-file
+  layout (<TICKER>, <TICKER>_Volume; utils/data_loader.load_price_frame()),
+  so the detectors run on it unchanged.
+
+Functions:
+----------
+- ingest_file(path, store) / ingest(paths, store)   -> summary dict
+- iter_bars(ticker, start, end, session)            yields one day's bars at a time
+- load_bars(ticker, start, end, session)            -> DataFrame of a window
+- day_extremes(ticker, days, session)               -> intraday high / low and their times
+- daily_bars(ticker) / daily_frame(tickers)         -> daily tables
+- peak_timing(ticker)                               -> intraday timing of the detected peaks
+
+Usage:
+------
+    python -m utils.intraday ingest downloads/minute/*.csv
+    python -m utils.intraday daily --out data/intraday_daily_prices.csv
+    python -m utils.intraday window USFR 2025-06-24 --session all
+    python -m utils.intraday timing USFR
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.fixed_point import MISSING, from_fixed, to_fixed
+
+STORE_DIR = "data/intraday"
+MANIFEST = "manifest.json"
+CHUNK_ROWS = 250_000
+EXCHANGE_TZ = "America/New_York"
+REGULAR_SESSION = ("09:30", "16:00")     # bars stamped 09:30 ... 15:59
+FIELDS = ['open', 'high', 'low', 'close']
+DAILY_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+ALIASES = {
+    'time': ['timestamp', 'datetime', 'date', 'time', 'ts'],
+    'ticker': ['ticker', 'symbol'],
+    'open': ['open', 'o'], 'high': ['high', 'h'], 'low': ['low', 'l'],
+    'close': ['close', 'c'], 'volume': ['volume', 'v'],
+}
+_OFFSET = re.compile(r"(Z|[+-]\d\d:?\d\d)$")
+
+# ------------------------------------------------------------------- parsing
+
+def _ticker_from_path(path):
+    return re.split(r"[_.]", os.path.basename(path), maxsplit=1)[0].upper()
+
+def _column_map(columns):
+    lower = {str(c).strip().lower(): c for c in columns}
+    found = {}
+    for name, options in ALIASES.items():
+        match = next((lower[o] for o in options if o in lower), None)
+        if match is not None:
+            found[name] = match
+    # vendor layout with separate Date and Time columns: combine them
+    if str(found.get('time', '')).strip().lower() == 'date' and 'time' in lower:
+        found['time'] = (lower['date'], lower['time'])
+    missing = [n for n in ['time'] + FIELDS if n not in found]
+    if missing:
+        raise ValueError(f"Minute-bar file is missing columns: {', '.join(missing)}")
+    return found
+
+def _exchange_time(values):
+    """Timestamps as naive New York time."""
+    if pd.api.types.is_numeric_dtype(values):
+        unit = 'ms' if values.abs().max() > 1e11 else 's'
+        stamps = pd.to_datetime(values, unit=unit, utc=True)
+        return stamps.dt.tz_convert(EXCHANGE_TZ).dt.tz_localize(None)
+    sample = str(values.iloc[0]).strip() if len(values) else ""
+    if _OFFSET.search(sample):
+        return pd.to_datetime(values, utc=True).dt.tz_convert(EXCHANGE_TZ).dt.tz_localize(None)
+    return pd.to_datetime(values)
+
+def _date_and_time(dates, times):
+    """'2025-06-24' + '09:30' (or 930 / 093000) -> one timestamp string column."""
+    times = times.astype(str).str.strip()
+    digits = times.str.fullmatch(r"\d{3,6}")
+    if digits.all():
+        padded = times.str.zfill(6 if times.str.len().max() > 4 else 4)
+        times = padded.str[:2] + ':' + padded.str[2:4] + np.where(padded.str.len() == 6, ':' + padded.str[4:], '')
+    return dates.astype(str).str.strip() + ' ' + times
+
+def normalize_chunk(chunk, default_ticker=None):
+    """
+    Raw rows -> ticker, day (datetime64[D]), time, open..close (ticks), volume.
+
+    Raises ValueError when every bar of a ticker's day is stamped midnight
+    (daily rows, or a date column read without its time column), which
+    would otherwise collapse the day to one bar.
+    """
+    cols = _column_map(chunk.columns)
+    if isinstance(cols['time'], tuple):
+        stamps = _date_and_time(chunk[cols['time'][0]], chunk[cols['time'][1]])
+    else:
+        stamps = chunk[cols['time']]
+    time = _exchange_time(stamps)
+    if 'ticker' in cols:
+        ticker = chunk[cols['ticker']].astype(str).str.upper().to_numpy()
+    else:
+        ticker = np.full(len(chunk), default_ticker)
+    out = pd.DataFrame({'ticker': ticker, 'time': time.to_numpy('datetime64[ns]')})
+    for field in FIELDS:
+        out[field] = to_fixed(pd.to_numeric(chunk[cols[field]], errors='coerce').to_numpy(np.float64))
+    volume = pd.to_numeric(chunk[cols['volume']], errors='coerce') if 'volume' in cols else 0
+    out['volume'] = np.nan_to_num(np.asarray(volume, dtype=np.float64)).astype(np.int64)
+    out = out[pd.notna(out['time']).to_numpy()]
+    out['day'] = out['time'].to_numpy('datetime64[ns]').astype('datetime64[D]')
+    midnight = (out['time'].to_numpy('datetime64[ns]') == out['day'].to_numpy('datetime64[ns]'))
+    all_midnight = pd.Series(midnight).groupby([out['ticker'].to_numpy(), out['day'].to_numpy()]).all()
+    if all_midnight.any():
+        ticker, day = all_midnight[all_midnight].index[0]
+        raise ValueError(f"Every {ticker} bar on {pd.Timestamp(day):%Y-%m-%d} is stamped 00:00; "
+                         f"not minute bars, or the time of day is in a column that was not read")
+    return out
+
+# ------------------------------------------------------------------ partitions
+
+def partition_path(ticker, day, store=STORE_DIR):
+    day = pd.Timestamp(day)
+    return os.path.join(store, ticker.upper(), f"{day:%Y}", f"{day:%Y-%m-%d}.npz")
+
+def read_partition(ticker, day, store=STORE_DIR):
+    """One session's arrays, or None if the day is not stored."""
+    path = partition_path(ticker, day, store)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as part:
+        return {k: part[k] for k in ['time'] + FIELDS + ['volume']}
+
+def _merge_partition(ticker, day, rows, store):
+    """Merge new rows into the day's partition; later rows win on equal times."""
+    new = {k: rows[k].to_numpy() for k in FIELDS + ['volume']}
+    new['time'] = rows['time'].to_numpy('datetime64[ns]').astype(np.int64)
+    old = read_partition(ticker, day, store)
+    merged = new if old is None else {k: np.concatenate([old[k], new[k]]) for k in new}
+    # stable sort + keep the last of equal times = the newest bar
+    order = np.argsort(merged['time'], kind='stable')
+    times = merged['time'][order]
+    keep = np.append(times[1:] != times[:-1], True)
+    path = partition_path(ticker, day, store)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, **{k: v[order][keep] for k, v in merged.items()})
+
+def _session_mask(times, session):
+    if session == 'all':
+        return np.ones(len(times), dtype=bool)
+    minutes = (times.astype(np.int64) // 60_000_000_000) % 1440
+    open_, close = (int(h) * 60 + int(m) for h, m in (t.split(':') for t in REGULAR_SESSION))
+    return (minutes >= open_) & (minutes < close)
+
+def _daily_bar(part, day):
+    """Regular-session OHLCV of one partition (None without regular bars)."""
+    session = _session_mask(part['time'], 'regular')
+    # each field masked on its own: a missing low must not become the day's low
+    o, h, l, c = (part[f][session & (part[f] != MISSING)] for f in FIELDS)
+    if not len(c):
+        return None
+    return {'Date': pd.Timestamp(day).strftime('%Y-%m-%d'),
+            'Open': from_fixed(o[0]) if len(o) else np.nan,
+            'High': from_fixed(h.max()) if len(h) else np.nan,
+            'Low': from_fixed(l.min()) if len(l) else np.nan,
+            'Close': from_fixed(c[-1]), 'Volume': int(part['volume'][session].sum())}
+
+# ---------------------------------------------------------------- daily table
+
+def _daily_path(ticker, store):
+    return os.path.join(store, ticker.upper(), "daily.csv")
+
+def daily_bars(ticker, store=STORE_DIR):
+    """Daily OHLCV of one ticker (Date-indexed; empty if none)."""
+    path = _daily_path(ticker, store)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=DAILY_COLUMNS[1:], index=pd.DatetimeIndex([], name='Date'))
+    return pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+
+def _update_daily(ticker, days, store):
+    """Recompute the bars of `days` from their partitions and upsert them."""
+    bars = [bar for bar in (_daily_bar(read_partition(ticker, d, store), d) for d in sorted(days)) if bar]
+    table = daily_bars(ticker, store)
+    recomputed = pd.DatetimeIndex([pd.Timestamp(d) for d in days])
+    table = table[~table.index.isin(recomputed)]
+    if bars:
+        fresh = pd.DataFrame(bars)
+        fresh['Date'] = pd.to_datetime(fresh['Date'])
+        table = pd.concat([table, fresh.set_index('Date')])
+    table = table.sort_index()
+    table.index.name = 'Date'
+    table.to_csv(_daily_path(ticker, store), date_format='%Y-%m-%d')
+    return len(bars)
+
+def daily_frame(tickers=None, store=STORE_DIR):
+    """
+    Daily closes and volumes of the stored tickers in the price-file layout
+    (Date index, <TICKER> and <TICKER>_Volume columns).
+    """
+    tickers = tickers or stored_tickers(store)
+    columns = {}
+    for ticker in tickers:
+        bars = daily_bars(ticker, store)
+        columns[ticker] = bars['Close']
+        columns[f"{ticker}_Volume"] = bars['Volume']
+    frame = pd.DataFrame(columns).sort_index()
+    frame.index.name = 'Date'
+    return frame
+
+def stored_tickers(store=STORE_DIR):
+    if not os.path.isdir(store):
+        return []
+    return sorted(d for d in os.listdir(store) if os.path.isdir(os.path.join(store, d)))
+
+# -------------------------------------------------------------------- ingest
+
+def _load_manifest(store):
+    try:
+        with open(os.path.join(store, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+def _save_manifest(manifest, store):
+    os.makedirs(store, exist_ok=True)
+    with open(os.path.join(store, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+def ingest_file(path, store=STORE_DIR, chunk_rows=CHUNK_ROWS, force=False, manifest=None):
+    """
+    Stream one minute-bar CSV into the store.
+
+    Returns:
+        dict: rows, partitions touched, daily bars rewritten (0s if skipped).
+    """
+    own_manifest = manifest is None
+    manifest = manifest or _load_manifest(store)
+    stat = os.stat(path)
+    version = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    key = os.path.abspath(path)
+    if not force and manifest['files'].get(key) == version:
+        return {'file': path, 'skipped': True, 'rows': 0, 'partitions': 0, 'daily': 0}
+
+    touched = {}
+    rows = 0
+    default_ticker = _ticker_from_path(path)
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        try:
+            bars = normalize_chunk(chunk, default_ticker)
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from e
+        rows += len(bars)
+        for (ticker, day), part in bars.groupby(['ticker', 'day'], sort=False):
+            _merge_partition(ticker, day, part, store)
+            touched.setdefault(ticker, set()).add(pd.Timestamp(day))
+
+    daily = sum(_update_daily(ticker, days, store) for ticker, days in touched.items())
+    manifest['files'][key] = version
+    if own_manifest:
+        _save_manifest(manifest, store)
+    return {'file': path, 'skipped': False, 'rows': rows,
+            'partitions': sum(len(d) for d in touched.values()), 'daily': daily}
+
+def ingest(paths, store=STORE_DIR, chunk_rows=CHUNK_ROWS, force=False):
+    """Ingest several files (one manifest write per file, so an interrupted run resumes)."""
+    manifest = _load_manifest(store)
+    results = []
+    for path in paths:
+        results.append(ingest_file(path, store, chunk_rows, force, manifest))
+        _save_manifest(manifest, store)
+    return results
+
+# ------------------------------------------------------------ intraday reads
+
+def _stored_days(ticker, start, end, store):
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    days = []
+    for year in range(start.year, end.year + 1):
+        folder = os.path.join(store, ticker.upper(), str(year))
+        if os.path.isdir(folder):
+            days += [pd.Timestamp(f[:-4]) for f in os.listdir(folder) if f.endswith('.npz')]
+    return sorted(d for d in days if start <= d <= end)
+
+def _bars_frame(part, session):
+    mask = _session_mask(part['time'], session)
+    frame = pd.DataFrame({f.capitalize(): from_fixed(part[f][mask]) for f in FIELDS},
+                         index=pd.DatetimeIndex(part['time'][mask].astype('datetime64[ns]'), name='Time'))
+    frame['Volume'] = part['volume'][mask]
+    return frame
+
+def iter_bars(ticker, start, end=None, session='regular', store=STORE_DIR):
+    """Yield (day, bars DataFrame) per stored day in [start, end]; one day in memory at a time."""
+    for day in _stored_days(ticker, start, end or start, store):
+        yield day, _bars_frame(read_partition(ticker, day, store), session)
+
+def load_bars(ticker, start, end=None, session='regular', store=STORE_DIR):
+    """Minute bars of one ticker over a window (Open..Close in dollars, Volume)."""
+    frames = [bars for _, bars in iter_bars(ticker, start, end, session, store)]
+    if not frames:
+        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'],
+                            index=pd.DatetimeIndex([], name='Time'))
+    return pd.concat(frames)
+
+def day_extremes(ticker, days, session='regular', store=STORE_DIR):
+    """Per day: intraday High / High_Time and Low / Low_Time (days without bars are left out)."""
+    rows = []
+    for day in pd.DatetimeIndex(pd.to_datetime(list(days))):
+        part = read_partition(ticker, day, store)
+        if part is None:
+            continue
+        mask = _session_mask(part['time'], session)
+        valid = {f: mask & (part[f] != MISSING) for f in ['high', 'low', 'close']}
+        if not all(v.any() for v in valid.values()):
+            continue
+        (high_t, high), (low_t, low) = ((part['time'][valid[f]], part[f][valid[f]]) for f in ['high', 'low'])
+        hi, lo = int(np.argmax(high)), int(np.argmin(low))
+        rows.append({'Date': day, 'High': from_fixed(high[hi]),
+                     'High_Time': pd.Timestamp(high_t[hi]).strftime('%H:%M'),
+                     'Low': from_fixed(low[lo]), 'Low_Time': pd.Timestamp(low_t[lo]).strftime('%H:%M'),
+                     'Close': from_fixed(part['close'][valid['close']][-1])})
+    return pd.DataFrame(rows, columns=['Date', 'High', 'High_Time', 'Low', 'Low_Time', 'Close'])
+
+def peak_timing(ticker, store=STORE_DIR):
+    """Intraday high of each detected peak day (utils/signal_db peaks table) and the close's gap to it."""
+    from utils.signal_db import load_table
+    peaks = load_table('peaks', ticker)
+    timing = day_extremes(ticker, pd.to_datetime(peaks['peak_date']).dropna(), store=store)
+    timing['Close_Below_High_%'] = ((timing['High'] - timing['Close']) / timing['High'] * 100).round(4)
+    return timing
+
+# ---------------------------------------------------------------------- main
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minute-bar ingestion and intraday windows")
+    parser.add_argument('--store', default=STORE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('ingest', help="Stream minute-bar CSVs into the store")
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    p.add_argument('--force', action='store_true', help="Re-ingest files already in the manifest")
+    p = sub.add_parser('daily', help="Daily closes / volumes in the price-file layout")
+    p.add_argument('--tickers', nargs='*')
+    p.add_argument('--out', help="Write the CSV here instead of printing the tail")
+    p = sub.add_parser('window', help="Minute bars of one ticker")
+    p.add_argument('ticker')
+    p.add_argument('start')
+    p.add_argument('end', nargs='?')
+    p.add_argument('--session', choices=['regular', 'all'], default='regular')
+    p = sub.add_parser('timing', help="Intraday high of each detected peak day")
+    p.add_argument('ticker')
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        paths = [p for pattern in args.paths for p in (sorted(glob.glob(pattern)) or [pattern])]
+        try:
+            results = ingest(paths, args.store, args.chunk_rows, args.force)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        for result in results:
+            if result['skipped']:
+                print(f"⏭️  {result['file']} (unchanged)")
+            else:
+                print(f"✅ {result['file']}: {result['rows']} bars, {result['partitions']} day partitions, "
+                      f"{result['daily']} daily bars")
+    elif args.command == 'daily':
+        frame = daily_frame(args.tickers, args.store)
+        if args.out:
+            frame.reset_index().to_csv(args.out, index=False, date_format='%Y-%m-%d')
+            print(f"✅ {len(frame)} days × {len(frame.columns) // 2} tickers saved to {args.out}")
+        else:
+            print(frame.tail(10).to_string())
+    elif args.command == 'window':
+        print(load_bars(args.ticker.upper(), args.start, args.end, args.session, args.store).to_string())
+    else:
+        print(peak_timing(args.ticker.upper(), args.store).to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
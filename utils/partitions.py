@@ -0,0 +1,470 @@
+"""
+utils/partitions.py
+Out-of-core detection: month partitions with halos, processed in parallel
+
+Purpose:
+--------
+run_in_memory() and every stage read the whole price file into one frame.
+With minute-derived history or a universe of thousands of tickers that no
+longer fits. Here the price file is streamed in chunks, cut into month
+partitions that carry just enough neighbouring rows (the halo) for the
+detectors' 10-day and next-month windows, the partitions run in worker
+processes, and the per-month results are merged. The merged tables are the
+ones the in-memory run produces.
+
+How:
+----
+- A stream is the rows one detector sees: one ticker's non-NaN closes (the
+  peak / low / cycle detectors drop NaN per ETF), all scored ETFs with a
+  close (scores), or the raw rows (rotation). Halos count rows of the
+  stream, so a gap in one ticker never shortens another ticker's window.
+- A partition (one calendar month, or `months`) owns the months from its
+  first up to the next partition's first month with rows
+  (the last partition owns every later month, e.g. the month-after peak row
+  of the peak detector). Its frame is the owned rows plus `before` rows
+  ahead of it and `after` rows past it; results are filtered to the owned
+  months, so halo months never produce a row twice.
+- Halos per job (JOBS):
+    post_peak_highs     20 before: 10 prior-month rows, and the 10 sessions
+                        before a peak found among them
+    post_peak_lows      10 before / 12 after: the 10-day high before the
+                        peak; the low 3 sessions (USFR: 6 days) past the
+                        peak and the 10 days after it
+    same_month_cycles    1 before: the month alone (one earlier row keeps
+                        the month in the detector's month range)
+    usfr_full_cycles     1 before / 25 after: the next month's peak window
+                        (<= 23 sessions) and the 2 days after the peak
+    scores              11 before: prior 10-day high, shifted one day
+  A stream's partitions use the largest halo of the jobs reading it.
+- Memory: the reader keeps one chunk plus, per stream, the rows of the
+  months not yet emitted and their halo; at most 2 × workers partitions are
+  in flight. Results are small tables.
+- Cost: a partition also runs the detectors over its halo, so one-month
+  partitions do 2-4× the in-memory work; the pool spreads it over cores and
+  --months 3 cuts the overhead to ~2×.
+- Chunks must arrive in date order (the fetch stage writes the file sorted);
+  a chunk that goes back in time raises ValueError. Quarantined ranges are
+  applied per chunk, as load_price_frame() does for the whole file.
+
+Functions:
+----------
+- iter_price_chunks(path, quarantine, chunk_rows)   -> Date-indexed chunks of the price CSV
+- frame_chunks(frame, chunk_rows)                   -> chunks of an in-memory frame
+- iter_month_partitions(chunks, before, after)      -> one stream's partitions
+- run_jobs(chunks, jobs, workers, context)          -> {job: {etf: DataFrame}}
+- run_partitioned(prices, today, workers)           -> the run_in_memory() result dict
+
+Usage:
+------
+    python -m utils.partitions --workers 4
+    python -m utils.partitions --check            # compare with run_in_memory()
+    python main.py detect --partitioned --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from utils import profiling
+from utils.data_loader import PRICE_CSV, QUARANTINE_CSV
+
+CHUNK_ROWS = 50_000
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+SAME_MONTH_ETFS = ['SGOV', 'BIL', 'SHV', 'TFLO', 'ICSH']
+
+# ------------------------------------------------------------------ job runners
+# Each takes (partition frame, etf, context) and returns the detector's table.
+
+def _post_peak_highs(frame, etf, context):
+    from utils.peak_detection import find_post_peak_peaks
+    return find_post_peak_peaks(etf, frame.reset_index())
+
+def _post_peak_lows(frame, etf, context):
+    from scripts.generate_low_csvs import find_post_peak_lows
+    return find_post_peak_lows(etf, frame.reset_index())
+
+def _same_month_cycles(frame, etf, context):
+    from analysis.etf_full_cycles_same_month import extract_same_month_cycles
+    return extract_same_month_cycles(frame, etf)
+
+def _usfr_full_cycles(frame, etf, context):
+    from analysis.usfr_full_cycles import detect_usfr_full_cycles
+    return detect_usfr_full_cycles(frame[['USFR']])
+
+def _scores(frame, etf, context):
+    from scripts.peak_signal_score import ETF_LIST as SCORED
+    from utils.factor_scoring import compute_factor_cube, score_frame
+    return score_frame(compute_factor_cube(frame, tickers=SCORED))
+
+def _latest_scores(frame, etf, context):
+    from scripts.peak_signal_score import get_all_peak_scores
+    return get_all_peak_scores(frame)
+
+def _rotation(frame, etf, context, month=None, next_month=None):
+    from scripts.analyze_rotations import build_rotation_table
+    peaks = context['usfr_peaks']
+    owned = peaks[peaks['Peak_Date'] >= month]
+    if next_month is not None:
+        owned = owned[owned['Peak_Date'] < next_month]
+    return build_rotation_table(frame, owned.reset_index(drop=True), context['candidates'])
+
+# 'stream': 'ticker' (one ETF's non-NaN closes), 'scored' (rows where every
+# scored ETF has a close) or 'rows' (raw rows). 'key': the month column
+# ('YYYY-MM') a row belongs to; None = the date index. 'last': run once on
+# the final partition instead of filtering by month.
+JOBS = {
+    'post_peak_highs':   {'run': _post_peak_highs, 'stream': 'ticker', 'key': 'Month',
+                          'before': 20, 'after': 0},
+    'post_peak_lows':    {'run': _post_peak_lows, 'stream': 'ticker', 'key': 'Month',
+                          'before': 10, 'after': 12},
+    'same_month_cycles': {'run': _same_month_cycles, 'stream': 'ticker', 'key': 'Cycle_Month',
+                          'before': 1, 'after': 0},
+    'usfr_full_cycles':  {'run': _usfr_full_cycles, 'stream': 'ticker', 'key': 'Cycle_Start_Month',
+                          'before': 1, 'after': 25},
+    'scores':            {'run': _scores, 'stream': 'scored', 'key': None, 'before': 11, 'after': 0},
+    'latest_scores':     {'run': _latest_scores, 'stream': 'scored', 'last': True, 'before': 11, 'after': 0},
+    'rotation':          {'run': _rotation, 'stream': 'rows', 'key': 'Month', 'bounded': True,
+                          'before': 10, 'after': 0},
+}
+
+# --------------------------------------------------------------------- chunks
+
+def iter_price_chunks(path=PRICE_CSV, quarantine=QUARANTINE_CSV, chunk_rows=CHUNK_ROWS):
+    """Date-indexed chunks of the wide price CSV, parsed and quarantined like load_price_frame()."""
+    from utils.data_quality import apply_quarantine, load_quarantine
+    ranges = load_quarantine(quarantine) if quarantine else None
+    for chunk in pd.read_csv(path, index_col=0, parse_dates=True, chunksize=chunk_rows):
+        chunk.index = pd.to_datetime(chunk.index, utc=True).tz_convert(None)
+        chunk.index.name = 'Date'
+        yield apply_quarantine(chunk.sort_index(kind='stable'), ranges)
+
+def frame_chunks(frame, chunk_rows=CHUNK_ROWS):
+    """An in-memory Date-indexed frame as chunks (views, no copy)."""
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+# ----------------------------------------------------------------- partitions
+
+def _month_ids(index):
+    return np.asarray(index.year) * 12 + np.asarray(index.month) - 1
+
+def _month_start(month_id):
+    return pd.Timestamp(year=int(month_id) // 12, month=int(month_id) % 12 + 1, day=1)
+
+def _pop_partitions(state, before, after, final, months=1):
+    """
+    Cut the complete partitions at the head of a stream buffer.
+
+    A partition spans `months` calendar months and is complete once the month
+    after it has started and `after` rows of that are buffered (or the input
+    has ended). state = {'frame', 'first'}, 'first' being the row where the
+    first month not yet emitted starts.
+    """
+    frame, first = state['frame'], state['first']
+    ids = _month_ids(frame.index)
+    parts = []
+    while first < len(frame):
+        nxt = first + int(np.searchsorted(ids[first:], ids[first] + months))
+        if not final and (nxt == len(frame) or len(frame) - nxt < after):
+            break
+        lo = max(first - before, 0)
+        parts.append({
+            'month': _month_start(ids[first]),
+            'next_month': _month_start(ids[nxt]) if nxt < len(frame) else None,
+            'frame': frame.iloc[lo:min(nxt + after, len(frame))],
+            'owned': (first - lo, nxt - lo),       # row span of the owned months in 'frame'
+        })
+        first = nxt
+    keep = max(first - before, 0)
+    state['frame'], state['first'] = frame.iloc[keep:], first - keep
+    return parts
+
+def _in_date_order(chunks):
+    last_date = None
+    for chunk in chunks:
+        if len(chunk) and last_date is not None and chunk.index[0] <= last_date:
+            raise ValueError(f"Price chunks are not in date order at {chunk.index[0]:%Y-%m-%d}")
+        if len(chunk):
+            last_date = chunk.index[-1]
+        yield chunk
+
+def _stream_rows(chunk, stream):
+    columns, how = stream
+    rows = chunk[list(columns)]
+    return rows.dropna(how=how) if how else rows
+
+def iter_month_partitions(chunks, before, after, stream=None, months=1):
+    """
+    Month partitions of one stream: dicts with 'month', 'next_month' (None for
+    the last) and 'frame' (owned rows plus the halo).
+
+    stream: (columns, dropna 'how' or None) selecting the stream's rows from
+    each chunk; None keeps the chunks as they are.
+    """
+    state = {'frame': None, 'first': 0}
+    for chunk in _in_date_order(chunks):
+        rows = chunk if stream is None else _stream_rows(chunk, stream)
+        state['frame'] = rows if state['frame'] is None else pd.concat([state['frame'], rows])
+        yield from _pop_partitions(state, before, after, final=False, months=months)
+    if state['frame'] is not None:
+        yield from _pop_partitions(state, before, after, final=True, months=months)
+
+def _owned(table, key, part):
+    """Rows of a partition's result that belong to its months."""
+    if key is None:
+        dates = table.index
+        mask = dates >= part['month']
+        if part['next_month'] is not None:
+            mask &= dates < part['next_month']
+        return table[mask]
+    if key not in table.columns:             # a detector's empty result without columns
+        return table
+    months = table[key].astype(str)
+    mask = months >= part['month'].strftime('%Y-%m')
+    if part['next_month'] is not None:
+        mask &= months < part['next_month'].strftime('%Y-%m')
+    return table[mask]
+
+def _run_partition(jobs, etf, part, context):
+    """Worker: every job of one stream on one partition -> {job: owned rows}."""
+    out = {}
+    start, stop = part['owned']
+    for name in jobs:
+        job = JOBS[name]
+        # the job's own halo: the stream's may be wider for another job
+        frame = part['frame'].iloc[max(start - job['before'], 0):stop + job['after']]
+        if job.get('last'):
+            if part['next_month'] is None:
+                out[name] = job['run'](frame, etf, context)
+            continue
+        bounds = {'month': part['month'], 'next_month': part['next_month']} if job.get('bounded') else {}
+        with profiling.span(f"partition.{name}"):
+            table = job['run'](frame, etf, context, **bounds)
+        out[name] = table if 'key' not in job else _owned(table, job['key'], part)
+    return part['month'], out
+
+def _merge(pieces, key):
+    """Concatenate per-month pieces in month order (empty pieces only shape an empty result)."""
+    pieces = [p for _, p in sorted(pieces, key=lambda x: x[0])]
+    filled = [p for p in pieces if len(p)]
+    if not filled:
+        return pieces[0] if pieces else pd.DataFrame()
+    # a piece of all-missing strings comes back as object: re-infer, as one frame would
+    merged = pd.concat(filled).infer_objects()
+    return merged if key is None else merged.reset_index(drop=True)
+
+# -------------------------------------------------------------------- running
+
+def _streams(jobs, columns, scored=None, rows=None):
+    """{(stream, etf): [job names]} for the requested {job: etfs}."""
+    streams = {}
+    for name, etfs in jobs.items():
+        kind = JOBS[name]['stream']
+        if kind == 'ticker':
+            for etf in etfs:
+                if etf in columns:
+                    streams.setdefault(((etf,), 'any', etf), []).append(name)
+        elif kind == 'scored':
+            streams.setdefault((tuple(scored), 'any', None), []).append(name)
+        else:
+            streams.setdefault((tuple(rows), None, None), []).append(name)
+    return streams
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+def run_jobs(chunks, jobs, workers=None, context=None, scored=None, rows=None, months=1):
+    """
+    Run detector / scorer jobs over month partitions of a chunk stream.
+
+    Parameters:
+        chunks (iterable): Date-indexed chunks in date order (iter_price_chunks / frame_chunks).
+        jobs (dict): {job name: [ETFs]} (ETFs are ignored by 'scored' / 'rows' jobs).
+        workers (int): Process pool size; 0 runs the partitions in this process.
+        context (dict): Extra inputs for the job runners (e.g. rotation's USFR peaks).
+        scored / rows (list): Columns of the 'scored' and 'rows' streams.
+        months (int): Calendar months per partition (more months, less halo overhead).
+
+    Returns:
+        {job: {etf: DataFrame}} ({job: {None: ...}} for 'scored' / 'rows' jobs).
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return {name: {} for name in jobs}
+    streams = _streams(jobs, first.columns, scored, rows)
+    states = {s: {'frame': None, 'first': 0} for s in streams}
+    halos = {s: (max(JOBS[n]['before'] for n in names), max(JOBS[n]['after'] for n in names))
+             for s, names in streams.items()}
+    pieces = {}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+    limit = 2 * (workers or os.cpu_count() or 1)
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            stream = pending.pop(future)
+            month, out = future.result()
+            for name, table in out.items():
+                pieces.setdefault(name, {}).setdefault(stream[2], []).append((month, table))
+
+    def submit(stream, part):
+        if pool is None:
+            month, out = _run_partition(streams[stream], stream[2], part, context)
+            for name, table in out.items():
+                pieces.setdefault(name, {}).setdefault(stream[2], []).append((month, table))
+            return
+        while len(pending) >= limit:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending[pool.submit(_run_partition, streams[stream], stream[2], part, context)] = stream
+
+    try:
+        for chunk in _in_date_order(_chain(first, chunks)):
+            for stream, state in states.items():
+                rows = _stream_rows(chunk, stream[:2])
+                state['frame'] = rows if state['frame'] is None else pd.concat([state['frame'], rows])
+                for part in _pop_partitions(state, *halos[stream], final=False, months=months):
+                    submit(stream, part)
+        for stream, state in states.items():
+            if state['frame'] is not None:
+                for part in _pop_partitions(state, *halos[stream], final=True, months=months):
+                    submit(stream, part)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    results = {}
+    for name in jobs:
+        job = JOBS[name]
+        results[name] = {}
+        for etf, parts in pieces.get(name, {}).items():
+            results[name][etf] = parts[-1][1] if job.get('last') else _merge(parts, job['key'])
+    return results
+
+def run_partitioned(prices=None, today=None, workers=None, chunk_rows=CHUNK_ROWS, months=1):
+    """
+    The run_in_memory() detection chain over month partitions.
+
+    Parameters:
+        prices (str | pd.DataFrame): Price CSV path (streamed; default PRICE_CSV)
+            or an in-memory Date-indexed frame (cut into chunks).
+        today (datetime): Month used for the Peak_Modal_Day update (default: now).
+        workers (int): Process pool size (0 = this process).
+        months (int): Calendar months per partition.
+
+    Returns:
+        dict with the run_in_memory() keys, plus 'score_history' (the combined
+        peak score of every scored ETF on every date).
+    """
+    from datetime import datetime
+    from scripts.analyze_rotations import ROTATION_ETFS, USFR, prepare_usfr_peaks
+    from scripts.etf_rotation_backtest import summarize_rotation_backtest
+    from scripts.peak_signal_score import ETF_LIST as SCORED
+    from scripts.update_modal_days import apply_peak_modal_day
+
+    def chunks():
+        if isinstance(prices, pd.DataFrame):
+            return frame_chunks(prices, chunk_rows)
+        return iter_price_chunks(prices or PRICE_CSV, chunk_rows=chunk_rows)
+
+    current = (today or datetime.today()).strftime('%Y-%m')
+    month_rows = []
+
+    def keep_current_month(stream):
+        # rows of the modal-day month, the only prices apply_peak_modal_day() reads
+        for chunk in stream:
+            month_rows.append(chunk[chunk.index.strftime('%Y-%m') == current])
+            yield chunk
+
+    jobs = {'same_month_cycles': SAME_MONTH_ETFS, 'usfr_full_cycles': ['USFR'],
+            'post_peak_highs': ETF_LIST, 'post_peak_lows': ETF_LIST,
+            'scores': None, 'latest_scores': None}
+    with profiling.span("partitioned.detect"):
+        found = run_jobs(keep_current_month(chunks()), jobs, workers, scored=SCORED, months=months)
+
+    full_cycles = dict(found['same_month_cycles'])
+    current_prices = pd.concat(month_rows)
+    with profiling.span("modal_days"):
+        for etf, cycles in full_cycles.items():
+            updated, _ = apply_peak_modal_day(cycles, current_prices, etf, today)
+            if updated is not None:
+                full_cycles[etf] = updated
+    full_cycles['USFR'] = found['usfr_full_cycles']['USFR']
+
+    candidates = [etf for etf in ROTATION_ETFS if etf in current_prices.columns]
+    context = {'usfr_peaks': prepare_usfr_peaks(full_cycles['USFR']), 'candidates': candidates}
+    with profiling.span("partitioned.rotation"):
+        rotation = run_jobs(chunks(), {'rotation': None}, workers, context, rows=[USFR] + candidates,
+                           months=months)
+    rotation = rotation['rotation'][None]
+    _, rotation_summary = summarize_rotation_backtest(rotation)
+    return {
+        'full_cycles': full_cycles,
+        'post_peak_highs': found['post_peak_highs'],
+        'post_peak_lows': found['post_peak_lows'],
+        'rotation': rotation,
+        'rotation_summary': rotation_summary,
+        'scores': found['latest_scores'][None],
+        'score_history': found['scores'][None],
+    }
+
+def compare_runs(partitioned, in_memory):
+    """Differences between a run_partitioned() and a run_in_memory() result (empty list = identical)."""
+    problems = []
+    for name in ['full_cycles', 'post_peak_highs', 'post_peak_lows']:
+        for etf in sorted(set(partitioned[name]) | set(in_memory[name])):
+            left, right = partitioned[name].get(etf), in_memory[name].get(etf)
+            if left is None or right is None or not left.equals(right):
+                problems.append(f"{name}/{etf}")
+    for name in ['rotation', 'rotation_summary']:
+        if not partitioned[name].equals(in_memory[name]):
+            problems.append(name)
+    if partitioned['scores'] != in_memory['scores']:
+        problems.append('scores')
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detection over month partitions of the price file")
+    parser.add_argument('--input', default=PRICE_CSV)
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (0 = no pool)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--months', type=int, default=1, help="Calendar months per partition")
+    parser.add_argument('--check', action='store_true', help="Compare with run_in_memory()")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run_partitioned(args.input, workers=args.workers, chunk_rows=args.chunk_rows,
+                               months=args.months)
+    elapsed = time.perf_counter() - start
+    counts = {name: sum(len(t) for t in results[name].values())
+              for name in ['full_cycles', 'post_peak_highs', 'post_peak_lows']}
+    print(f"✅ Partitioned run in {elapsed:.2f}s: "
+          + ", ".join(f"{n} {c} rows" for n, c in counts.items())
+          + f", rotation {len(results['rotation'])} months")
+    if not args.check:
+        return 0
+
+    from utils.data_loader import load_price_frame
+    from utils.pipeline import run_in_memory
+    start = time.perf_counter()
+    expected = run_in_memory(load_price_frame(args.input))
+    print(f"⏱️  In-memory run in {time.perf_counter() - start:.2f}s")
+    problems = compare_runs(results, expected)
+    if problems:
+        print(f"❌ Differs from run_in_memory(): {', '.join(problems)}")
+        return 1
+    print("✅ Identical to run_in_memory()")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -47,6 +47,8 @@ Changelog – 2025-06-13:
 """
 
 import pandas as pd
+from utils.fixed_point import extreme_dates, tick_count
+from utils.profiling import count, profiled
 
 # Minimum % rebound thresholds for each ETF
 REB_THRESHOLDS = {
@@ -58,6 +60,7 @@ REB_THRESHOLDS = {
     'ICSH': 0.0007
 }
 
+@profiled()
 def find_post_peak_peaks(etf_name: str, df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
     etf_df = df[['Date', etf_name]].dropna().copy()
     etf_df['Date'] = pd.to_datetime(etf_df['Date'])
@@ -70,6 +73,7 @@ def find_post_peak_peaks(etf_name: str, df: pd.DataFrame, debug: bool = False) -
     months = pd.date_range(start=etf_df.index.min().replace(day=1), end=last_month, freq='MS')
 
     for month_start in months:
+        count('peak_detection.months')
         month_end = month_start + pd.offsets.MonthEnd(0)
 
         # Include up to 10 trading days before this month to capture prior-month lows
@@ -99,8 +103,8 @@ def find_post_peak_peaks(etf_name: str, df: pd.DataFrame, debug: bool = False) -
                 print(f"[SKIP] {etf_name} — No peak window data in {month_start.strftime('%Y-%m')}")
             continue
 
-        peak_value = peak_candidates[etf_name].max()
-        peak_dates = peak_candidates[peak_candidates[etf_name] == peak_value].index
+        # Ties are compared in 1/10,000-dollar ticks (utils/fixed_point.py)
+        peak_value, peak_dates = extreme_dates(peak_candidates[etf_name], 'max')
         peak_date = peak_dates[-1] if len(peak_dates) > 0 else None
 
         if not peak_date:
@@ -121,8 +125,8 @@ def find_post_peak_peaks(etf_name: str, df: pd.DataFrame, debug: bool = False) -
                 print(f"[SKIP] {etf_name} — Too few pre-peak days ({len(pre_10d)}) before {peak_date}")
             continue
 
-        low_value = pre_10d[etf_name].min()
-        low_date = pre_10d[etf_name].idxmin()
+        low_value, low_dates = extreme_dates(pre_10d[etf_name], 'min')
+        low_date = low_dates[0]
 
         if low_date >= peak_date:
             if debug:
@@ -137,7 +141,7 @@ def find_post_peak_peaks(etf_name: str, df: pd.DataFrame, debug: bool = False) -
                 print(f"[SKIP] {etf_name} — Rebound too small ({rebound_pct:.3%}) [thresh: {reb_thresh:.3%}] in {month_start.strftime('%Y-%m')}")
             continue
 
-        multi_peak_count = group[etf_name].eq(peak_value).sum()
+        multi_peak_count = tick_count(group[etf_name], peak_value)
 
         monthly_peaks.append({
             'ETF': etf_name,
@@ -0,0 +1,337 @@
+"""
+utils/peak_forecast.py
+Batch peak-value forecaster for every tracked ETF
+
+Purpose:
+--------
+estimate_usfr_peak_value() forecast one ticker (USFR) against a hard-coded
+ex-dividend date and re-read the price and cycles CSVs on every call. This
+module forecasts the next peak of every ticker in the price file in one
+call, derives each expected peak date from data, and can replay the
+forecast for every past month to measure how far off it would have been.
+
+How:
+----
+- Expected peak date, per ticker:
+  * tickers with a distribution calendar (USFR: utils/usfr_distribution)
+    peak one market day before the next ex-date, while the schedule covers
+    the as-of date;
+  * otherwise the modal peak day, counted in trading days back from the
+    month end (as in scripts/generate_etf_day_stats.py), over the cycles
+    that peaked by the as-of date; the first such session after the as-of
+    date is the expected peak.
+- Estimators (same as the USFR estimate):
+  * slope: mean daily change over the last LOOKBACK closes, extended over
+    the NYSE sessions left until the expected peak;
+  * historical: last close × (1 + mean Gain_% of the last HIST_CYCLES
+    cycles that peaked by the as-of date).
+- All (as-of date, ticker) pairs are evaluated together on arrays: the
+  price matrix is compacted per column so the n-th valid close is one
+  fancy-index lookup, modal days come from cumulative one-hot counts, and
+  cycle windows from a searchsorted on (ticker, peak date) keys.
+- Cycles are read from the signal store (utils/signal_db.py) after syncing
+  the *_full_cycles.csv files; prices via utils/data_loader.load_price_frame.
+- Results are cached in-process per data version (price file, cycles files
+  and distribution schedule: mtime + size), so the dashboard and the warm
+  CLI server reuse them until a file changes.
+
+Functions:
+----------
+- forecast_peaks(as_of, price_csv, ...)     -> DataFrame, one row per ticker
+- backfill(price_csv, ...)                  -> DataFrame, one row per past cycle
+- backfill_summary(errors)                  -> DataFrame of error stats per ticker
+
+Usage:
+------
+    python -m utils.peak_forecast                       # next peak, all tickers
+    python -m utils.peak_forecast --as-of 2025-05-30
+    python -m utils.peak_forecast backfill --out logs/peak_forecast_backfill.csv
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import PRICE_CSV, load_price_frame
+from utils.signal_db import DB_PATH, SIGNALS_DIR, load_table, sync_csv
+
+LOOKBACK = 5        # closes used for the slope (4 daily changes)
+HIST_CYCLES = 6     # past cycles averaged for the historical gain
+PEAK_LAG = 1        # market days between the peak and the ex-date
+CALENDAR_DAYS_AHEAD = 400
+
+DISTRIBUTION_PDFS = {'USFR': "signals/usfr_distribution_schedule.pdf"}
+
+_CACHE = {}
+
+def _file_version(path):
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+def _cycle_files(signals_dir):
+    return sorted(os.path.join(signals_dir, f) for f in os.listdir(signals_dir)
+                  if f.endswith("_full_cycles.csv"))
+
+def data_version(price_csv=PRICE_CSV, signals_dir=SIGNALS_DIR):
+    """Version key of every input the forecast reads."""
+    paths = [price_csv] + _cycle_files(signals_dir)
+    paths += [p for p in DISTRIBUTION_PDFS.values() if os.path.exists(p)]
+    return tuple(_file_version(p) for p in paths)
+
+def _ex_dates(ticker):
+    """Ex-dates from the ticker's distribution schedule (empty if none)."""
+    path = DISTRIBUTION_PDFS.get(ticker)
+    if not path or not os.path.exists(path):
+        return np.array([], dtype='datetime64[ns]')
+    from utils.usfr_distribution import get_usfr_distribution_dates
+    dates = [d['ex_date'] for d in get_usfr_distribution_dates(download_if_missing=False)]
+    return np.sort(pd.to_datetime(pd.Series(dates, dtype=object)).to_numpy('datetime64[ns]'))
+
+def _load_inputs(price_csv, signals_dir, db_path):
+    """Price matrix, session calendar, sorted cycles and ex-dates as arrays."""
+    frame = load_price_frame(price_csv)
+    tickers = [c for c in frame.columns if not c.endswith('_Volume')]
+    prices = frame[tickers].to_numpy(np.float64)
+    dates = frame.index.to_numpy('datetime64[ns]')
+
+    from utils.synthetic_market import market_calendar
+    first = frame.index[0].replace(day=1)
+    sessions = market_calendar(first, frame.index[-1] + pd.Timedelta(days=CALENDAR_DAYS_AHEAD))
+    months = np.asarray(sessions.year * 12 + sessions.month - 1)
+    month_ids, month_first, month_len = np.unique(months, return_index=True, return_counts=True)
+
+    for path in _cycle_files(signals_dir):
+        sync_csv(path, db_path=db_path)
+    cycles = load_table('cycles', db_path=db_path)
+    cycles = cycles[cycles['ticker'].isin(tickers)].copy()
+    cycles['peak_date'] = pd.to_datetime(cycles['peak_date'], errors='coerce')
+    cycles = cycles.dropna(subset=['peak_date'])
+    cycles['code'] = cycles['ticker'].map({t: i for i, t in enumerate(tickers)})
+    cycles = cycles.sort_values(['code', 'peak_date'], kind='stable').reset_index(drop=True)
+
+    return {
+        'tickers': tickers, 'prices': prices, 'dates': dates,
+        'sessions': sessions.to_numpy('datetime64[ns]'),
+        'month_base': int(month_ids[0]), 'month_first': month_first, 'month_len': month_len,
+        'cycles': cycles,
+        'ex_dates': {t: _ex_dates(t) for t in tickers if t in DISTRIBUTION_PDFS},
+    }
+
+def _session_pos(ctx, when):
+    """Position of the last session on or before `when`."""
+    return np.searchsorted(ctx['sessions'], when, side='right') - 1
+
+def _month_index(ctx, pos):
+    stamps = pd.DatetimeIndex(ctx['sessions'][pos])
+    return np.asarray(stamps.year * 12 + stamps.month - 1) - ctx['month_base']
+
+def _cycle_keys(codes, when):
+    """Sortable (ticker code, time) keys; the cycles table is sorted the same way."""
+    return codes.astype(np.int64) * (1 << 52) + when.astype('datetime64[D]').astype(np.int64)
+
+def _cycle_windows(ctx, cols, as_of):
+    """Per pair: [start, end) rows of the ticker's cycles that peaked by as_of."""
+    cycles = ctx['cycles']
+    keys = _cycle_keys(cycles['code'].to_numpy(), cycles['peak_date'].to_numpy('datetime64[ns]'))
+    start = np.searchsorted(keys, _cycle_keys(cols, np.full(len(cols), np.datetime64(0, 'D'))), 'left')
+    end = np.searchsorted(keys, _cycle_keys(cols, as_of), 'right')
+    return start, end
+
+def _modal_days_from_end(ctx, start, end):
+    """Most frequent peak trading day counted from the month end (1 = last); 0 without cycles."""
+    cycles = ctx['cycles']
+    pos = _session_pos(ctx, cycles['peak_date'].to_numpy('datetime64[ns]'))
+    mi = _month_index(ctx, pos)
+    day = ctx['month_first'][mi] + ctx['month_len'][mi] - pos
+    width = int(ctx['month_len'].max()) + 1
+    onehot = np.zeros((len(cycles) + 1, width), dtype=np.int64)
+    onehot[np.arange(1, len(cycles) + 1), day] = 1
+    cum = np.cumsum(onehot, axis=0)
+    counts = cum[end] - cum[start]
+    return np.where(end > start, counts.argmax(axis=1), 0)
+
+def _expected_peak(ctx, cols, pos):
+    """Session position of the expected peak after session `pos`, and its source."""
+    start, end = _cycle_windows(ctx, cols, ctx['sessions'][pos])
+    k = _modal_days_from_end(ctx, start, end)
+    first, length = ctx['month_first'], ctx['month_len']
+
+    def candidate(mi):
+        return np.maximum(first[mi] + length[mi] - np.maximum(k, 1), first[mi])
+
+    mi = _month_index(ctx, pos)
+    peak = candidate(mi)
+    peak = np.where(peak <= pos, candidate(np.minimum(mi + 1, len(first) - 1)), peak)
+    peak = np.where(k > 0, peak, -1)
+    source = np.where(k > 0, 'modal', '')
+
+    for ticker, ex_dates in ctx['ex_dates'].items():
+        if not len(ex_dates):
+            continue
+        peaks = np.searchsorted(ctx['sessions'], ex_dates, 'left') - PEAK_LAG
+        nxt = np.searchsorted(peaks, pos, 'right')
+        covered = (_month_index(ctx, pos) >= _month_index(ctx, peaks[:1])[0] - 1) & (nxt < len(peaks))
+        use = (cols == ctx['tickers'].index(ticker)) & covered
+        peak = np.where(use, peaks[np.minimum(nxt, len(peaks) - 1)], peak)
+        source = np.where(use, 'distribution', source)
+    return peak, source
+
+def _forecast(ctx, rows, cols):
+    """Forecast for (as-of price row, ticker column) pairs, all at once."""
+    prices, dates = ctx['prices'], ctx['dates']
+    valid = ~np.isnan(prices)
+    order = np.argsort(~valid, axis=0, kind='stable')       # valid rows first, in date order
+    seen = np.cumsum(valid, axis=0)[rows, cols]
+    last_j = seen - 1
+    first_j = np.maximum(seen - LOOKBACK, 0)
+    last_row = order[np.maximum(last_j, 0), cols]
+    first_row = order[first_j, cols]
+    last_price = prices[last_row, cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (last_price - prices[first_row, cols]) / (last_j - first_j)
+    slope = np.where(last_j - first_j >= 1, slope, np.nan)
+
+    as_of = dates[rows]
+    pos = _session_pos(ctx, as_of)
+    peak, source = _expected_peak(ctx, cols, pos)
+    has_peak = peak >= 0
+    sessions_until = np.where(has_peak, peak - pos, 0)
+    peak_date = np.where(has_peak, ctx['sessions'][np.maximum(peak, 0)], np.datetime64('NaT'))
+
+    gains = ctx['cycles']['gain_pct'].to_numpy(np.float64)
+    has_gain = ~np.isnan(gains)
+    cum_gain = np.concatenate([[0.0], np.cumsum(np.where(has_gain, gains, 0.0))])
+    cum_n = np.concatenate([[0], np.cumsum(has_gain)])
+    start, end = _cycle_windows(ctx, cols, as_of)
+    # last HIST_CYCLES rows with a gain: walk the count index back from `end`
+    lo = np.searchsorted(cum_n, np.maximum(cum_n[end] - HIST_CYCLES, cum_n[start]), 'left')
+    lo = np.maximum(lo, start)
+    n_gain = cum_n[end] - cum_n[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_gain = np.where(n_gain > 0, (cum_gain[end] - cum_gain[lo]) / n_gain, np.nan)
+
+    return pd.DataFrame({
+        'ETF': np.array(ctx['tickers'])[cols],
+        'As_Of': pd.DatetimeIndex(dates[last_row]),
+        'Last_Price': last_price,
+        'Recent_Slope': slope,
+        'Expected_Peak_Date': pd.DatetimeIndex(peak_date),
+        'Peak_Source': source,
+        'Days_Until_Peak': pd.TimedeltaIndex(peak_date - as_of).days,
+        'Sessions_Until_Peak': np.where(has_peak, sessions_until, -1),
+        'Est_Peak_Slope': np.where(has_peak, last_price + slope * sessions_until, np.nan),
+        'Avg_Gain_%': avg_gain,
+        'Cycles_Used': n_gain,
+        'Est_Peak_Hist': last_price * (1 + avg_gain / 100),
+    })
+
+def forecast_peaks(as_of=None, price_csv=PRICE_CSV, signals_dir=SIGNALS_DIR, db_path=DB_PATH):
+    """
+    Next-peak forecast for every ticker in the price file.
+
+    Parameters:
+        as_of: forecast with the closes up to this date (default: the last one).
+
+    Returns:
+        pd.DataFrame: ETF, As_Of, Last_Price, Recent_Slope, Expected_Peak_Date,
+        Peak_Source, Days_Until_Peak, Sessions_Until_Peak, Est_Peak_Slope,
+        Avg_Gain_%, Cycles_Used, Est_Peak_Hist
+    """
+    key = ('forecast', data_version(price_csv, signals_dir), db_path,
+           None if as_of is None else pd.Timestamp(as_of).normalize())
+    if key not in _CACHE:
+        ctx = _context(price_csv, signals_dir, db_path)
+        dates = ctx['dates']
+        row = len(dates) - 1 if as_of is None else np.searchsorted(dates, key[-1].to_datetime64(), 'right') - 1
+        if row < 0:
+            raise ValueError(f"No prices on or before {as_of}")
+        cols = np.arange(len(ctx['tickers']))
+        _CACHE[key] = _forecast(ctx, np.full(len(cols), row), cols)
+    return _CACHE[key].copy()
+
+def _context(price_csv, signals_dir, db_path):
+    key = ('inputs', data_version(price_csv, signals_dir), db_path)
+    if key not in _CACHE:
+        for stale in [k for k in _CACHE if k[0] == 'inputs' and k[2] == db_path]:
+            del _CACHE[stale]
+        _CACHE[key] = _load_inputs(price_csv, signals_dir, db_path)
+    return _CACHE[key]
+
+def backfill(price_csv=PRICE_CSV, signals_dir=SIGNALS_DIR, db_path=DB_PATH):
+    """
+    Replay the forecast for every past cycle and compare it with the actual peak.
+
+    Each peak is forecast from the last close before its month starts, using
+    only cycles that had peaked by then.
+
+    Returns:
+        pd.DataFrame: the forecast_peaks() columns plus Actual_Peak_Date,
+        Actual_Peak, Date_Error_Sessions, Slope_Error_%, Hist_Error_%
+    """
+    key = ('backfill', data_version(price_csv, signals_dir), db_path)
+    if key in _CACHE:
+        return _CACHE[key].copy()
+    ctx = _context(price_csv, signals_dir, db_path)
+    cycles = ctx['cycles']
+    peak_dates = cycles['peak_date'].to_numpy('datetime64[ns]')
+    month_start = peak_dates.astype('datetime64[M]').astype('datetime64[ns]')
+    rows = np.searchsorted(ctx['dates'], month_start, 'left') - 1
+    keep = (rows >= LOOKBACK - 1) & (peak_dates <= ctx['dates'][-1])
+    cycles, rows = cycles[keep], rows[keep]
+
+    out = _forecast(ctx, rows, cycles['code'].to_numpy())
+    actual = cycles['peak'].to_numpy(np.float64)
+    actual_pos = _session_pos(ctx, cycles['peak_date'].to_numpy('datetime64[ns]'))
+    forecast_pos = _session_pos(ctx, out['Expected_Peak_Date'].to_numpy('datetime64[ns]'))
+    out['Actual_Peak_Date'] = cycles['peak_date'].to_numpy()
+    out['Actual_Peak'] = actual
+    out['Date_Error_Sessions'] = np.where(out['Sessions_Until_Peak'] >= 0, forecast_pos - actual_pos, np.nan)
+    out['Slope_Error_%'] = (out['Est_Peak_Slope'] / actual - 1) * 100
+    out['Hist_Error_%'] = (out['Est_Peak_Hist'] / actual - 1) * 100
+    out = out.sort_values(['ETF', 'Actual_Peak_Date'], kind='stable').reset_index(drop=True)
+    _CACHE[key] = out
+    return out.copy()
+
+def backfill_summary(errors):
+    """Per ticker: months scored, mean absolute % error of each estimator, date error in sessions."""
+    grouped = errors.assign(
+        slope_abs=errors['Slope_Error_%'].abs(), hist_abs=errors['Hist_Error_%'].abs(),
+        date_abs=errors['Date_Error_Sessions'].abs(), exact=errors['Date_Error_Sessions'] == 0,
+    ).groupby('ETF', sort=False)
+    return pd.DataFrame({
+        'Months': grouped.size(),
+        'Slope_MAE_%': grouped['slope_abs'].mean().round(3),
+        'Hist_MAE_%': grouped['hist_abs'].mean().round(3),
+        'Date_MAE_Sessions': grouped['date_abs'].mean().round(2),
+        'Exact_Date_%': (grouped['exact'].mean() * 100).round(1),
+    }).reset_index()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast the next peak value of every ETF")
+    parser.add_argument('command', nargs='?', choices=['forecast', 'backfill'], default='forecast')
+    parser.add_argument('--as-of', help="Forecast from the closes up to this date (default: latest)")
+    parser.add_argument('--input', default=PRICE_CSV)
+    parser.add_argument('--out', help="Also write the table to this CSV")
+    args = parser.parse_args(argv)
+
+    if args.command == 'forecast':
+        table = forecast_peaks(args.as_of, args.input)
+        print(f"📈 Peak forecast from closes up to {table['As_Of'].max():%Y-%m-%d}")
+        shown = table.drop(columns=['As_Of', 'Recent_Slope'])
+    else:
+        table = backfill(args.input)
+        print(f"🔁 Backfilled {len(table)} cycles")
+        shown = backfill_summary(table)
+    with pd.option_context('display.float_format', '{:.4f}'.format, 'display.width', 200):
+        print(shown.to_string(index=False))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        table.to_csv(args.out, index=False)
+        print(f"✅ Saved {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,75 +10,156 @@ Score Criteria:
 - Calendar day in [28–31] → +1
 - Consecutive day at same peak price → +0.5
 
+Functions:
+- compute_peak_scores(data, ...) → structured array, many dates × tickers in one call
+- compute_peak_score(etf, df, today) → dict for one ETF and day (legacy interface)
+
 Returns:
     dict with score, breakdown, and context data
 """
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from utils.factor_scoring import (
+    compute_factor_cube, combine_factors, prior_high_10d, prior_avg_volume_5d,
+)
+
+# Point weights for the factors above (see utils/factor_scoring.py)
+PEAK_POINT_WEIGHTS = {
+    'near_high': 1.0,
+    'volume_spike': 1.0,
+    'late_month': 1.0,
+    'repeat_high': 0.5,
+}
+
+# One record per scored (date, ticker)
+PEAK_SCORE_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('ticker', 'U8'),
+    ('score', 'f4'),
+    ('price', 'f8'),
+    ('high_10d', 'f8'),
+    ('volume', 'f8'),
+    ('avg_vol_5d', 'f8'),
+    ('near_high', '?'),
+    ('volume_spike', '?'),
+    ('late_month', '?'),
+    ('repeat_high', '?'),
+])
+
+def peak_score_comment(score):
+    return '✅ Strong signal' if score >= 3 else '⚠️ Watch closely' if score >= 2 else 'No clear peak yet'
+
+def _as_price_frames(data, tickers, dates_index, volumes):
+    """Wrap the inputs as (prices, volumes) frames without touching the caller's data."""
+    if isinstance(data, pd.DataFrame):
+        if not isinstance(data.index, pd.DatetimeIndex):
+            # 'Date' column frames are wrapped with a new index; the caller's frame is not modified
+            data = data.set_axis(pd.DatetimeIndex(pd.to_datetime(data['Date'])), axis=0)
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+        if tickers is None:
+            tickers = [c for c in data.columns if c != 'Date' and not str(c).endswith('_Volume')]
+        prices = data[list(tickers)]
+        volume_cols = [f"{t}_Volume" for t in tickers]
+        if all(c in data.columns for c in volume_cols):
+            volumes = data[volume_cols].set_axis(list(tickers), axis=1)
+        else:
+            volumes = None
+        return prices, volumes
+
+    # Matrix input: (dates × tickers) arrays, wrapped without copying
+    index = pd.DatetimeIndex(dates_index)
+    prices = pd.DataFrame(data, index=index, columns=list(tickers), copy=False)
+    if volumes is not None:
+        volumes = pd.DataFrame(volumes, index=index, columns=list(tickers), copy=False)
+    return prices, volumes
+
+def compute_peak_scores(data, tickers=None, dates=None, index=None, volumes=None):
+    """
+    Score many dates and tickers at once.
+
+    The input is never modified or re-sorted in place, so it can be reused
+    across calls (e.g. once per bar across the whole universe).
+
+    Parameters:
+        data: Either a DataFrame indexed by date (or with a 'Date' column) holding
+            '<TICKER>' price and '<TICKER>_Volume' columns, or a (dates × tickers)
+            price ndarray together with `index` and `tickers`.
+        tickers (list): Tickers to score (default: every price column).
+        dates (list-like): Dates to return (default: every date with 6+ rows of history).
+        index (list-like): Dates for ndarray input.
+        volumes (np.ndarray): (dates × tickers) volumes for ndarray input.
+            Without volumes (no array, or no '<TICKER>_Volume' columns) the
+            volume spike point is never awarded, so scores top out at 2.5.
+
+    Returns:
+        np.ndarray with PEAK_SCORE_DTYPE, one record per scored (date, ticker),
+        sorted by date then ticker.
+    """
+    prices, volume_frame = _as_price_frames(data, tickers, index, volumes)
+    tickers = list(prices.columns)
+
+    frame = prices if volume_frame is None else pd.concat(
+        [prices, volume_frame.add_suffix('_Volume')], axis=1)
+    # volume_spike is NaN without volumes and would make every score NaN: skip it
+    factors = [f for f in PEAK_POINT_WEIGHTS if volume_frame is not None or f != 'volume_spike']
+    cube = compute_factor_cube(frame, tickers=tickers, factors=factors)
+    scores = combine_factors(cube, weights={f: PEAK_POINT_WEIGHTS[f] for f in factors}, scale=1)
+
+    high_10d = prior_high_10d(prices)
+    rows = ~np.isnan(high_10d)
+    if dates is not None:
+        wanted = prices.index.isin(pd.DatetimeIndex(pd.to_datetime(dates)))
+        rows &= wanted[:, None]
+    row_idx, col_idx = np.nonzero(rows)
+
+    price_values = prices.to_numpy()
+    out = np.empty(len(row_idx), dtype=PEAK_SCORE_DTYPE)
+    out['date'] = prices.index.to_numpy()[row_idx].astype('datetime64[D]')
+    out['ticker'] = np.asarray(tickers)[col_idx]
+    out['score'] = scores[row_idx, col_idx]
+    out['price'] = price_values[row_idx, col_idx]
+    out['high_10d'] = high_10d[row_idx, col_idx]
+    if volume_frame is not None:
+        out['volume'] = volume_frame.to_numpy()[row_idx, col_idx]
+        out['avg_vol_5d'] = prior_avg_volume_5d(volume_frame)[row_idx, col_idx]
+    else:
+        out['volume'] = np.nan
+        out['avg_vol_5d'] = np.nan
+    for name in PEAK_POINT_WEIGHTS:
+        out[name] = False
+    for k, name in enumerate(cube['factors']):
+        out[name] = cube['values'][row_idx, col_idx, k] == 1
+    return out
 
 def compute_peak_score(etf: str, df: pd.DataFrame, today: datetime = None, debug: bool = False):
     if today is None:
         today = pd.Timestamp.today().normalize()
+    today = pd.Timestamp(today)
 
-    # Ensure datetime
-    df['Date'] = pd.to_datetime(df['Date'])
-    df.set_index('Date', inplace=True)
-    df.sort_index(inplace=True)
-
-    price_col = etf
-    vol_col = f"{etf}_Volume"
-
-    if today not in df.index:
-        if debug:
-            print(f"[SKIP] {etf} — No data for {today.date()}")
-        return None
-
-    # Extract relevant data windows
-    recent_df = df.loc[:today].tail(11)
-    if len(recent_df) < 6:
+    records = compute_peak_scores(df, tickers=[etf], dates=[today])
+    if len(records) == 0:
         if debug:
-            print(f"[SKIP] {etf} — Not enough data for scoring")
+            print(f"[SKIP] {etf} — No data for {today.date()} or not enough data for scoring")
         return None
 
-    # 10-day high (excluding today)
-    prev_10 = recent_df.iloc[:-1]
-    high_10d = prev_10[price_col].max()
-    price_today = recent_df.iloc[-1][price_col]
-
-    # Price near high (within 0.03%)
-    price_close_to_high = abs(price_today - high_10d) / high_10d <= 0.0003
-
-    # Volume spike
-    vol_today = recent_df.iloc[-1][vol_col]
-    vol_avg = prev_10[vol_col].tail(5).mean()
-    volume_spike = vol_today >= 1.3 * vol_avg
-
-    # End-of-month timing
-    calendar_score = today.day >= 28
-
-    # Consecutive-day peak check
-    peak_match_yesterday = (recent_df.iloc[-2][price_col] == price_today)
-
-    score = (
-        1.0 * price_close_to_high +
-        1.0 * volume_spike +
-        1.0 * calendar_score +
-        0.5 * peak_match_yesterday
-    )
+    r = records[0]
+    score = float(r['score'])
 
     result = {
         'Date': today.date(),
         'ETF': etf,
         'Score': round(score, 2),
-        'Price_Today': round(price_today, 4),
-        '10D_High': round(high_10d, 4),
-        'Volume_Today': int(vol_today),
-        'Avg_Vol_5D': int(vol_avg),
-        'Price_Near_High': price_close_to_high,
-        'Volume_Spike': volume_spike,
-        'Late_Month': calendar_score,
-        'Repeat_High': peak_match_yesterday,
-        'Comment': '✅ Strong signal' if score >= 3 else '⚠️ Watch closely' if score >= 2 else 'No clear peak yet'
+        'Price_Today': round(float(r['price']), 4),
+        '10D_High': round(float(r['high_10d']), 4),
+        'Volume_Today': int(r['volume']),
+        'Avg_Vol_5D': int(r['avg_vol_5d']),
+        'Price_Near_High': bool(r['near_high']),
+        'Volume_Spike': bool(r['volume_spike']),
+        'Late_Month': bool(r['late_month']),
+        'Repeat_High': bool(r['repeat_high']),
+        'Comment': peak_score_comment(score)
     }
 
     if debug:
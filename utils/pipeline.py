@@ -0,0 +1,407 @@
+"""
+utils/pipeline.py
+Stage-graph pipeline runner with content-hash staleness checks
+
+Purpose:
+--------
+Runs the daily workflow (fetch → validate → full cycles → peak / low CSVs →
+modal days → scores → reports) in dependency order, and only the parts whose inputs changed.
+Each stage declares the files it reads and writes; dependencies are derived
+from those declarations instead of an unwritten run order.
+
+How:
+----
+- A stage depends on the latest stage declared before it that writes one of
+  its inputs. A stage may rewrite its own inputs in place (update_modal_days
+  rewrites the *_full_cycles.csv files); such a stage also waits for every
+  earlier reader of those files.
+- Staleness: a stage reruns when it was never run, an output is missing, or
+  the sha256 of any input differs from the hashes recorded after its last
+  successful run. Daily stages also rerun once per calendar day. '{today}' in
+  a path expands to YYYY-MM-DD. Stages downstream of a failure are not run.
+- File hashes are cached by (mtime, size) in logs/pipeline_state.json, so a
+  no-op rebuild only stats files.
+- Stages are grouped into dependency levels; stale stages of the same level
+  run in parallel worker processes. A stage is a 'module:function' entry point
+  called in the worker (modules have no import-time side effects).
+- Before the first stage runs, signals/*.csv is snapshotted into the
+  content-addressed store (utils/snapshots.py); unchanged files cost a stat().
+- run_in_memory() chains the detection stages in one process on a single price
+  frame, without reading or writing intermediate CSVs. utils/partitions.py
+  runs the same chain over month partitions when the frame does not fit.
+
+Usage:
+------
+    python -m utils.pipeline                 # rebuild whatever is stale
+    python -m utils.pipeline rotation_summary --dry-run
+    python -m utils.pipeline --force modal_days
+    python -m utils.pipeline --skip fetch    # offline: keep the current price file
+    python -m utils.pipeline --list
+    python -m utils.pipeline --profile      # timings to logs/profiles/ (utils/profiling.py)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import importlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from utils import profiling
+
+STATE_PATH = "logs/pipeline_state.json"
+PRICES = "data/etf_prices_2023_2025.csv"
+QUARANTINE = "data/price_quarantine.csv"       # ranges load_price_frame() leaves out
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+SAME_MONTH_ETFS = ['SGOV', 'BIL', 'SHV', 'TFLO', 'ICSH']
+
+def _signals(suffix, etfs=ETF_LIST):
+    return [f"signals/{etf.lower()}_{suffix}.csv" for etf in etfs]
+
+# Declaration order matters: it decides which stage produces an input that is
+# written by more than one stage (see resolve_dependencies).
+STAGES = [
+    {'name': 'fetch', 'call': 'scripts.fetch_etf_data:main',
+     'inputs': [], 'outputs': [PRICES], 'daily': True},
+    {'name': 'validate', 'call': 'utils.data_quality:main',
+     'inputs': [PRICES], 'outputs': [QUARANTINE]},
+    {'name': 'same_month_cycles', 'call': 'analysis.etf_full_cycles_same_month:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': _signals('full_cycles', SAME_MONTH_ETFS)},
+    {'name': 'usfr_cycles', 'call': 'analysis.usfr_full_cycles:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': ['signals/usfr_full_cycles.csv']},
+    {'name': 'peak_csvs', 'call': 'scripts.generate_peak_csvs:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': _signals('post_peak_highs')},
+    {'name': 'low_csvs', 'call': 'scripts.generate_low_csvs:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': _signals('post_peak_lows')},
+    {'name': 'modal_days', 'call': 'scripts.update_modal_days:update_all_modal_days',
+     'inputs': [PRICES, QUARANTINE] + _signals('full_cycles', SAME_MONTH_ETFS),
+     'outputs': _signals('full_cycles', SAME_MONTH_ETFS)},
+    {'name': 'signal_db', 'call': 'utils.signal_db:sync_all',
+     'inputs': _signals('full_cycles') + _signals('post_peak_highs') + _signals('post_peak_lows'),
+     'outputs': []},                              # cycles / peaks / lows tables of signals/signals.db
+    {'name': 'day_stats', 'call': 'scripts.generate_etf_day_stats:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': ['signals/etf_day_stats.csv', 'signals/etf_day_stats_from_end.csv']},
+    {'name': 'day_percentiles', 'call': 'utils.day_percentiles:ensure_index',
+     'inputs': [PRICES, QUARANTINE], 'outputs': ['signals/day_percentiles/meta.json']},
+    {'name': 'usfr_score', 'call': 'analysis.usfr_peak_signal:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': []},          # upserts into signals/signals.db
+    {'name': 'sgov_score', 'call': 'analysis.sgov_peak_signal:main',
+     'inputs': [PRICES, QUARANTINE], 'outputs': []},
+    {'name': 'rotation_backtest', 'call': 'scripts.analyze_rotations:main',
+     'inputs': [PRICES, QUARANTINE] + _signals('full_cycles'), 'outputs': ['data/etf_rotation_backtest.csv']},
+    {'name': 'rotation_summary', 'call': 'scripts.etf_rotation_backtest:main',
+     'inputs': ['data/etf_rotation_backtest.csv'], 'outputs': ['signals/etf_rotation_analysis_summary.csv']},
+    {'name': 'usfr_report', 'call': 'scripts.daily_usfr_report:main',
+     'inputs': ['signals/usfr_post_peak_lows.csv'], 'outputs': ['reports/usfr_report_{today}.txt']},
+]
+
+def expand(path, today=None):
+    return path.replace('{today}', (today or date.today()).isoformat())
+
+def resolve_dependencies(stages=STAGES):
+    """
+    Returns {stage name: set of upstream stage names}.
+
+    An input is produced by the latest earlier stage that lists it as an
+    output. A stage that rewrites one of its inputs in place also depends on
+    every earlier stage reading that file (write after read).
+    """
+    deps = {stage['name']: set() for stage in stages}
+    for i, stage in enumerate(stages):
+        earlier = stages[:i]
+        for path in stage['inputs']:
+            producers = [s['name'] for s in earlier if path in s['outputs']]
+            if producers:
+                deps[stage['name']].add(producers[-1])
+        for path in set(stage['inputs']) & set(stage['outputs']):
+            deps[stage['name']].update(s['name'] for s in earlier if path in s['inputs'])
+    return deps
+
+def dependency_levels(stages=STAGES, deps=None):
+    """Stage names grouped into levels; a level only depends on earlier levels."""
+    deps = deps or resolve_dependencies(stages)
+    level = {}
+    for stage in stages:                      # declaration order is a valid topological order
+        name = stage['name']
+        level[name] = 1 + max((level[d] for d in deps[name]), default=-1)
+    levels = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for stage in stages:
+        levels[level[stage['name']]].append(stage['name'])
+    return levels
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'files': {}, 'stages': {}}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ Unreadable pipeline state {path}, treating every stage as stale")
+        return {'files': {}, 'stages': {}}
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def file_hash(path, state):
+    """sha256 of a file, reusing the cached digest while mtime and size are unchanged."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cached = state['files'].get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    state['files'][path] = [st.st_mtime_ns, st.st_size, digest.hexdigest()]
+    return state['files'][path][2]
+
+def stale_reason(stage, state, today=None):
+    """Why a stage must run, or None if it is up to date."""
+    record = state['stages'].get(stage['name'])
+    if record is None:
+        return "never run"
+    for path in stage['outputs']:
+        if not os.path.exists(expand(path, today)):
+            return f"missing output {expand(path, today)}"
+    if stage.get('daily') and record.get('day') != (today or date.today()).isoformat():
+        return "daily stage not run today"
+    for path in stage['inputs']:
+        if file_hash(path, state) != record['inputs'].get(path):
+            return f"input changed: {path}"
+    return None
+
+def _run_stage(name, call):
+    """
+    Worker: import the stage module and call its entry function ('module:function').
+    Returns (ok, seconds, error, profile spans / counters recorded in the worker).
+    """
+    profiling.take_events()            # a forked worker starts with the parent's spans
+    start = time.perf_counter()
+    module_name, func_name = call.split(':')
+    sys.argv = [module_name]           # entry points that parse arguments see no pipeline flags
+    error = None
+    try:
+        with profiling.span(f"stage:{name}", call=call):
+            getattr(importlib.import_module(module_name), func_name)()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"exit code {e.code}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return error is None, time.perf_counter() - start, error, profiling.take_events()
+
+def _with_upstream(names, deps):
+    wanted, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(deps[name])
+    return wanted
+
+def run_pipeline(targets=None, force=(), skip=(), dry_run=False, workers=None, state_path=STATE_PATH,
+                 stages=STAGES, snapshot=True):
+    """
+    Bring the pipeline up to date.
+
+    Parameters:
+        targets (list): Stage names to bring up to date, with their upstream
+            stages (default: all stages).
+        force (iterable): Stage names to run even if up to date ('all' for every stage).
+        skip (iterable): Stage names to treat as up to date (e.g. 'fetch' when offline).
+        dry_run (bool): Only report what would run.
+        workers (int): Process pool size for parallel stages.
+        snapshot (bool): Snapshot signals/*.csv (utils/snapshots.py) before
+            the first stage runs.
+
+    Returns:
+        dict: stage name -> 'ran', 'skipped', 'failed', 'blocked' or 'would run'.
+    """
+    by_name = {stage['name']: stage for stage in stages}
+    deps = resolve_dependencies(stages)
+    named = list(targets or []) + [f for f in force if f != 'all'] + list(skip)
+    unknown = [n for n in named if n not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    selected = _with_upstream(targets, deps) if targets else set(by_name)
+    force = set(by_name) if 'all' in force else set(force)
+
+    state = load_state(state_path)
+    today = date.today()
+    status = {}
+
+    for level in dependency_levels(stages, deps):
+        to_run = []
+        for name in (n for n in level if n in selected):
+            stage = by_name[name]
+            if any(status.get(d) in ('failed', 'blocked') for d in deps[name]):
+                status[name] = 'blocked'
+                print(f"⛔ {name}: upstream stage failed")
+                continue
+            if name in skip:
+                status[name] = 'skipped'
+                print(f"⏭️ {name}: skipped by request")
+                continue
+            if name in force:
+                reason = "forced"
+            elif any(status.get(d) in ('ran', 'would run') for d in deps[name]) and dry_run:
+                reason = "upstream will run"
+            else:
+                reason = stale_reason(stage, state, today)
+            if reason is None:
+                status[name] = 'skipped'
+                print(f"✔️ {name}: up to date")
+                continue
+            print(f"▶️ {name}: {reason}")
+            to_run.append(name)
+
+        if dry_run:
+            status.update({name: 'would run' for name in to_run})
+            continue
+        if not to_run:
+            continue
+        if snapshot:
+            from utils.snapshots import take_snapshot
+            take_snapshot(label="pipeline")
+            snapshot = False
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_stage, to_run, [by_name[n]['call'] for n in to_run]))
+
+        for name, (ok, elapsed, error, recorded) in zip(to_run, results):
+            stage = by_name[name]
+            profiling.merge(*recorded)
+            if not ok:
+                status[name] = 'failed'
+                print(f"❌ {name} failed after {elapsed:.1f}s: {error}")
+                continue
+            # Input hashes are taken after the run, so in-place stages record
+            # the files as they left them
+            state['stages'][name] = {
+                'inputs': {path: file_hash(path, state) for path in stage['inputs']},
+                'day': today.isoformat(),
+                'finished_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'seconds': round(elapsed, 3),
+            }
+            status[name] = 'ran'
+            print(f"✅ {name} finished in {elapsed:.1f}s")
+        save_state(state, state_path)
+
+    if not dry_run:
+        save_state(state, state_path)          # persist refreshed hash cache
+    return status
+
+def run_in_memory(prices=None, today=None):
+    """
+    Chain the detection stages in this process on one price frame.
+
+    Nothing is read except the price store (once) and nothing is written.
+
+    Parameters:
+        prices (pd.DataFrame): Date-indexed price frame (default: load_price_frame()).
+        today (datetime): Month used for the Peak_Modal_Day update (default: now).
+
+    Returns:
+        dict with 'full_cycles', 'post_peak_highs', 'post_peak_lows' ({etf: DataFrame}),
+        'rotation', 'rotation_summary' (DataFrames) and 'scores' ({etf: dict}).
+    """
+    from analysis.etf_full_cycles_same_month import build_same_month_cycles
+    from analysis.usfr_full_cycles import detect_usfr_full_cycles
+    from scripts.analyze_rotations import ROTATION_ETFS, build_rotation_table, prepare_usfr_peaks
+    from scripts.etf_rotation_backtest import summarize_rotation_backtest
+    from scripts.generate_low_csvs import build_low_csvs
+    from scripts.generate_peak_csvs import build_peak_csvs
+    from scripts.peak_signal_score import get_all_peak_scores
+    from scripts.update_modal_days import apply_peak_modal_day
+    from utils.data_loader import load_price_frame
+
+    if prices is None:
+        with profiling.span("load_prices"):
+            prices = load_price_frame(PRICES)
+    frame = prices.reset_index()           # 'Date' column layout used by the peak / low detectors
+
+    with profiling.span("same_month_cycles"):
+        full_cycles = build_same_month_cycles(prices)
+    with profiling.span("modal_days"):
+        for etf, cycles in full_cycles.items():
+            updated, _ = apply_peak_modal_day(cycles, prices, etf, today)
+            if updated is not None:
+                full_cycles[etf] = updated
+    with profiling.span("usfr_cycles"):
+        full_cycles['USFR'] = detect_usfr_full_cycles(prices[['USFR']].dropna())
+
+    with profiling.span("rotation_backtest"):
+        rotation = build_rotation_table(prices, prepare_usfr_peaks(full_cycles['USFR']),
+                                        [etf for etf in ROTATION_ETFS if etf in prices.columns])
+    with profiling.span("rotation_summary"):
+        _, rotation_summary = summarize_rotation_backtest(rotation)
+    with profiling.span("peak_csvs"):
+        post_peak_highs = build_peak_csvs(frame)
+    with profiling.span("low_csvs"):
+        post_peak_lows = build_low_csvs(frame)
+    with profiling.span("scores"):
+        scores = get_all_peak_scores(prices)
+    return {
+        'full_cycles': full_cycles,
+        'post_peak_highs': post_peak_highs,
+        'post_peak_lows': post_peak_lows,
+        'rotation': rotation,
+        'rotation_summary': rotation_summary,
+        'scores': scores,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stale stages of the ETF signal pipeline")
+    parser.add_argument('targets', nargs='*', help="Stages to bring up to date (default: all)")
+    parser.add_argument('--force', nargs='*', default=[], metavar='STAGE',
+                        help="Stages to rerun regardless of state ('all' for every stage)")
+    parser.add_argument('--skip', nargs='*', default=[], metavar='STAGE',
+                        help="Stages to treat as up to date (e.g. fetch when offline)")
+    parser.add_argument('--dry-run', action='store_true', help="Show what would run")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="Do not snapshot signals/*.csv before running stages")
+    parser.add_argument('--list', action='store_true', help="Show stages and dependencies")
+    parser.add_argument('--profile', action='store_true',
+                        help="Record stage / detector timings to logs/profiles/")
+    parser.add_argument('--profile-memory', action='store_true', help="Also record tracemalloc peaks")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = resolve_dependencies()
+        for i, level in enumerate(dependency_levels(deps=deps)):
+            for name in level:
+                upstream = ', '.join(sorted(deps[name])) or '-'
+                print(f"[{i}] {name:<18} ← {upstream}")
+        return
+
+    if args.profile or args.profile_memory:
+        profiling.enable(memory=args.profile_memory)
+    start = time.perf_counter()
+    try:
+        status = run_pipeline(args.targets, args.force, args.skip, args.dry_run, args.workers,
+                              snapshot=not args.no_snapshot)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if profiling.enabled():
+        profiling.print_summary()
+        profiling.write_run("pipeline")
+    counts = {s: list(status.values()).count(s) for s in sorted(set(status.values()))}
+    print(f"📊 Pipeline done in {time.perf_counter() - start:.2f}s: "
+          + ", ".join(f"{n} {s}" for s, n in counts.items()))
+    if any(s in ('failed', 'blocked') for s in status.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
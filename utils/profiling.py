@@ -0,0 +1,229 @@
+"""
+utils/profiling.py
+Per-stage timers, counters and peak-memory capture
+
+Purpose:
+--------
+Shows where a refresh spends its time. Pipeline stages, run_in_memory() steps
+and the detectors are wrapped in named spans; hot loops bump counters. A run
+can be exported as a JSON profile (per-span totals, counters, raw spans) and
+as a Chrome trace-event file (open in chrome://tracing or ui.perfetto.dev).
+
+How:
+----
+- Off by default. When off, span() returns a shared no-op context manager,
+  @profiled functions call straight through, and count() returns after one
+  flag check, so instrumented code pays a few hundred nanoseconds per call.
+- enable() (or ETF_PROFILE=1 in the environment; ETF_PROFILE=memory adds
+  tracemalloc) turns recording on in this process and in worker processes
+  started afterwards. Workers hand their spans back with take_events() and
+  the parent adds them with merge(), so one trace shows every process.
+- Span timestamps come from time.perf_counter_ns() (system-wide monotonic
+  clock), so spans from different processes line up in the trace.
+- With memory capture, each span records the tracemalloc peak reached while it
+  was open (children included). tracemalloc slows Python code 2–4×, so time
+  and memory are best measured in separate runs.
+
+Functions:
+----------
+- enable(memory=False) / disable() / reset()
+- span(name, **args)       context manager for one timed region
+- profiled(name=None)      decorator: span around every call of a function
+- count(name, n=1)         add to a named counter
+- summary()                per-span-name calls / total / mean / max / peak memory
+- write_profile(path)      JSON profile of the run
+- write_chrome_trace(path) Chrome trace-event JSON
+- write_run(label)         both files under logs/profiles/
+
+Usage:
+------
+    python main.py --profile detect --in-memory
+    python -m utils.pipeline --profile --force all --skip fetch
+    ETF_PROFILE=memory python -m scripts.generate_peak_csvs
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+PROFILE_DIR = "logs/profiles"
+ENV_VAR = "ETF_PROFILE"
+
+_enabled = False
+_memory = False
+_events = []                       # finished spans, dicts in trace-event layout
+_counters = defaultdict(int)
+_stack = threading.local()         # open spans of this thread
+_started = None                    # (wall clock, perf_counter_ns) of enable()
+_NULL = contextlib.nullcontext()
+
+def enabled():
+    return _enabled
+
+def enable(memory=False):
+    """Start recording in this process and in worker processes started later."""
+    global _enabled, _memory, _started
+    _enabled = True
+    _memory = bool(memory)
+    if _memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if _started is None:
+        _started = (datetime.now().isoformat(timespec="seconds"), time.perf_counter_ns())
+    os.environ[ENV_VAR] = "memory" if _memory else "1"
+
+def disable():
+    global _enabled, _memory
+    _enabled = False
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory = False
+    os.environ.pop(ENV_VAR, None)
+
+def reset():
+    """Drop recorded spans and counters (recording stays on or off)."""
+    global _started
+    _events.clear()
+    _counters.clear()
+    _started = (datetime.now().isoformat(timespec="seconds"), time.perf_counter_ns()) if _enabled else None
+
+def count(name, n=1):
+    if _enabled:
+        _counters[name] += n
+
+class _Span:
+    __slots__ = ('name', 'args', 'start', 'child_peak')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = getattr(_stack, 'spans', None)
+        if stack is None:
+            stack = _stack.spans = []
+        if _memory:
+            if stack:
+                # Keep the peak the parent reached so far before the reset discards it
+                stack[-1].child_peak = max(stack[-1].child_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        stack = _stack.spans
+        stack.pop()
+        args = dict(self.args)
+        if _memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            args['peak_kb'] = round(peak / 1024, 1)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        if exc[0] is not None:
+            args['error'] = exc[0].__name__
+        _events.append({'name': self.name, 'ph': 'X', 'ts': self.start / 1000, 'dur': (end - self.start) / 1000,
+                        'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+        return False
+
+def span(name, **args):
+    """Time a region: `with span('peak_csvs', etf=etf): ...`. No-op when disabled."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, args)
+
+def profiled(name=None):
+    """Decorator: record a span named `name` (default module.function) per call."""
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(label, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def take_events():
+    """Spans and counters recorded so far, then cleared (for worker processes)."""
+    events, counters = list(_events), dict(_counters)
+    _events.clear()
+    _counters.clear()
+    return events, counters
+
+def merge(events, counters=None):
+    """Add spans / counters recorded by another process."""
+    _events.extend(events)
+    for key, value in (counters or {}).items():
+        _counters[key] += value
+
+def summary():
+    """List of per-span-name dicts, slowest total first."""
+    groups = defaultdict(list)
+    for event in _events:
+        groups[event['name']].append(event)
+    rows = []
+    for name, events in groups.items():
+        durations = [e['dur'] / 1000 for e in events]
+        row = {'Span': name, 'Calls': len(events), 'Total_ms': round(sum(durations), 3),
+               'Mean_ms': round(sum(durations) / len(durations), 3), 'Max_ms': round(max(durations), 3)}
+        peaks = [e['args']['peak_kb'] for e in events if 'peak_kb' in e['args']]
+        if peaks:
+            row['Peak_KB'] = max(peaks)
+        rows.append(row)
+    return sorted(rows, key=lambda r: r['Total_ms'], reverse=True)
+
+def write_profile(path):
+    started_at, started_ns = _started or (datetime.now().isoformat(timespec="seconds"), time.perf_counter_ns())
+    profile = {
+        'started_at': started_at,
+        'wall_ms': round((time.perf_counter_ns() - started_ns) / 1e6, 3),
+        'memory': _memory,
+        'spans': summary(),
+        'counters': dict(sorted(_counters.items())),
+        'events': _events,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=1, default=str)
+    return path
+
+def write_chrome_trace(path):
+    _, started_ns = _started or (None, min((e['ts'] * 1000 for e in _events), default=0))
+    origin = started_ns / 1000
+    trace = [{**e, 'ts': round(e['ts'] - origin, 3), 'dur': round(e['dur'], 3), 'cat': 'stage'} for e in _events]
+    end = max((e['ts'] + e['dur'] for e in trace), default=0)
+    trace += [{'name': name, 'ph': 'C', 'ts': end, 'pid': os.getpid(), 'tid': 0, 'args': {name: value}}
+              for name, value in _counters.items()]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, default=str)
+    return path
+
+def write_run(label, out_dir=PROFILE_DIR):
+    """Write <label>_<timestamp>.json and .trace.json; returns both paths."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(out_dir, f"{label}_{stamp}")
+    paths = write_profile(base + ".json"), write_chrome_trace(base + ".trace.json")
+    print(f"⏱️ Profile saved to {paths[0]} (trace: {paths[1]})")
+    return paths
+
+def print_summary(limit=15):
+    for row in summary()[:limit]:
+        peak = f"  peak {row['Peak_KB']:,.0f} KB" if 'Peak_KB' in row else ""
+        print(f"  {row['Span']:<44} {row['Calls']:>6}×  {row['Total_ms']:>10.1f} ms{peak}")
+    for name, value in sorted(_counters.items()):
+        print(f"  # {name:<42} {value:>8,}")
+
+# Inherit recording from a parent process that called enable()
+if os.environ.get(ENV_VAR):
+    enable(memory=os.environ[ENV_VAR] == "memory")
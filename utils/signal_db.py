@@ -0,0 +1,541 @@
+"""
+utils/signal_db.py
+Embedded signal database for cycles, post-peak highs and post-peak lows
+
+Purpose:
+--------
+The detectors write one CSV per ETF and kind into signals/ (*_full_cycles,
+*_post_peak_highs, *_post_peak_lows), each with its own column spelling:
+Cycle_Month vs Cycle_Start_Month, SGOV_Peak_Date vs Peak_Date, m/d/Y vs ISO
+dates. Readers patch those differences by hand and answer questions such as
+"last cycle with a positive gain" by reading the whole file and scanning it
+backwards. This module keeps the same rows in normalized tables of the SQLite
+store (signals/signals.db, shared with utils/signal_log.py) so lookups are
+indexed queries, and serves the legacy layouts back as SQL views.
+
+Storage:
+--------
+- cycles (ticker, month, low_date, low, peak_date, peak, gain_pct,
+  cycle_complete, peak_signal_strength, low_modal_day, peak_modal_day)
+- peaks  (ticker, month, low_date, low, peak_date, peak, rebound_pct,
+  days_between, multi_peak_days, is_multi_day_peak, low_10d_before_peak,
+  was_peak_in_prior_month)
+- lows   (ticker, month, peak_date, peak, low_date, low, drop_pct,
+  days_between, multi_low_days, is_multi_day_low, high_10d_before_peak,
+  low_10d_after_low, was_low_in_next_month, low_modal_day)
+- scores (utils/signal_log.py)
+- sources (path, tbl, ticker, columns, mtime_ns, size, imported_at):
+  the CSV each ticker's rows came from and its column layout.
+- changes (seq, tbl, ticker, month, op, columns, changed_at): every row
+  inserted, updated or deleted by an upsert or sync; cursors (consumer, seq)
+  records how far each downstream consumer has read.
+Each signal table has PRIMARY KEY (ticker, month) and an index on
+(ticker, <event date>). Dates are stored as ISO 'YYYY-MM-DD' and booleans as 0/1.
+
+How:
+----
+- upsert_frame() normalizes a legacy frame (either column spelling), diffs
+  it against the stored rows (utils/changeset.py) and, in one transaction,
+  writes and logs only the inserted and changed rows; replace=True also
+  deletes the ticker's months missing from the frame, so a detector's full
+  output can be synced. Downstream steps read the change log with
+  consume_changes() instead of re-reading every file.
+- sync_csv() imports a CSV only when its size or mtime changed since the
+  last import, so callers can sync before every lookup at the cost of a
+  stat() and one primary-key read.
+- Views named like the legacy files (sgov_full_cycles, usfr_post_peak_lows, ...)
+  select each ticker's rows with the recorded legacy column names and order;
+  export_views() writes them back out as CSVs.
+
+Functions:
+----------
+- connect(db_path)                          Store with signal tables and views
+- upsert_frame(table, ticker, df, ...)      Batched transactional upsert
+- sync_csv(path) / sync_all(signals_dir)    Import changed legacy CSVs
+- load_table(table, ticker, start, end)     Indexed range query -> DataFrame
+- last_positive_gain_peak(ticker)           Latest cycle with Gain_% > 0
+- changes_since(seq) / consume_changes(consumer)   Change log readers
+- read_cursor / set_cursor / last_seq               Cursor bookkeeping for consumers
+- export_views(out_dir)                     Legacy CSVs from the views
+
+Usage:
+------
+    python -m utils.signal_db import                 # sync signals/*.csv into the store
+    python -m utils.signal_db export --out /tmp/sig  # legacy CSVs from the views
+    python -m utils.signal_db last-peak SGOV
+"""
+
+import argparse
+import json
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+
+from utils import signal_log
+from utils.changeset import diff_rows
+from utils.signal_log import DB_PATH
+
+SIGNALS_DIR = "signals"
+
+# table -> file suffix, event-date column, and (column, SQL type, legacy name) triples.
+# Legacy names may carry an '{etf}_' prefix; both spellings are accepted on import.
+TABLES = {
+    'cycles': {
+        'suffix': 'full_cycles',
+        'date': 'peak_date',
+        'columns': [
+            ('month', 'TEXT', 'Cycle_Month'),
+            ('low_date', 'TEXT', 'Low_Date'),
+            ('low', 'REAL', 'Low'),
+            ('peak_date', 'TEXT', 'Peak_Date'),
+            ('peak', 'REAL', 'Peak'),
+            ('gain_pct', 'REAL', 'Gain_%'),
+            ('cycle_complete', 'BOOL', 'Cycle_Complete'),
+            ('peak_signal_strength', 'REAL', 'Peak_Signal_Strength'),
+            ('low_modal_day', 'TEXT', 'Low_Modal_Day'),
+            ('peak_modal_day', 'TEXT', 'Peak_Modal_Day'),
+        ],
+    },
+    'peaks': {
+        'suffix': 'post_peak_highs',
+        'date': 'peak_date',
+        'columns': [
+            ('month', 'TEXT', 'Month'),
+            ('low_date', 'TEXT', 'Low_Date'),
+            ('low', 'REAL', 'Low'),
+            ('peak_date', 'TEXT', 'Peak_Date'),
+            ('peak', 'REAL', 'Peak'),
+            ('rebound_pct', 'REAL', 'Rebound_%'),
+            ('days_between', 'INTEGER', 'Days_Between_Low_and_Peak'),
+            ('multi_peak_days', 'INTEGER', 'Multi_Peak_Days'),
+            ('is_multi_day_peak', 'BOOL', 'Is_Multi_Day_Peak'),
+            ('low_10d_before_peak', 'REAL', '10D_Low_Before_Peak'),
+            ('was_peak_in_prior_month', 'BOOL', 'Was_Peak_in_Prior_Month'),
+        ],
+    },
+    'lows': {
+        'suffix': 'post_peak_lows',
+        'date': 'low_date',
+        'columns': [
+            ('month', 'TEXT', 'Month'),
+            ('peak_date', 'TEXT', '{etf}_Peak_Date'),
+            ('peak', 'REAL', '{etf}_Peak'),
+            ('low_date', 'TEXT', '{etf}_Low_Date'),
+            ('low', 'REAL', '{etf}_Low'),
+            ('drop_pct', 'REAL', 'Drop_%'),
+            ('days_between', 'INTEGER', 'Days_Between_Peak_and_Low'),
+            ('multi_low_days', 'INTEGER', 'Multi_Low_Days'),
+            ('is_multi_day_low', 'BOOL', 'Is_Multi_Day_Low'),
+            ('high_10d_before_peak', 'REAL', '10D_High_Before_Peak'),
+            ('low_10d_after_low', 'REAL', '10D_Low_After_Low'),
+            ('was_low_in_next_month', 'BOOL', 'Was_Low_in_Next_Month'),
+            ('low_modal_day', 'INTEGER', '{etf}_Low_Modal_Day'),
+        ],
+    },
+}
+
+# Alternative spellings seen in signals/ (USFR cycles start in the prior month)
+ALIASES = {('cycles', 'month'): ['Cycle_Start_Month']}
+DATE_COLUMNS = {'low_date', 'peak_date'}
+FILE_PATTERN = re.compile(r"^([a-z0-9]+)_(full_cycles|post_peak_highs|post_peak_lows)\.csv$")
+
+SOURCES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    tbl TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    imported_at TEXT NOT NULL
+);
+"""
+
+def _sql_type(kind):
+    return 'INTEGER' if kind == 'BOOL' else kind
+
+def _table_schema(table):
+    spec = TABLES[table]
+    cols = ",\n    ".join(f"{name} {_sql_type(kind)}" for name, kind, _ in spec['columns'][1:])
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} (\n"
+        f"    ticker TEXT NOT NULL,\n    month TEXT NOT NULL,\n    {cols},\n"
+        f"    updated_at TEXT NOT NULL,\n    PRIMARY KEY (ticker, month)\n) WITHOUT ROWID;\n"
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_ticker_{spec['date']} ON {table} (ticker, {spec['date']});\n"
+    )
+
+CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    month TEXT NOT NULL,
+    op TEXT NOT NULL,
+    columns TEXT,
+    changed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    consumer TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+"""
+
+SCHEMA = SOURCES_SCHEMA + CHANGES_SCHEMA + "".join(_table_schema(t) for t in TABLES)
+
+def connect(db_path=DB_PATH):
+    """Open the shared store (WAL) with the scores and signal tables."""
+    conn = signal_log.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+# ------------------------------------------------------------- normalizing
+
+def _legacy_names(table, column, legacy, etf):
+    names = [legacy.format(etf=etf)]
+    if '{etf}_' in legacy:
+        names.append(legacy.replace('{etf}_', ''))
+    return names + ALIASES.get((table, column), [])
+
+def _column_map(table, etf, columns):
+    """{legacy column in `columns`: table column} for one ticker's frame."""
+    mapping = {}
+    for name, _, legacy in TABLES[table]['columns']:
+        for candidate in _legacy_names(table, name, legacy, etf):
+            if candidate in columns:
+                mapping[candidate] = name
+                break
+    return mapping
+
+def _bool(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+        return {'true': 1, 'false': 0}.get(value)
+    return int(bool(value))
+
+def _normalize(table, etf, df):
+    """Legacy frame -> frame of table columns (missing columns are NULL)."""
+    mapping = _column_map(table, etf, df.columns)
+    if 'month' not in mapping.values():
+        raise ValueError(f"{etf} {table}: no month column in {list(df.columns)}")
+    out = df[list(mapping)].rename(columns=mapping)
+    for name, kind, _ in TABLES[table]['columns']:
+        if name not in out.columns:
+            out[name] = None
+            continue
+        values = out[name]
+        if name in DATE_COLUMNS:
+            parsed = pd.to_datetime(values, format='mixed', errors='coerce')
+            out[name] = parsed.dt.strftime('%Y-%m-%d')
+        elif name == 'month':
+            out[name] = values.astype(str).str.strip()
+        elif kind == 'BOOL':
+            out[name] = pd.array([None if pd.isna(v) else _bool(v) for v in values], dtype='Int64')
+        elif kind == 'INTEGER':
+            out[name] = pd.to_numeric(values, errors='coerce').astype('Int64')
+        elif kind == 'REAL':
+            out[name] = pd.to_numeric(values, errors='coerce')
+        else:
+            out[name] = values.astype(object)
+    out = out[[name for name, _, _ in TABLES[table]['columns']]].dropna(subset=['month'])   # blank trailing rows
+    # One row per month: the last written row wins, as in the CSV readers
+    return out.drop_duplicates('month', keep='last')
+
+def _records(df):
+    """Frame rows as tuples of plain Python values (NaN / NA -> None)."""
+    cleaned = df.astype(object).where(df.notna(), None)
+    return [tuple(v.item() if hasattr(v, 'item') else v for v in row)
+            for row in cleaned.itertuples(index=False)]
+
+# ------------------------------------------------------------------ writing
+
+def _upsert_sql(table):
+    names = [name for name, _, _ in TABLES[table]['columns']]
+    cols = ", ".join(['ticker'] + names + ['updated_at'])
+    marks = ", ".join("?" * (len(names) + 2))
+    updates = ",\n    ".join(f"{n} = excluded.{n}" for n in names[1:] + ['updated_at'])
+    return (f"INSERT INTO {table} ({cols}) VALUES ({marks})\n"
+            f"ON CONFLICT (ticker, month) DO UPDATE SET\n    {updates}")
+
+def _apply(conn, table, ticker, frame, replace):
+    """
+    Write only the rows of `frame` (normalized) that differ from the stored
+    ones and log them; with `replace`, stored months missing from `frame`
+    are deleted. Call inside a transaction. Returns the change set.
+    """
+    stored = pd.read_sql_query(f"SELECT * FROM {table} WHERE ticker = ?", conn, params=[ticker])
+    changes = diff_rows(stored.drop(columns=['ticker', 'updated_at']), frame, keys=['month'])
+    if not replace:
+        changes = changes[changes['op'] != 'delete']
+    if changes.empty:
+        return changes
+
+    now = datetime.now().isoformat(timespec="seconds")
+    written = frame[frame['month'].isin(changes.loc[changes['op'] != 'delete', 'month'])]
+    conn.executemany(_upsert_sql(table), [(ticker,) + row + (now,) for row in _records(written)])
+    conn.executemany(f"DELETE FROM {table} WHERE ticker = ? AND month = ?",
+                     [(ticker, m) for m in changes.loc[changes['op'] == 'delete', 'month']])
+    conn.executemany(
+        "INSERT INTO changes (tbl, ticker, month, op, columns, changed_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [(table, ticker, c.month, c.op, c.columns, now) for c in changes.itertuples(index=False)])
+    return changes
+
+def upsert_frame(table, ticker, df, replace=False, db_path=DB_PATH, conn=None):
+    """
+    Upsert one ticker's legacy frame into `table` in a single transaction.
+    Only inserted and changed rows are written (and logged in 'changes').
+
+    Parameters:
+        table (str): 'cycles', 'peaks' or 'lows'.
+        df (pd.DataFrame): rows in either legacy layout (prefixed or bare names).
+        replace (bool): also delete this ticker's months that are not in `df`.
+
+    Returns:
+        pd.DataFrame: the change set (month, op, columns).
+    """
+    ticker = ticker.upper()
+    frame = _normalize(table, ticker, df)
+    own = conn is None
+    conn = conn or connect(db_path)
+    try:
+        with conn:
+            return _apply(conn, table, ticker, frame, replace)
+    finally:
+        if own:
+            conn.close()
+
+def _parse_path(path):
+    match = FILE_PATTERN.match(os.path.basename(path))
+    if not match:
+        return None, None
+    table = next(t for t, spec in TABLES.items() if spec['suffix'] == match.group(2))
+    return table, match.group(1).upper()
+
+def sync_csv(path, db_path=DB_PATH, conn=None, force=False):
+    """
+    Import a legacy signals CSV if it changed since its last import.
+
+    Returns:
+        int: rows inserted, updated or deleted (0 if unchanged, missing or
+        not a signals file).
+    """
+    table, ticker = _parse_path(path)
+    if table is None or not os.path.exists(path):
+        return 0
+    stat = os.stat(path)
+    own = conn is None
+    conn = conn or connect(db_path)
+    try:
+        known = conn.execute("SELECT mtime_ns, size FROM sources WHERE path = ?", (path,)).fetchone()
+        if not force and known == (stat.st_mtime_ns, stat.st_size):
+            return 0
+        df = pd.read_csv(path, on_bad_lines="skip")
+        frame = _normalize(table, ticker, df)
+        with conn:
+            changes = _apply(conn, table, ticker, frame, replace=True)
+            conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, table, ticker, json.dumps(list(df.columns)), stat.st_mtime_ns, stat.st_size,
+                 datetime.now().isoformat(timespec="seconds")))
+            _create_view(conn, table, ticker, list(df.columns))
+        return len(changes)
+    finally:
+        if own:
+            conn.close()
+
+def signal_files(signals_dir=SIGNALS_DIR):
+    return sorted(os.path.join(signals_dir, name) for name in os.listdir(signals_dir)
+                  if FILE_PATTERN.match(name)) if os.path.isdir(signals_dir) else []
+
+def sync_all(signals_dir=SIGNALS_DIR, db_path=DB_PATH, force=False):
+    """Sync every signals/<etf>_<kind>.csv; returns {path: rows changed}."""
+    conn = connect(db_path)
+    try:
+        return {path: sync_csv(path, conn=conn, force=force) for path in signal_files(signals_dir)}
+    finally:
+        conn.close()
+
+# -------------------------------------------------------------------- views
+
+def _view_name(table, ticker):
+    return f"{ticker.lower()}_{TABLES[table]['suffix']}"
+
+def _create_view(conn, table, ticker, legacy_columns):
+    """(Re)create the legacy-layout view of one ticker's rows."""
+    mapping = _column_map(table, ticker, legacy_columns)
+    kinds = {name: kind for name, kind, _ in TABLES[table]['columns']}
+    select = []
+    for legacy in legacy_columns:
+        name = mapping.get(legacy)
+        if name is None:
+            expr = "NULL" if legacy != 'ETF' else "ticker"
+        elif kinds[name] == 'BOOL':
+            expr = f"CASE {name} WHEN 1 THEN 'True' WHEN 0 THEN 'False' END"
+        else:
+            expr = name
+        select.append(f'{expr} AS "{legacy}"')
+    view = _view_name(table, ticker)
+    conn.execute(f'DROP VIEW IF EXISTS "{view}"')
+    conn.execute(f'CREATE VIEW "{view}" AS SELECT {", ".join(select)} FROM {table} '
+                 f"WHERE ticker = '{ticker}' ORDER BY month")
+
+def export_views(out_dir=SIGNALS_DIR, db_path=DB_PATH):
+    """Write every legacy view to <out_dir>/<view>.csv; returns {path: rows}."""
+    os.makedirs(out_dir, exist_ok=True)
+    conn = connect(db_path)
+    try:
+        written = {}
+        for (view,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name").fetchall():
+            df = pd.read_sql_query(f'SELECT * FROM "{view}"', conn)
+            path = os.path.join(out_dir, f"{view}.csv")
+            df.to_csv(path, index=False)
+            written[path] = len(df)
+        return written
+    finally:
+        conn.close()
+
+# ------------------------------------------------------------------ reading
+
+def load_table(table, ticker=None, start=None, end=None, db_path=DB_PATH):
+    """
+    Rows of `table` (normalized names), filtered on the (ticker, month) key.
+    `start` / `end` are inclusive 'YYYY-MM' months.
+    """
+    clauses, params = [], []
+    if ticker is not None:
+        clauses.append("ticker = ?")
+        params.append(ticker.upper())
+    if start is not None:
+        clauses.append("month >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("month <= ?")
+        params.append(end)
+    sql = f"SELECT * FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY ticker, month"
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def changes_since(seq=0, table=None, ticker=None, db_path=DB_PATH, conn=None):
+    """Change-log rows after sequence number `seq` (seq, tbl, ticker, month, op, columns, changed_at)."""
+    clauses, params = ["seq > ?"], [seq]
+    if table is not None:
+        clauses.append("tbl = ?")
+        params.append(table)
+    if ticker is not None:
+        clauses.append("ticker = ?")
+        params.append(ticker.upper())
+    own = conn is None
+    conn = conn or connect(db_path)
+    try:
+        return pd.read_sql_query("SELECT * FROM changes WHERE " + " AND ".join(clauses) + " ORDER BY seq",
+                                 conn, params=params)
+    finally:
+        if own:
+            conn.close()
+
+def read_cursor(consumer, db_path=DB_PATH, conn=None):
+    """Sequence number `consumer` has read up to, or None if it never read."""
+    own = conn is None
+    conn = conn or connect(db_path)
+    try:
+        row = conn.execute("SELECT seq FROM cursors WHERE consumer = ?", (consumer,)).fetchone()
+        return row[0] if row else None
+    finally:
+        if own:
+            conn.close()
+
+def set_cursor(consumer, seq, db_path=DB_PATH, conn=None):
+    own = conn is None
+    conn = conn or connect(db_path)
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?)", (consumer, int(seq)))
+    finally:
+        if own:
+            conn.close()
+
+def last_seq(db_path=DB_PATH, conn=None):
+    """Sequence number of the newest change-log row (0 if empty)."""
+    own = conn is None
+    conn = conn or connect(db_path)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+    finally:
+        if own:
+            conn.close()
+
+def consume_changes(consumer, table=None, ticker=None, db_path=DB_PATH):
+    """
+    Changes logged since `consumer` last called this, then move its cursor
+    to the end of the log. A consumer should always pass the same filters:
+    changes it filtered out are not returned later. A consumer that must not
+    lose changes when its output is not saved reads with changes_since() and
+    calls set_cursor() afterwards instead.
+    """
+    conn = connect(db_path)
+    try:
+        last = last_seq(conn=conn)
+        changes = changes_since(read_cursor(consumer, conn=conn) or 0, table, ticker, conn=conn)
+        set_cursor(consumer, last, conn=conn)
+        return changes[changes['seq'] <= last]
+    finally:
+        conn.close()
+
+LAST_GAIN_SQL = """
+SELECT month, low_date, low, peak_date, peak, gain_pct
+FROM cycles
+WHERE ticker = ? AND gain_pct > 0
+ORDER BY month DESC
+LIMIT 1
+"""
+
+def last_positive_gain_peak(ticker, signals_dir=SIGNALS_DIR, db_path=DB_PATH):
+    """
+    Latest cycle of `ticker` with a positive Gain_%, as a dict of table
+    columns, or None. Syncs <ticker>_full_cycles.csv first if it changed; the
+    lookup walks the (ticker, month) primary key backwards and stops at the
+    first match.
+    """
+    conn = connect(db_path)
+    try:
+        sync_csv(os.path.join(signals_dir, f"{ticker.lower()}_full_cycles.csv"), conn=conn)
+        cur = conn.execute(LAST_GAIN_SQL, (ticker.upper(),))
+        row = cur.fetchone()
+        return dict(zip([c[0] for c in cur.description], row)) if row else None
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embedded signal database")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('import', help="Sync signals/*.csv into the store")
+    p.add_argument('--signals-dir', default=SIGNALS_DIR)
+    p.add_argument('--force', action='store_true', help="Re-import unchanged files")
+    p = sub.add_parser('export', help="Write the legacy CSV views")
+    p.add_argument('--out', default=SIGNALS_DIR)
+    p = sub.add_parser('last-peak', help="Latest positive-gain cycle of a ticker")
+    p.add_argument('ticker')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        counts = sync_all(args.signals_dir, force=args.force)
+        changed = {path: n for path, n in counts.items() if n}
+        for path, n in changed.items():
+            print(f"📥 {n:>4} changed rows from {path}")
+        print(f"✅ {len(changed)} of {len(counts)} files had row changes ({sum(changed.values())} rows)")
+    elif args.command == 'export':
+        for path, n in export_views(args.out).items():
+            print(f"📤 {n:>4} rows to {path}")
+    else:
+        print(last_positive_gain_peak(args.ticker))
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+utils/signal_log.py
+Indexed signal log store for daily peak scores
+
+Purpose:
+--------
+Replaces the append-only logs/*_peak_signals.csv files, which gained a row on
+every dashboard refresh. Scores are kept in an embedded SQLite database (WAL
+mode) keyed by (date, ticker, scorer version): logging the same day again
+overwrites that day's row instead of adding a duplicate, so the log grows by
+at most one row per ticker, scorer and trading day.
+
+Storage:
+--------
+- signals/signals.db, table 'scores':
+    date, ticker, scorer_version, score, signal, price, updated_at
+    PRIMARY KEY (date, ticker, scorer_version), index on (ticker, date)
+
+Functions:
+----------
+- log_scores(rows)                       Batched upsert of score dicts
+- log_score(date, ticker, score, ...)    Upsert a single score
+- query_scores(ticker, start, end, ...)  Indexed range query -> DataFrame
+- export_csv(path, ticker=None)          Legacy CSV layout for compatibility
+- import_legacy_csv(path, ticker=None)   One-off migration of the old CSV logs
+
+Usage:
+------
+    python -m utils.signal_log import   # load logs/*_peak_signals.csv
+    python -m utils.signal_log export   # legacy CSV layouts into logs/export/
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import pandas as pd
+from utils.factor_scoring import SCORER_ETF, SCORER_SGOV, SCORER_USFR, SCORER_VERSION, scorer_version
+
+DB_PATH = "signals/signals.db"
+
+EXPORT_DIR = "logs/export"     # never the legacy files themselves: export must not overwrite history
+
+# Legacy logs and the rows that belong in each: imported rows are tagged with
+# the file's 'source' scorer version, so an import -> export round trip puts
+# every row back in the file it came from; new rows are those of the file's
+# 'scorer' (utils/factor_scoring.py). The multi-ETF log holds the
+# scripts/peak_signal_score.py scores only (not the USFR / SGOV scorer logs).
+LEGACY_LOGS = {
+    "logs/usfr_peak_signals.csv": {'ticker': "USFR", 'source': "legacy", 'scorer': SCORER_USFR},
+    "logs/sgov_peak_signals.csv": {'ticker': "SGOV", 'source': "legacy", 'scorer': SCORER_SGOV},
+    "logs/etf_peak_signals.csv": {'ticker': None, 'source': "legacy-etf", 'scorer': SCORER_ETF,
+                                  'tickers': ["SGOV", "TFLO", "SHV", "BIL", "ICSH"]},   # layout with an ETF column
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    date TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    scorer_version TEXT NOT NULL,
+    score REAL,
+    signal TEXT,
+    price REAL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (date, ticker, scorer_version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_scores_ticker_date ON scores (ticker, date);
+"""
+
+UPSERT_SQL = """
+INSERT INTO scores (date, ticker, scorer_version, score, signal, price, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (date, ticker, scorer_version) DO UPDATE SET
+    score = excluded.score,
+    signal = excluded.signal,
+    price = excluded.price,
+    updated_at = excluded.updated_at
+"""
+
+def connect(db_path=DB_PATH):
+    """Open the store in WAL mode, creating the file and schema if needed."""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _date_str(value):
+    if value is None:
+        return None
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+def _none_if_nan(value):
+    if value is None or pd.isna(value):
+        return None
+    return float(value)
+
+def log_scores(rows, db_path=DB_PATH):
+    """
+    Upsert many scores in a single transaction.
+
+    Parameters:
+        rows (iterable of dict): keys 'date', 'ticker', 'score', and optionally
+            'signal', 'price', 'scorer_version' (default SCORER_VERSION).
+
+    Returns:
+        int: number of rows written.
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    params = [
+        (
+            _date_str(r["date"]),
+            r["ticker"].upper(),
+            r.get("scorer_version", SCORER_VERSION),
+            _none_if_nan(r.get("score")),
+            r.get("signal"),
+            _none_if_nan(r.get("price")),
+            now,
+        )
+        for r in rows
+    ]
+    if not params:
+        return 0
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(UPSERT_SQL, params)
+    finally:
+        conn.close()
+    return len(params)
+
+def log_score(date, ticker, score, signal=None, price=None, scorer_version=SCORER_VERSION, db_path=DB_PATH):
+    """Upsert a single score row."""
+    return log_scores([{
+        "date": date,
+        "ticker": ticker,
+        "score": score,
+        "signal": signal,
+        "price": price,
+        "scorer_version": scorer_version,
+    }], db_path=db_path)
+
+def query_scores(ticker=None, start=None, end=None, scorer_version=None, db_path=DB_PATH):
+    """
+    Range query over the store. Filters use the (ticker, date) index or the
+    primary key, so reads never scan the whole log.
+
+    Returns:
+        DataFrame with columns: date, ticker, scorer_version, score, signal,
+        price, updated_at (sorted by date, ticker).
+    """
+    clauses, params = [], []
+    if ticker is not None:
+        clauses.append("ticker = ?")
+        params.append(ticker.upper())
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(_date_str(start))
+    if end is not None:
+        clauses.append("date <= ?")
+        params.append(_date_str(end))
+    if scorer_version is not None:
+        clauses.append("scorer_version = ?")
+        params.append(scorer_version)
+
+    sql = "SELECT * FROM scores"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY date, ticker"
+
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def export_csv(path, ticker=None, tickers=None, scorer_versions=None, db_path=DB_PATH):
+    """
+    Write the store in the legacy CSV layout.
+
+    - With `ticker`: Date, Score, Signal (logs/usfr_peak_signals.csv layout)
+    - Without:       Date, ETF, Score, Message, Price (logs/etf_peak_signals.csv layout),
+                     limited to `tickers` if given
+    `scorer_versions` limits the rows to those versions. No file is written
+    when nothing matches.
+    """
+    df = query_scores(ticker=ticker, db_path=db_path)
+    if tickers is not None:
+        df = df[df["ticker"].isin([t.upper() for t in tickers])]
+    if scorer_versions is not None:
+        df = df[df["scorer_version"].isin(scorer_versions)]
+    if df.empty:
+        return 0
+    # One row per date and ticker: the most recently updated scorer version
+    df = df.sort_values("updated_at", kind="stable").drop_duplicates(["date", "ticker"], keep="last")
+    df = df.sort_values(["date", "ticker"])
+    if ticker is not None:
+        out = df.rename(columns={"date": "Date", "score": "Score", "signal": "Signal"})
+        out = out[["Date", "Score", "Signal"]]
+    else:
+        out = df.rename(columns={"date": "Date", "ticker": "ETF", "score": "Score",
+                                 "signal": "Message", "price": "Price"})
+        out = out[["Date", "ETF", "Score", "Message", "Price"]]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    out.to_csv(path, index=False)
+    return len(out)
+
+def import_legacy_csv(path, ticker=None, scorer_version="legacy", db_path=DB_PATH):
+    """
+    Load an old append-only CSV log into the store. Duplicate rows collapse
+    onto one key (the last logged row wins); merge-conflict markers and other
+    malformed lines are skipped.
+    """
+    if not os.path.exists(path):
+        return 0
+    df = pd.read_csv(path, on_bad_lines="skip")
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df = df.dropna(subset=["Date"])
+    if ticker is not None:
+        df["ETF"] = ticker
+    signal_col = "Signal" if "Signal" in df.columns else "Message"
+    rows = [
+        {
+            "date": r["Date"],
+            "ticker": r["ETF"],
+            "score": pd.to_numeric(r["Score"], errors="coerce"),
+            "signal": r.get(signal_col),
+            "price": pd.to_numeric(r.get("Price"), errors="coerce"),
+            "scorer_version": scorer_version,
+        }
+        for _, r in df.iterrows()
+    ]
+    return log_scores(rows, db_path=db_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import / export the legacy CSV score logs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="Load logs/*_peak_signals.csv into the store")
+    p = sub.add_parser("export", help="Write the store in the legacy CSV layouts")
+    p.add_argument("--out-dir", default=EXPORT_DIR,
+                   help=f"Directory for the CSVs (default: {EXPORT_DIR}; never the legacy logs)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        for path, spec in LEGACY_LOGS.items():
+            count = import_legacy_csv(path, spec['ticker'], scorer_version=spec['source'])
+            print(f"📥 Imported {count} rows from {path}")
+        return 0
+
+    out_dir = os.path.abspath(args.out_dir)
+    if any(os.path.dirname(os.path.abspath(p)) == out_dir for p in LEGACY_LOGS):
+        print(f"❌ {args.out_dir} holds the legacy logs; export to another directory")
+        return 2
+    for path, spec in LEGACY_LOGS.items():
+        target = os.path.join(args.out_dir, os.path.basename(path))
+        count = export_csv(target, spec['ticker'], spec.get('tickers'),
+                           scorer_versions=[spec['source'], scorer_version(spec['scorer'])])
+        print(f"📤 Exported {count} rows to {target}" if count else f"⏭️  No rows for {target}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+utils/snapshots.py
+Content-addressed, deduplicated snapshots of the signal files
+
+Purpose:
+--------
+Replaces the timestamped copies made by backup_full_cycles.py, which added a
+full set of files to backup_full_cycles/ on every run whether or not anything
+had changed. A snapshot here is a small JSON manifest (file path -> content
+hash); the contents are stored once per distinct version, gzip-compressed.
+Taking a snapshot when nothing changed costs a stat() per file and writes
+nothing, so one is taken before every pipeline run.
+
+Storage:
+--------
+- snapshots/objects/<aa>/<sha256>.gz   file contents, keyed by the sha256 of the
+                                       uncompressed bytes (shared by all snapshots)
+- snapshots/manifests/<id>.json        {'id', 'created', 'label', 'tree', 'files':
+                                       {path: {'sha256', 'size'}}}
+- snapshots/LATEST                     id of the most recently taken snapshot
+- snapshots/trees.json                 tree hash -> manifest id (rebuilt from the
+                                       manifests when missing)
+- snapshots/hash_cache.json            (mtime, size, sha256) per path, so
+                                       unchanged files are never re-read
+Snapshot ids are '<YYYYmmdd_HHMMSS>_<first 8 hex digits of the tree hash>'.
+
+How:
+----
+- take_snapshot() hashes the matching files (cached by mtime and size, as in
+  utils/pipeline.py), writes objects that are not stored yet, and reuses any
+  manifest with the same tree hash. Callers that snapshot different file sets
+  (backup_full_cycles.py and the pipeline) therefore do not write a new
+  manifest each time they alternate.
+- restore() reads one manifest and copies each object back; its cost does not
+  depend on how many snapshots exist. The current files are snapshotted first,
+  so a restore can itself be undone.
+- diff_snapshots() skips files whose hashes match and compares the others row
+  by row, keyed on (ETF, month) where those columns exist.
+- prune() keeps the newest N manifests and deletes objects no manifest uses.
+
+Functions:
+----------
+- take_snapshot(patterns, label)           -> manifest dict
+- list_snapshots()                         -> list of manifests, oldest first
+- load_manifest(snapshot_id)               'latest', a full id or a unique prefix
+- read_file(snapshot_id, path)             -> bytes of one file in a snapshot
+- restore(snapshot_id, paths=None)         write the snapshot's files back
+- diff_snapshots(old_id, new_id)           -> DataFrame of file and row changes
+- prune(keep)                              drop old manifests and unused objects
+
+Usage:
+------
+    python -m utils.snapshots take --label before-edit
+    python -m utils.snapshots list
+    python -m utils.snapshots diff 20250617_1408 latest
+    python -m utils.snapshots restore 20250617_1408 --path signals/sgov_full_cycles.csv
+    python -m utils.snapshots prune --keep 50
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from utils.pipeline import file_hash
+
+SNAPSHOT_DIR = "snapshots"
+DEFAULT_PATTERNS = ["signals/*.csv"]
+KEY_CANDIDATES = ['ETF', 'Cycle_Month', 'Cycle_Start_Month', 'Month']
+
+def _paths(store):
+    return {
+        'objects': os.path.join(store, "objects"),
+        'manifests': os.path.join(store, "manifests"),
+        'latest': os.path.join(store, "LATEST"),
+        'trees': os.path.join(store, "trees.json"),
+        'cache': os.path.join(store, "hash_cache.json"),
+    }
+
+def _object_path(store, digest):
+    return os.path.join(store, "objects", digest[:2], f"{digest}.gz")
+
+def _write_atomic(path, data, mode="wb"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, mode) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _load_cache(store):
+    try:
+        with open(_paths(store)['cache']) as f:
+            return {'files': json.load(f)}
+    except (OSError, ValueError):
+        return {'files': {}}
+
+def _store_object(store, path, digest):
+    """Compress `path` into the object store unless that content is already there."""
+    target = _object_path(store, digest)
+    if os.path.exists(target):
+        return False
+    with open(path, "rb") as f:
+        _write_atomic(target, gzip.compress(f.read(), compresslevel=6, mtime=0))
+    return True
+
+def _tree_hash(files):
+    listing = json.dumps({p: f['sha256'] for p, f in sorted(files.items())}, sort_keys=True)
+    return hashlib.sha256(listing.encode()).hexdigest()
+
+def _load_trees(store):
+    """Tree hash -> manifest id, rebuilt from the manifests if the index is missing."""
+    try:
+        with open(_paths(store)['trees']) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {m['tree']: m['id'] for m in list_snapshots(store)}
+
+def _save_trees(store, trees):
+    _write_atomic(_paths(store)['trees'], json.dumps(trees, indent=0, sort_keys=True), mode="w")
+
+def _matching_files(patterns):
+    found = set()
+    for pattern in patterns:
+        found.update(p for p in glob.glob(pattern) if os.path.isfile(p))
+    return sorted(os.path.normpath(p) for p in found)
+
+def take_snapshot(patterns=DEFAULT_PATTERNS, label=None, store=SNAPSHOT_DIR, quiet=False):
+    """
+    Snapshot the files matching `patterns` (globs relative to the working directory).
+
+    Returns:
+        dict: the manifest, with 'new' True if a manifest was written and
+        'stored' the number of new objects.
+    """
+    paths = _paths(store)
+    state = _load_cache(store)
+    cached = dict(state['files'])
+    files, stored = {}, 0
+    for path in _matching_files(patterns):
+        digest = file_hash(path, state)
+        if digest is None:              # removed while we were looking
+            continue
+        stored += _store_object(store, path, digest)
+        files[path] = {'sha256': digest, 'size': state['files'][path][1]}
+    if state['files'] != cached:
+        _write_atomic(paths['cache'], json.dumps(state['files'], indent=0, sort_keys=True), mode="w")
+
+    tree = _tree_hash(files)
+    trees = _load_trees(store)
+    if tree in trees:
+        try:
+            manifest = load_manifest(trees[tree], store)
+        except KeyError:                # manifest deleted by hand
+            manifest = None
+        if manifest is not None:
+            if _latest_id(store) != manifest['id']:
+                _write_atomic(paths['latest'], manifest['id'], mode="w")
+            if not quiet:
+                print(f"📸 Same files as snapshot {manifest['id']}")
+            return {**manifest, 'new': False, 'stored': 0}
+
+    now = datetime.now()
+    manifest = {
+        'id': f"{now.strftime('%Y%m%d_%H%M%S')}_{tree[:8]}",
+        'created': now.isoformat(timespec="seconds"),
+        'label': label,
+        'tree': tree,
+        'files': files,
+    }
+    _write_atomic(os.path.join(paths['manifests'], f"{manifest['id']}.json"),
+                  json.dumps(manifest, indent=1), mode="w")
+    _write_atomic(paths['latest'], manifest['id'], mode="w")
+    trees[tree] = manifest['id']
+    _save_trees(store, trees)
+    if not quiet:
+        print(f"📸 Snapshot {manifest['id']}: {len(files)} files, {stored} new objects")
+    return {**manifest, 'new': True, 'stored': stored}
+
+def _latest_id(store=SNAPSHOT_DIR):
+    try:
+        with open(_paths(store)['latest']) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def list_snapshots(store=SNAPSHOT_DIR):
+    """All manifests, oldest first (ids sort by creation time)."""
+    folder = _paths(store)['manifests']
+    if not os.path.isdir(folder):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".json"):
+            with open(os.path.join(folder, name)) as f:
+                manifests.append(json.load(f))
+    return manifests
+
+def load_manifest(snapshot_id, store=SNAPSHOT_DIR):
+    """Manifest for 'latest', a full id, or an unambiguous id prefix."""
+    if snapshot_id == 'latest':
+        snapshot_id = _latest_id(store)
+        if snapshot_id is None:
+            raise KeyError("No snapshots yet")
+    folder = _paths(store)['manifests']
+    path = os.path.join(folder, f"{snapshot_id}.json")
+    if not os.path.exists(path):
+        matches = [n for n in os.listdir(folder) if n.startswith(snapshot_id)] if os.path.isdir(folder) else []
+        if len(matches) != 1:
+            raise KeyError(f"{'Ambiguous' if matches else 'Unknown'} snapshot id: {snapshot_id}")
+        path = os.path.join(folder, matches[0])
+    with open(path) as f:
+        return json.load(f)
+
+def read_file(snapshot_id, path, store=SNAPSHOT_DIR):
+    """Contents of `path` as stored in a snapshot."""
+    entry = load_manifest(snapshot_id, store)['files'].get(os.path.normpath(path))
+    if entry is None:
+        raise KeyError(f"{path} is not in snapshot {snapshot_id}")
+    with gzip.open(_object_path(store, entry['sha256'])) as f:
+        return f.read()
+
+def restore(snapshot_id, paths=None, store=SNAPSHOT_DIR, dest="."):
+    """
+    Write a snapshot's files back under `dest` (default: where they came from).
+    Files that already have the snapshot's content are left alone. When
+    restoring in place, the current state is snapshotted first.
+
+    Returns:
+        list of restored paths.
+    """
+    manifest = load_manifest(snapshot_id, store)
+    wanted = manifest['files']
+    if paths:
+        paths = [os.path.normpath(p) for p in paths]
+        missing = [p for p in paths if p not in wanted]
+        if missing:
+            raise KeyError(f"Not in snapshot {manifest['id']}: {', '.join(missing)}")
+        wanted = {p: wanted[p] for p in paths}
+    in_place = os.path.abspath(dest) == os.path.abspath(".")
+    if in_place:
+        take_snapshot(DEFAULT_PATTERNS + sorted(wanted), label=f"before restore of {manifest['id']}",
+                      store=store, quiet=True)
+
+    state = _load_cache(store)
+    restored = []
+    for path, entry in wanted.items():
+        target = os.path.join(dest, path)
+        if in_place and file_hash(target, state) == entry['sha256']:
+            continue
+        with gzip.open(_object_path(store, entry['sha256'])) as f:
+            _write_atomic(target, f.read())
+        restored.append(path)
+    return restored
+
+def _row_keys(df):
+    return [c for c in KEY_CANDIDATES if c in df.columns]
+
+def diff_snapshots(old_id, new_id='latest', store=SNAPSHOT_DIR):
+    """
+    Changes from snapshot `old_id` to `new_id`.
+
+    Returns:
+        pd.DataFrame with File, Key, Column, Old, New, Status in
+        {'added_file', 'removed_file', 'inserted', 'deleted', 'updated',
+        'added_column', 'removed_column'}; files with identical content are skipped.
+    """
+    from utils.equivalence import compare_frames
+
+    old, new = load_manifest(old_id, store), load_manifest(new_id, store)
+    statuses = {'missing_row': 'deleted', 'extra_row': 'inserted', 'changed': 'updated',
+                'missing_column': 'removed_column', 'extra_column': 'added_column'}
+    rows = []
+    for path in sorted(set(old['files']) | set(new['files'])):
+        before, after = old['files'].get(path), new['files'].get(path)
+        if before and after and before['sha256'] == after['sha256']:
+            continue
+        if before is None or after is None:
+            rows.append({'File': path, 'Key': '', 'Column': '', 'Old': None, 'New': None,
+                         'Status': 'added_file' if before is None else 'removed_file'})
+            continue
+        if not path.endswith(".csv"):
+            rows.append({'File': path, 'Key': '', 'Column': '', 'Old': before['sha256'][:8],
+                         'New': after['sha256'][:8], 'Status': 'updated'})
+            continue
+        old_df = pd.read_csv(io.BytesIO(read_file(old['id'], path, store)))
+        new_df = pd.read_csv(io.BytesIO(read_file(new['id'], path, store)))
+        changes = compare_frames(old_df, new_df, _row_keys(new_df), rtol=0, atol=0)
+        for change in changes.itertuples(index=False):
+            rows.append({'File': path, 'Key': change.Key, 'Column': change.Column, 'Old': change.Expected,
+                         'New': change.Actual, 'Status': statuses[change.Status]})
+    return pd.DataFrame(rows, columns=['File', 'Key', 'Column', 'Old', 'New', 'Status'])
+
+def prune(keep=50, store=SNAPSHOT_DIR):
+    """Keep the newest `keep` manifests; delete the rest and unreferenced objects."""
+    manifests = list_snapshots(store)
+    paths = _paths(store)
+    dropped = manifests[:-keep] if keep > 0 else manifests
+    for manifest in dropped:
+        os.remove(os.path.join(paths['manifests'], f"{manifest['id']}.json"))
+    kept = manifests[len(dropped):]
+    if not kept and os.path.exists(paths['latest']):
+        os.remove(paths['latest'])
+    elif kept and _latest_id(store) not in {m['id'] for m in kept}:
+        _write_atomic(paths['latest'], kept[-1]['id'], mode="w")
+    _save_trees(store, {m['tree']: m['id'] for m in kept})
+    used = {f['sha256'] for m in kept for f in m['files'].values()}
+    removed = 0
+    for path in glob.glob(os.path.join(paths['objects'], "*", "*.gz")):
+        if os.path.basename(path)[:-3] not in used:
+            os.remove(path)
+            removed += 1
+    return len(dropped), removed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Content-addressed snapshots of the signal files")
+    parser.add_argument('--store', default=SNAPSHOT_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('take', help="Snapshot the signal files (no-op when unchanged)")
+    p.add_argument('--label')
+    p.add_argument('--pattern', nargs='+', default=DEFAULT_PATTERNS, help="Globs to include")
+    sub.add_parser('list', help="List snapshots")
+    p = sub.add_parser('restore', help="Write a snapshot's files back")
+    p.add_argument('snapshot')
+    p.add_argument('--path', nargs='+', help="Only these files")
+    p = sub.add_parser('diff', help="Row-level changes between two snapshots")
+    p.add_argument('old')
+    p.add_argument('new', nargs='?', default='latest')
+    p = sub.add_parser('prune', help="Keep only the newest snapshots")
+    p.add_argument('--keep', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'take':
+            take_snapshot(args.pattern, args.label, args.store)
+        elif args.command == 'list':
+            for m in list_snapshots(args.store):
+                size = sum(f['size'] for f in m['files'].values())
+                print(f"{m['id']}  {len(m['files']):>3} files  {size / 1024:>8.1f} KB  {m.get('label') or ''}")
+        elif args.command == 'restore':
+            restored = restore(args.snapshot, args.path, args.store)
+            print(f"♻️ Restored {len(restored)} files from {args.snapshot}")
+            for path in restored:
+                print(f"  - {path}")
+        elif args.command == 'diff':
+            changes = diff_snapshots(args.old, args.new, args.store)
+            if changes.empty:
+                print("✅ No differences")
+            else:
+                print(changes.to_string(index=False))
+        else:
+            manifests, objects = prune(args.keep, args.store)
+            print(f"🧹 Removed {manifests} snapshots and {objects} unused objects")
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+utils/synthetic_market.py
+Seeded synthetic Treasury ETF market at production scale
+
+Purpose:
+--------
+The stored price file is ~600 days × 6 ETFs, too small for slow paths to show.
+This builds price / volume frames of any size with the same shape as the real
+data, so benchmarks and equivalence checks can run on N tickers × M years.
+
+How:
+----
+- Trading calendar: weekdays minus NYSE holidays (New Year, MLK, Presidents,
+  Good Friday, Memorial, Juneteenth from 2022, Independence, Labor,
+  Thanksgiving, Christmas; weekend dates observed on the nearest weekday),
+  and the unscheduled closures in SPECIAL_CLOSURES.
+- Each ticker follows one of the six real profiles. Price accrues the
+  distribution every trading day (annual yield / 252 of the base price) and
+  drops by the accrued amount on the ex-date: the first trading day of the
+  month for the month-end ETFs, the first trading day on or after the 26th
+  for USFR-like tickers (peak in the 18–25 window). A slow NAV drift and
+  Gaussian noise (a few bps) are added, then prices are rounded to cents.
+- Volume is log-normal around the profile's typical volume, about 1.8×
+  on the two trading days before an ex-date.
+- Tickers are the six real names first, then '<PROFILE><n>' (e.g. 'SGOV7'),
+  so the real detectors run unchanged on the first six columns;
+  synthetic_config() gives ETF_CONFIG entries for the rest.
+- Everything is vectorized over (days × tickers); the same seed gives the
+  same market.
+
+Functions:
+----------
+- market_calendar(start, end)                       -> DatetimeIndex of trading days
+- synthetic_tickers(n)                              -> ticker names
+- generate_market(n_tickers, years, start, seed)    -> frame laid out like load_price_frame()
+- synthetic_config(tickers)                         -> {ticker: ETF_CONFIG entry}
+- write_market(df, path)                            -> CSV laid out like data/etf_prices_2023_2025.csv
+
+Usage:
+------
+    python -m utils.synthetic_market --tickers 60 --years 10 --output /tmp/prices.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay,
+                                    USMartinLutherKingJr, USMemorialDay, USPresidentsDay,
+                                    USThanksgivingDay, nearest_workday, sunday_to_monday)
+
+ETF_LIST = ['USFR', 'SGOV', 'BIL', 'TFLO', 'SHV', 'ICSH']
+
+# Starting price, annual distribution yield, ex-date rule, daily noise (bps), typical volume
+PROFILES = {
+    'USFR': {'price': 50.25, 'yield': 0.050, 'ex_day': 26, 'noise_bps': 0.6, 'volume': 4_000_000},
+    'SGOV': {'price': 100.10, 'yield': 0.050, 'ex_day': 1, 'noise_bps': 0.4, 'volume': 5_000_000},
+    'BIL': {'price': 91.45, 'yield': 0.049, 'ex_day': 1, 'noise_bps': 0.5, 'volume': 8_000_000},
+    'TFLO': {'price': 50.40, 'yield': 0.051, 'ex_day': 1, 'noise_bps': 0.6, 'volume': 1_500_000},
+    'SHV': {'price': 109.95, 'yield': 0.048, 'ex_day': 1, 'noise_bps': 0.5, 'volume': 3_000_000},
+    'ICSH': {'price': 50.05, 'yield': 0.053, 'ex_day': 1, 'noise_bps': 1.0, 'volume': 900_000},
+}
+
+# Unscheduled full-day closures (national days of mourning, Hurricane Sandy)
+SPECIAL_CLOSURES = pd.to_datetime(['2012-10-29', '2012-10-30', '2018-12-05', '2025-01-09'])
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        # A Saturday New Year's Day is not observed on the Friday before (NYSE stays open)
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+def market_calendar(start, end):
+    """Trading days between start and end (inclusive)."""
+    days = pd.bdate_range(start, end)
+    holidays = NYSEHolidayCalendar().holidays(start=days.min(), end=days.max())
+    return days[~days.isin(holidays) & ~days.isin(SPECIAL_CLOSURES)]
+
+def synthetic_tickers(n):
+    """The six real tickers, then profile names with a counter: USFR2, SGOV2, ..."""
+    return [etf if i < len(ETF_LIST) else f"{etf}{i // len(ETF_LIST) + 1}"
+            for i, etf in ((i, ETF_LIST[i % len(ETF_LIST)]) for i in range(n))]
+
+def _profile(ticker):
+    return ticker.rstrip('0123456789')
+
+def _ex_dates(dates, ex_day):
+    """Boolean mask: first trading day of each month on or after calendar day `ex_day`."""
+    months = dates.year * 12 + dates.month
+    eligible = np.asarray(dates.day >= ex_day)
+    frame = pd.DataFrame({'month': months, 'eligible': eligible})
+    first = frame[frame['eligible']].groupby('month').head(1).index
+    mask = np.zeros(len(dates), dtype=bool)
+    mask[first] = True
+    return mask
+
+def _days_since(mask):
+    """Trading days since the last True in `mask` (0 on the True day itself)."""
+    idx = np.arange(len(mask))
+    last = np.maximum.accumulate(np.where(mask, idx, 0))
+    return idx - last
+
+def generate_market(n_tickers=6, years=2.5, start='2023-01-01', seed=0):
+    """
+    Synthetic price / volume frame.
+
+    Parameters:
+        n_tickers (int): Number of ETFs (columns '<ETF>' and '<ETF>_Volume').
+        years (float): Length of history.
+        start (str): First calendar day.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: naive DatetimeIndex named 'Date', columns interleaved as
+        in the stored price file.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    dates = market_calendar(start, start + pd.DateOffset(days=int(round(years * 365.25))) - pd.Timedelta(days=1))
+    tickers = synthetic_tickers(n_tickers)
+    profiles = [PROFILES[_profile(t)] for t in tickers]
+    n_days = len(dates)
+
+    accrued = {ex_day: _days_since(_ex_dates(dates, ex_day)) for ex_day in {p['ex_day'] for p in profiles}}
+    base = np.array([p['price'] for p in profiles]) * rng.uniform(0.995, 1.005, n_tickers)
+    daily_yield = np.array([p['yield'] for p in profiles]) * rng.uniform(0.9, 1.1, n_tickers) / 252
+    days_since = np.column_stack([accrued[p['ex_day']] for p in profiles])        # (days, tickers)
+
+    drift = np.cumsum(rng.normal(0, 0.00002, (n_days, n_tickers)), axis=0)         # NAV wander
+    noise = rng.normal(0, 1, (n_days, n_tickers)) * np.array([p['noise_bps'] for p in profiles]) / 10_000
+    prices = base * (1 + daily_yield * days_since + drift + noise)
+    prices = np.round(prices, 2)
+
+    # Volume: log-normal, heavier in the two sessions before an ex-date
+    pre_ex = np.zeros((n_days, n_tickers), dtype=bool)
+    for j, p in enumerate(profiles):
+        ex_rows = np.flatnonzero(_ex_dates(dates, p['ex_day']))
+        for k in (1, 2):
+            pre_ex[ex_rows[ex_rows >= k] - k, j] = True
+    typical = np.array([p['volume'] for p in profiles], dtype=float)
+    volume = typical * rng.lognormal(0, 0.4, (n_days, n_tickers)) * np.where(pre_ex, 1.8, 1.0)
+
+    columns = {}
+    for j, ticker in enumerate(tickers):
+        columns[ticker] = prices[:, j]
+        columns[f"{ticker}_Volume"] = volume[:, j].round().astype(np.int64)
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(dates, name='Date'))
+
+def synthetic_config(tickers):
+    """ETF_CONFIG entries for synthetic tickers, copied from their profile ETF."""
+    from config.etf_parameters import ETF_CONFIG
+    return {t: ETF_CONFIG[_profile(t)] for t in tickers if t not in ETF_CONFIG}
+
+def write_market(df, path):
+    df.reset_index().to_csv(path, index=False, date_format='%Y-%m-%d')
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic ETF price file")
+    parser.add_argument('--tickers', type=int, default=6)
+    parser.add_argument('--years', type=float, default=2.5)
+    parser.add_argument('--start', default='2023-01-01')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='data/synthetic_prices.csv')
+    args = parser.parse_args()
+
+    df = generate_market(args.tickers, args.years, args.start, args.seed)
+    write_market(df, args.output)
+    print(f"✅ {len(df)} days × {args.tickers} ETFs saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -47,9 +47,12 @@ def get_usfr_distribution_dates(download_if_missing=True):
             for table in tables:
                 if not table or not table[0]:
                     continue
-                headers = [safe_strip(h).lower() for h in table[0]]
+                # The header row sits under a 'Monthly Distribution Dates' title row
+                header_row = next((i for i, row in enumerate(table[:2])
+                                   if 'ex-date' in [safe_strip(h).lower() for h in row]), 0)
+                headers = [safe_strip(h).lower() for h in table[header_row]]
                 if 'ex-date' in headers and 'record date' in headers and 'payable date' in headers:
-                    for row in table[1:]:
+                    for row in table[header_row + 1:]:
                         if len(row) < 3:
                             continue
                         ex_str = safe_strip(row[0])
@@ -1,63 +1,53 @@
 # utils/usfr_estimate_peak_value.py
 
+import os
+
 import pandas as pd
-from datetime import datetime, timedelta
+
+from utils.peak_forecast import forecast_peaks
 
 def estimate_usfr_peak_value(
     price_csv="data/etf_prices_2023_2025.csv",
     cycles_csv="signals/usfr_full_cycles.csv",
-    ex_div_date="2025-06-25"
+    ex_div_date=None,
+    ticker="USFR",
 ):
     """
-    Estimate the likely USFR peak value before ex-dividend date.
-    Assumes peak is 1 market day before ex-div date.
+    Estimate the likely peak value of one ETF (default USFR) before its next peak.
+    Wraps utils/peak_forecast.forecast_peaks(), which forecasts every ticker at
+    once from the distribution calendar / modal peak day; pass ex_div_date to
+    pin the peak to 1 market day before a given ex-dividend date instead.
     Uses recent price slope + past peak gains to forecast.
     """
-
-    # Convert to date object
-    ex_div = datetime.strptime(ex_div_date, "%Y-%m-%d").date()
-    expected_peak_date = ex_div - timedelta(days=1)
-
-    # Load price history
-    prices = pd.read_csv(price_csv, parse_dates=["Date"])
-    prices = prices[["Date", "USFR"]].dropna()
-    prices["Date"] = pd.to_datetime(prices["Date"]).dt.date
-    prices.sort_values("Date", inplace=True)
-
-    # Filter last 5 USFR trading days
-    recent = prices.tail(5).copy()
-    if len(recent) < 2:
-        return {"error": "Not enough recent USFR data to estimate"}
-
-    # Calculate slope (simple average daily change)
-    recent["Change"] = recent["USFR"].diff()
-    slope = recent["Change"].mean()
-
-    # Most recent date + price
-    last_date = recent.iloc[-1]["Date"]
-    last_price = recent.iloc[-1]["USFR"]
-
-    # Estimate days remaining to peak
-    days_until_peak = max((expected_peak_date - last_date).days, 0)
-    est_peak = last_price + slope * days_until_peak
-
-    # Optional: use last 6 peak gains as benchmark
     try:
-        cycles = pd.read_csv(cycles_csv)
-        peak_gains = cycles["Gain_%"].dropna().astype(float).tail(6)
-        avg_peak_gain = peak_gains.mean() / 100  # Convert % to multiplier
-        hist_peak_est = last_price * (1 + avg_peak_gain)
-    except:
-        avg_peak_gain = None
-        hist_peak_est = None
-
+        table = forecast_peaks(price_csv=price_csv, signals_dir=os.path.dirname(cycles_csv) or ".")
+    except (OSError, ValueError) as e:
+        return {"error": f"Forecast failed: {e}"}
+    rows = table[table["ETF"] == ticker.upper()]
+    if rows.empty or pd.isna(rows.iloc[0]["Recent_Slope"]):
+        return {"error": f"Not enough recent {ticker} data to estimate"}
+    est = rows.iloc[0]
+
+    last_date = est["As_Of"]
+    peak_date, sessions = est["Expected_Peak_Date"], est["Sessions_Until_Peak"]
+    if ex_div_date is not None:
+        from utils.synthetic_market import market_calendar
+        ex_div = pd.Timestamp(ex_div_date)
+        before = market_calendar(last_date, ex_div - pd.Timedelta(days=1))
+        peak_date = before[-1] if len(before) else last_date
+        sessions = max(len(before) - 1, 0)
+    if pd.isna(peak_date):
+        return {"error": f"No expected peak date for {ticker}"}
+
+    est_peak = est["Last_Price"] + est["Recent_Slope"] * sessions
+    hist_peak_est = est["Est_Peak_Hist"]
     return {
-        "last_price": round(last_price, 4),
-        "recent_slope": round(slope, 6),
-        "days_until_peak": days_until_peak,
-        "est_peak_value_slope": round(est_peak, 4),
-        "est_peak_value_hist": round(hist_peak_est, 4) if hist_peak_est else None,
-        "expected_peak_date": expected_peak_date.strftime("%Y-%m-%d"),
+        "last_price": round(float(est["Last_Price"]), 4),
+        "recent_slope": round(float(est["Recent_Slope"]), 6),
+        "days_until_peak": int(max((peak_date - last_date).days, 0)),
+        "est_peak_value_slope": round(float(est_peak), 4),
+        "est_peak_value_hist": round(float(hist_peak_est), 4) if pd.notna(hist_peak_est) else None,
+        "expected_peak_date": peak_date.strftime("%Y-%m-%d"),
+        "peak_date_source": "ex_div_date" if ex_div_date is not None else est["Peak_Source"],
         "source_last_date": last_date.strftime("%Y-%m-%d"),
     }
-